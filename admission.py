@@ -0,0 +1,138 @@
+import asyncio
+import math
+import os
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from fastapi import Request as FARequest
+
+from auth import bearer_token
+from metrics import ADMISSION_REQUESTS
+from ratelimit import TokenBucket
+
+# Per-user buckets kept at once; the least recently seen user is dropped first
+MAX_TRACKED_USERS = int(os.getenv('ADMISSION_MAX_TRACKED_USERS', '10000'))
+# Worker processes serving the app (see Dockerfile), each with its own buckets
+WORKER_COUNT = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+
+
+class AdmissionController:
+    """
+    Guards one expensive endpoint with a per-user token bucket, a global
+    token bucket and a concurrency limit. A request that would wait longer
+    than `target_delay` seconds for a free slot is shed instead of queueing,
+    so callers retry later rather than pile up behind a slow dependency.
+
+    State lives in the process. `global_rate` and `global_burst` are for the
+    whole app and are split evenly between `workers`; the per-user limits
+    and `max_concurrency` apply in each worker.
+    """
+
+    def __init__(self, name, user_rate, user_burst, global_rate, global_burst, max_concurrency,
+                 target_delay, max_tracked_users=MAX_TRACKED_USERS, workers=WORKER_COUNT):
+        self.name = name
+        self.enabled = True
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        # At least one request's worth, so a small burst does not shut a worker out
+        self.global_bucket = TokenBucket(global_rate / workers, max(1.0, global_burst / workers))
+        self.max_concurrency = max_concurrency
+        self.target_delay = target_delay
+        self.max_tracked_users = max_tracked_users
+        self.in_flight = 0
+        self._user_buckets = OrderedDict()
+        self._waiters = deque()
+
+    def user_bucket(self, user_key):
+        bucket = self._user_buckets.get(user_key)
+        if bucket is None:
+            bucket = self._user_buckets[user_key] = TokenBucket(self.user_rate, self.user_burst)
+            if len(self._user_buckets) > self.max_tracked_users:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_key)
+        return bucket
+
+    def reject(self, status_code, reason, retry_after, detail):
+        ADMISSION_REQUESTS.labels(self.name, reason).inc()
+        raise HTTPException(status_code=status_code, detail=detail,
+                            headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+    async def _acquire_slot(self):
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return True
+        # Slots are handed to waiters in arrival order by _release_slot
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.target_delay)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def _release_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self, user_key):
+        """
+        Hold a slot for the body of the block, or raise HTTPException 429 when
+        the user is over their rate and 503 when the endpoint is overloaded.
+        """
+        if not self.enabled:
+            yield
+            return
+        wait = self.user_bucket(user_key).try_acquire()
+        if wait:
+            self.reject(429, 'user_rate', wait, "Too many requests, please retry later")
+        wait = self.global_bucket.try_acquire()
+        if wait:
+            self.reject(503, 'global_rate', wait, "Service is busy, please retry later")
+        if not await self._acquire_slot():
+            self.reject(503, 'queue_timeout', self.target_delay, "Service is busy, please retry later")
+        ADMISSION_REQUESTS.labels(self.name, 'admitted').inc()
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+
+async def request_user_key(request: FARequest, verifier=None):
+    """
+    Who to charge a request to: the user of a verified Bearer token, else
+    the client address. Request bodies are never trusted for this, so a
+    client cannot spread its requests over made-up user ids.
+    """
+    access_token = bearer_token(request)
+    if verifier is not None and access_token:
+        try:
+            user = await verifier.verify(access_token)
+            return f"user:{user['user_id']}"
+        except Exception:
+            pass
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def admission_dependency(controller, verifier=None):
+    """
+    FastAPI dependency admitting requests through `controller`, e.g.
+    `@router.post("/gen-tasks", dependencies=[Depends(admission_dependency(gen_tasks_admission))])`.
+    """
+    async def admit(request: FARequest):
+        async with controller.admit(await request_user_key(request, verifier)):
+            yield
+    return admit
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Optional
+
+import jwt
+import requests
+from fastapi import HTTPException
+from fastapi import Request as FARequest
+
+from resilience import dependency
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_AUDIENCE = 'authenticated'
+ASYMMETRIC_ALGORITHMS = {'RS256', 'ES256', 'EdDSA'}
+JWKS_TTL_SECONDS = 10 * 60
+# Unknown key ids trigger a JWKS refetch, but no more often than this
+JWKS_MIN_REFRESH_SECONDS = 30
+
+
+def user_from_claims(claims: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "user_id": claims['sub'],
+        "email": claims.get('email'),
+        "provider": (claims.get('app_metadata') or {}).get('provider')
+    }
+
+
+class SupabaseTokenVerifier:
+    """
+    Verifies Supabase access tokens locally: HS256 tokens with the project's
+    JWT secret, asymmetric tokens against the cached JWKS (refetched on key
+    rotation). Only tokens we cannot check locally go to Supabase Auth.
+    """
+
+    def __init__(self, supabase_url: Optional[str] = None, jwt_secret: Optional[str] = None,
+                 remote_get_user: Optional[Callable] = None, fetch_jwks: Optional[Callable] = None,
+                 clock=time.monotonic):
+        self.supabase_url = supabase_url or os.getenv("SUPABASE_URL")
+        self.jwt_secret = jwt_secret or os.getenv("SUPABASE_JWT_SECRET")
+        self.remote_get_user = remote_get_user
+        self._fetch_jwks = fetch_jwks or self._fetch_jwks_http
+        self._clock = clock
+        self._keys: Dict[str, jwt.PyJWK] = {}
+        self._keys_fetched_at = None
+        self._lock = asyncio.Lock()
+
+    def _fetch_jwks_http(self) -> Dict[str, Any]:
+        response = requests.get(f"{self.supabase_url}/auth/v1/.well-known/jwks.json",
+                                timeout=dependency('supabase').timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def _refresh_keys(self):
+        jwks = await dependency('supabase').call('auth.jwks', self._fetch_jwks)
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            try:
+                keys[jwk['kid']] = jwt.PyJWK(jwk)
+            except (KeyError, jwt.PyJWKError) as e:
+                logger.warning("Skipping unusable JWKS key: %s", e)
+        self._keys = keys
+        self._keys_fetched_at = self._clock()
+
+    async def signing_key(self, kid: Optional[str]) -> Optional[jwt.PyJWK]:
+        async with self._lock:
+            now = self._clock()
+            age = None if self._keys_fetched_at is None else now - self._keys_fetched_at
+            if age is None or age > JWKS_TTL_SECONDS or (kid not in self._keys and age > JWKS_MIN_REFRESH_SECONDS):
+                await self._refresh_keys()
+            return self._keys.get(kid)
+
+    async def verify_remote(self, access_token: str) -> Dict[str, Any]:
+        if self.remote_get_user is None:
+            raise jwt.InvalidTokenError("Token cannot be verified locally")
+        response = await dependency('supabase').call('auth.get_user', self.remote_get_user, access_token)
+        user = response.user
+        if not user:
+            raise jwt.InvalidTokenError("User not found")
+        return {
+            "user_id": user.id,
+            "email": user.email,
+            "provider": user.app_metadata.get("provider")
+        }
+
+    async def verify(self, access_token: str) -> Dict[str, Any]:
+        """
+        Return user id, email and provider for a valid token. Raises
+        jwt.InvalidTokenError for bad signatures, expired or malformed tokens.
+        """
+        header = jwt.get_unverified_header(access_token)
+        algorithm = header.get('alg')
+
+        if algorithm == 'HS256':
+            if not self.jwt_secret:
+                return await self.verify_remote(access_token)
+            key = self.jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            key = await self.signing_key(header.get('kid'))
+            if key is None:
+                logger.info("Unknown signing key %s, verifying with Supabase Auth", header.get('kid'))
+                return await self.verify_remote(access_token)
+        else:
+            raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+        claims = jwt.decode(access_token, key, algorithms=[algorithm], audience=SUPABASE_AUDIENCE,
+                            options={"require": ["exp", "sub"]})
+        return user_from_claims(claims)
+
+
+def bearer_token(request: FARequest) -> Optional[str]:
+    authorization = request.headers.get('Authorization', '')
+    if authorization.lower().startswith('bearer '):
+        return authorization[7:].strip()
+    return request.query_params.get('access_token')
+
+
+def user_dependency(verifier: SupabaseTokenVerifier):
+    """
+    Build a FastAPI dependency that resolves the caller from a Bearer token
+    (or `access_token` query parameter) and rejects the request with 401 otherwise.
+    """
+    async def current_user(request: FARequest) -> Dict[str, Any]:
+        access_token = bearer_token(request)
+        if not access_token:
+            raise HTTPException(status_code=401, detail="Missing access token")
+        try:
+            return await verifier.verify(access_token)
+        except jwt.InvalidTokenError as e:
+            raise HTTPException(status_code=401, detail=f"Invalid access token: {str(e)}")
+    return current_user
@@ -0,0 +1,186 @@
+"""
+Microbenchmarks for the CPU-bound hot paths, with stored baselines and a
+threshold-based regression check.
+
+    python -m benchmarks.suite                  # run and compare to baselines
+    python -m benchmarks.suite --size extreme   # 52-week projects, 10k events, 5k pages
+    python -m benchmarks.suite --save           # record new baselines
+
+Timings are stored relative to a fixed pure-Python calibration loop run on
+the same machine, so baselines recorded on a laptop still mean something in CI.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from loadtest.fakes import FakePostgREST, gemini_project, make_events, make_notion_pages, seed_projects
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+# Fail when a benchmark is more than twice its baseline; shared CI runners are noisy
+DEFAULT_THRESHOLD = 1.0
+SIZES = {
+    'realistic': {'weeks': 12, 'events': 500, 'pages': 300},
+    'extreme': {'weeks': 52, 'events': 10000, 'pages': 5000},
+}
+TASKS_PER_WEEK = {'realistic': 3, 'extreme': 10}
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # Returns fresh arguments for one round; not timed
+    setup: Callable[[], tuple]
+    run: Callable
+
+
+def project_rows(weeks, tasks_per_week):
+    postgrest = FakePostgREST(seed_projects(projects=1, weeks=weeks, tasks_per_week=tasks_per_week))
+    return postgrest.select('projects', 'project_id, project_name, description, category, '
+                                        'tasks(task_id, week_no, task_no, task)', {})[0]
+
+
+def build_benchmarks(size):
+    from models import EventRequest, ProjectResponse
+    from routes.projects import build_tasks_response
+    from calendars.get_available_slots import build_day_blocks, normalize_event
+    from calendars.notioncal_access import process_page
+    from calendars.timezones import get_zone
+
+    dims = SIZES[size]
+    tasks_per_week = TASKS_PER_WEEK[size]
+
+    project = project_rows(dims['weeks'], tasks_per_week)
+
+    gemini_text = json.dumps(gemini_project(dims['weeks'], tasks_per_week))
+
+    def generate_tasks_parse(text):
+        gemini_data = json.loads(text)
+        gemini_data['tasks'] = [{**task, 'project_id': 1} for task in gemini_data['tasks']]
+        return ProjectResponse(**gemini_data, project_id=1)
+
+    tz = get_zone('America/Los_Angeles')
+    start = datetime(2024, 7, 15, tzinfo=timezone.utc)
+    events = [normalize_event(event, tz) for event in make_events(dims['events'], start=start)]
+    range_start = datetime(2024, 7, 15, tzinfo=tz)
+    range_end = max(event['end'] for event in events).replace(hour=0, minute=0) + timedelta(days=1)
+
+    pages = make_notion_pages(dims['pages'])
+    titles = {f"project{i}": f"Project {i}" for i in range(5)}
+
+    # The zone name is checked against the registry, not by walking tzdata
+    event_request = {'summary': 'Team Meeting', 'start_time': datetime(2024, 7, 20, 19, 0),
+                     'end_time': datetime(2024, 7, 20, 19, 30), 'timezone': 'America/Los_Angeles'}
+
+    return [
+        Benchmark('get_tasks.week_grouping', lambda: (copy.deepcopy(project),), build_tasks_response),
+        Benchmark('generate_tasks.parse', lambda: (gemini_text,), generate_tasks_parse),
+        Benchmark('get_calendar_blocks.day_blocks', lambda: (events, range_start, range_end, tz), build_day_blocks),
+        Benchmark('notioncal_access.process_page', lambda: (pages, titles),
+                  lambda pages, titles: [process_page(page, titles) for page in pages]),
+        Benchmark('schedule_task.validation', lambda: (event_request,), lambda fields: EventRequest(**fields)),
+    ]
+
+
+def calibration_loop():
+    total = 0
+    for i in range(200000):
+        total += i * i % 7
+    return total
+
+
+def measure(setup, run, rounds=5, min_time=0.05):
+    """
+    Best seconds per call over `rounds` rounds; like timeit, the minimum is
+    the least disturbed by other work on the machine. Each round repeats the
+    call until it has taken at least `min_time`, with fresh arguments per call.
+    """
+    samples = []
+    for _ in range(rounds):
+        calls, elapsed = 0, 0.0
+        while elapsed < min_time:
+            args = setup()
+            started = time.perf_counter()
+            run(*args)
+            elapsed += time.perf_counter() - started
+            calls += 1
+        samples.append(elapsed / calls)
+    return min(samples)
+
+
+def run_suite(size='realistic', rounds=5, min_time=0.05):
+    """
+    Returns {benchmark name: {'seconds': ..., 'relative': ...}} for one size.
+    """
+    calibration = measure(lambda: (), calibration_loop, rounds, min_time)
+    results = {}
+    for benchmark in build_benchmarks(size):
+        seconds = measure(benchmark.setup, benchmark.run, rounds, min_time)
+        results[f"{benchmark.name}[{size}]"] = {'seconds': seconds, 'relative': seconds / calibration}
+    return results
+
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(results, path=BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines.update({name: float(f"{result['relative']:.4g}") for name, result in results.items()})
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def find_regressions(results, baselines, threshold=DEFAULT_THRESHOLD):
+    """
+    Benchmarks slower than their baseline by more than `threshold` (1.0 = twice as slow).
+    """
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline and result['relative'] > baseline * (1 + threshold):
+            regressions.append((name, baseline, result['relative']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the hot path microbenchmarks")
+    parser.add_argument('--size', choices=[*SIZES, 'all'], default='realistic')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.getenv('BENCHMARK_THRESHOLD', DEFAULT_THRESHOLD)))
+    parser.add_argument('--save', action='store_true', help="store the results as the new baselines")
+    args = parser.parse_args()
+
+    results = {}
+    for size in (SIZES if args.size == 'all' else [args.size]):
+        results.update(run_suite(size, args.rounds))
+
+    baselines = load_baselines()
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        change = f"{(result['relative'] / baseline - 1) * 100:+.0f}%" if baseline else 'no baseline'
+        print(f"{name:<48}{result['seconds'] * 1000:>10.3f} ms  {result['relative']:>10.4g}x  {change}")
+
+    if args.save:
+        save_baselines(results)
+        print(f"Saved baselines to {BASELINES_PATH}")
+        return
+
+    regressions = find_regressions(results, baselines, args.threshold)
+    for name, baseline, relative in regressions:
+        print(f"REGRESSION {name}: {relative:.4g}x vs baseline {baseline:.4g}x")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
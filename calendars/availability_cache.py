@@ -0,0 +1,131 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Push notifications tell us when a watched calendar changes, so its entries
+# can live long; other calendars are only cached briefly
+DEFAULT_TTL_SECONDS = int(os.getenv('AVAILABILITY_CACHE_TTL_SECONDS', str(24 * 60 * 60)))
+UNWATCHED_TTL_SECONDS = int(os.getenv('AVAILABILITY_UNWATCHED_TTL_SECONDS', '60'))
+# Shared by the worker processes on a host, so a push notification received by
+# one worker reaches the channels and cached availability of all of them. It is
+# not shared between hosts: with several machines (fly.toml lets Fly start
+# more), a notification is only honoured by the machine that opened the
+# channel, and may be routed to another, leaving the opener's entries stale
+# for up to AVAILABILITY_CACHE_TTL_SECONDS. Run one machine, or lower that TTL.
+CALENDAR_STATE_PATH = os.getenv('CALENDAR_STATE_PATH', 'calendars/creds/calendar_state.db')
+
+
+def connect_state_db(path):
+    if path != ':memory:':
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+    if path != ':memory:':
+        # Readers in one worker do not wait on a writer in another
+        conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class CalendarVersions:
+    """
+    A counter per user, bumped whenever their calendar reports a change.
+    Opened lazily, like the other local stores.
+    """
+
+    def __init__(self, path=CALENDAR_STATE_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = connect_state_db(self.path)
+            with self._conn:
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS calendar_versions (
+                        user_id TEXT PRIMARY KEY,
+                        version INTEGER NOT NULL
+                    )
+                """)
+        return self._conn
+
+    def get(self, user_id):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT version FROM calendar_versions WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, user_id):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT INTO calendar_versions VALUES (?, 1) "
+                    "ON CONFLICT (user_id) DO UPDATE SET version = version + 1", (user_id,)
+                )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class AvailabilityCache:
+    """
+    Per-user cache of computed availability. Entries for watched calendars
+    expire after `ttl_seconds` and are dropped for a user as soon as their
+    calendar reports a change; others expire after `unwatched_ttl_seconds`.
+
+    Entries live in this process, but with `versions` (a CalendarVersions)
+    each one is tagged with the user's version when it was computed, so an
+    invalidation in any worker makes every worker's entries stale. Read the
+    version before fetching and pass it to `set`, so a change that arrives
+    mid-fetch is not cached over.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic, versions=None,
+                 unwatched_ttl_seconds=UNWATCHED_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.unwatched_ttl_seconds = unwatched_ttl_seconds
+        self.versions = versions
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def version(self, user_id):
+        return self.versions.get(user_id) if self.versions is not None else 0
+
+    def get(self, user_id, key, version=None):
+        if version is None:
+            version = self.version(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id, {}).get(key)
+            if entry is None:
+                return None
+            expires_at, entry_version, value = entry
+            if expires_at <= self._clock() or entry_version != version:
+                del self._entries[user_id][key]
+                return None
+            return value
+
+    def set(self, user_id, key, value, version=None, watched=True):
+        """
+        `watched` says whether a live push channel covers the calendars the
+        value was computed from, so a change would invalidate it.
+        """
+        if version is None:
+            version = self.version(user_id)
+        ttl_seconds = self.ttl_seconds if watched else self.unwatched_ttl_seconds
+        with self._lock:
+            self._entries.setdefault(user_id, {})[key] = (self._clock() + ttl_seconds, version, value)
+
+    def invalidate(self, user_id):
+        if self.versions is not None:
+            self.versions.bump(user_id)
+        with self._lock:
+            return len(self._entries.pop(user_id, {}))
+
+
+availability_cache = AvailabilityCache(versions=CalendarVersions())
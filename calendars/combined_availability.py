@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+
+from dateutil import parser
+
+from calendars.gcal_access import get_calendar_service
+from calendars.get_available_slots import build_day_blocks, fetch_busy_events, get_calendar_timezone
+from calendars.notioncal_access import iter_calendar_events
+from calendars.push_channels import channel_registry
+from calendars.timezones import get_zone
+
+
+def normalize_notion_event(event, tz):
+    """
+    Turn a processed Notion session into a busy interval, or None when it has
+    no time of day (date-only entries are tasks, not blocked time).
+    """
+    start = event.get('start')
+    if not start or 'T' not in start:
+        return None
+    start_dt = parser.parse(start)
+    start_dt = start_dt.replace(tzinfo=tz) if start_dt.tzinfo is None else start_dt.astimezone(tz)
+
+    end = event.get('end')
+    if end and 'T' in end:
+        end_dt = parser.parse(end)
+        end_dt = end_dt.replace(tzinfo=tz) if end_dt.tzinfo is None else end_dt.astimezone(tz)
+    elif isinstance(event.get('hours_spent'), (int, float)) and event['hours_spent'] > 0:
+        end_dt = start_dt + timedelta(hours=event['hours_spent'])
+    else:
+        return None
+
+    return {'start': start_dt, 'end': end_dt, 'summary': event.get('name') or 'Busy', 'event_type': 'notion'}
+
+
+def merge_busy_events(events):
+    """
+    Single sweep over the start-sorted events, folding overlapping ones into
+    one busy block whose name lists everything it covers.
+    """
+    merged = []
+    for event in sorted(events, key=lambda x: x['start']):
+        if merged and event['start'] < merged[-1]['end']:
+            current = merged[-1]
+            current['end'] = max(current['end'], event['end'])
+            current['summary'] = f"{current['summary']}, {event['summary']}"
+            if current['event_type'] != event['event_type']:
+                current['event_type'] = 'mixed'
+        else:
+            merged.append(dict(event))
+    return merged
+
+
+async def get_combined_availability(start_date, end_date, notion_database_id, notion_token=None,
+                                    calendar_ids=None, use_freebusy=False, user_id='default', cache=None,
+                                    channels=channel_registry, store=None):
+    """
+    Availability across Google Calendar and a Notion sessions database. Both
+    sources are fetched concurrently and merged into one set of day blocks.
+    The Google side is kept in `cache` (an AvailabilityCache) until the
+    user's calendar push channel reports a change, or only briefly when
+    `channels` has no live channel for the calendars; Notion sends no such
+    notifications, so it is always read. With `store` (an EventStore) the
+    calendar is read from the local copy after pulling its changes.
+    """
+    notion_token = notion_token or os.getenv("NOTION_API_KEY")
+    cache_key = (start_date.isoformat(), end_date.isoformat(), tuple(calendar_ids or ['primary']), use_freebusy)
+
+    async def google():
+        if cache is not None:
+            version = await asyncio.to_thread(cache.version, user_id)
+            cached = cache.get(user_id, cache_key, version)
+            if cached is not None:
+                return cached
+        service = await get_calendar_service()
+        timezone = await get_calendar_timezone(service, user_id)
+        tz = get_zone(timezone)
+        busy = await fetch_busy_events(service, tz, start_date.replace(tzinfo=tz), end_date.replace(tzinfo=tz),
+                                       user_id=user_id, store=store, calendar_ids=calendar_ids,
+                                       use_freebusy=use_freebusy)
+        if cache is not None:
+            watched = await asyncio.to_thread(channels.watched, user_id, calendar_ids or ['primary'])
+            cache.set(user_id, cache_key, (timezone, busy), version, watched=watched)
+        return timezone, busy
+
+    async def notion():
+        return [event async for event in iter_calendar_events(
+            notion_database_id, notion_token,
+            start_date=start_date.date().isoformat(), end_date=end_date.date().isoformat()
+        )]
+
+    (timezone, google_busy), notion_events = await asyncio.gather(google(), notion())
+
+    tz = get_zone(timezone)
+    notion_busy = [busy for busy in (normalize_notion_event(e, tz) for e in notion_events) if busy]
+
+    result = {
+        'timezone': timezone,
+        'time_format': '24hr',
+        'available_blocks': build_day_blocks(merge_busy_events(google_busy + notion_busy),
+                                             start_date.replace(tzinfo=tz), end_date.replace(tzinfo=tz), tz)
+    }
+    return json.dumps(result, indent=2)
+
+
+async def main():
+    available_slots = await get_combined_availability(datetime(2024, 7, 16), datetime(2024, 7, 21),
+                                                      '4224be63c6504eadb8c66ab241fcfd46')
+    print(available_slots)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from datetime import timezone
+
+from dateutil import parser
+
+from resilience import dependency
+
+DEFAULT_DB_PATH = os.getenv('EVENT_STORE_PATH', 'calendars/creds/events.db')
+DAY_SECONDS = 24 * 60 * 60
+
+
+class SyncTokenExpired(Exception):
+    """Raised when Google answers 410 Gone and a full sync is required."""
+
+
+def _event_bounds(event):
+    start = event.get('start', {})
+    end = event.get('end', {})
+    all_day = 'dateTime' not in start
+    start_dt = parser.parse(start.get('dateTime', start.get('date')))
+    end_dt = parser.parse(end.get('dateTime', end.get('date')))
+    if all_day:
+        start_dt = start_dt.replace(tzinfo=timezone.utc)
+        end_dt = end_dt.replace(tzinfo=timezone.utc)
+    return start_dt.timestamp(), end_dt.timestamp(), all_day
+
+
+class EventStore:
+    """
+    Local copy of users' Google Calendar events, kept current with sync tokens.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS events (
+                    user_id TEXT NOT NULL,
+                    calendar_id TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    start_ts REAL NOT NULL,
+                    end_ts REAL NOT NULL,
+                    all_day INTEGER NOT NULL,
+                    body TEXT NOT NULL,
+                    PRIMARY KEY (user_id, calendar_id, event_id)
+                );
+                CREATE INDEX IF NOT EXISTS events_by_start ON events (user_id, calendar_id, start_ts);
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    user_id TEXT NOT NULL,
+                    calendar_id TEXT NOT NULL,
+                    sync_token TEXT,
+                    PRIMARY KEY (user_id, calendar_id)
+                );
+            """)
+
+    def get_sync_token(self, user_id, calendar_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sync_token FROM sync_state WHERE user_id = ? AND calendar_id = ?",
+                (user_id, calendar_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def reset(self, user_id, calendar_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE user_id = ? AND calendar_id = ?", (user_id, calendar_id))
+            self._conn.execute("DELETE FROM sync_state WHERE user_id = ? AND calendar_id = ?", (user_id, calendar_id))
+
+    def apply_changes(self, user_id, calendar_id, items, next_sync_token):
+        upserts = []
+        deletes = []
+        for event in items:
+            if event.get('status') == 'cancelled' or 'start' not in event:
+                deletes.append((user_id, calendar_id, event['id']))
+                continue
+            start_ts, end_ts, all_day = _event_bounds(event)
+            upserts.append((user_id, calendar_id, event['id'], start_ts, end_ts, int(all_day), json.dumps(event)))
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM events WHERE user_id = ? AND calendar_id = ? AND event_id = ?", deletes
+            )
+            self._conn.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", upserts)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (user_id, calendar_id, next_sync_token)
+            )
+
+    def events_between(self, user_id, calendar_id, start=None, end=None):
+        """
+        Return stored events overlapping [start, end), ordered by start time.
+        All-day events are matched with a day of slack since their zone is unknown.
+        """
+        query = "SELECT body FROM events WHERE user_id = ? AND calendar_id = ?"
+        params = [user_id, calendar_id]
+        if end is not None:
+            query += " AND start_ts < ? + all_day * ?"
+            params += [end.timestamp(), DAY_SECONDS]
+        if start is not None:
+            query += " AND end_ts > ? - all_day * ?"
+            params += [start.timestamp(), DAY_SECONDS]
+        query += " ORDER BY start_ts"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+_store = None
+
+
+def get_event_store():
+    global _store
+    if _store is None:
+        _store = EventStore()
+    return _store
+
+
+def close_event_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
+
+
+def list_changes(fetch_page, sync_token=None):
+    """
+    Page through events().list. Without a sync token this is a full listing;
+    with one only changes (including cancellations) since that token are returned.
+    """
+    params = {'singleEvents': True}
+    if sync_token:
+        params['syncToken'] = sync_token
+    items = []
+    while True:
+        response = fetch_page(params)
+        items.extend(response.get('items', []))
+        if 'nextPageToken' in response:
+            params['pageToken'] = response['nextPageToken']
+        else:
+            return items, response.get('nextSyncToken')
+
+
+def service_page_fetcher(service, calendar_id):
+    from googleapiclient.errors import HttpError
+
+    def fetch_page(params):
+        try:
+            return dependency('google_calendar').call_sync(
+                'events.list', lambda: service.events().list(calendarId=calendar_id, **params).execute())
+        except HttpError as e:
+            if e.resp.status == 410:
+                raise SyncTokenExpired() from e
+            raise
+    return fetch_page
+
+
+async def sync_events(store, fetch_page, user_id, calendar_id='primary'):
+    """
+    Bring the local store up to date for one calendar, falling back to a full
+    sync when there is no token yet or Google has invalidated it. SQLite is
+    blocking, so store calls run in a worker thread like the API calls do.
+    """
+    sync_token = await asyncio.to_thread(store.get_sync_token, user_id, calendar_id)
+    try:
+        items, next_sync_token = await asyncio.to_thread(list_changes, fetch_page, sync_token)
+    except SyncTokenExpired:
+        await asyncio.to_thread(store.reset, user_id, calendar_id)
+        sync_token = None
+        items, next_sync_token = await asyncio.to_thread(list_changes, fetch_page)
+    if not sync_token:
+        await asyncio.to_thread(store.reset, user_id, calendar_id)
+    await asyncio.to_thread(store.apply_changes, user_id, calendar_id, items, next_sync_token)
@@ -1,35 +1,60 @@
 import asyncio
 import os.path
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.http import HttpRequest
-import aiohttp
+from resilience import dependency
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
+# Relative to the repo root, where both entry points are run from
+TOKEN_PATH = 'calendars/creds/token.json'
 
 
 async def get_calendar_service():
+    # The Google client libraries are slow to import, so load them on first use
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.http import HttpRequest
+    from google_auth_httplib2 import AuthorizedHttp
+    import httplib2
+
     creds = None
     # The file token.json stores the user's access and refresh tokens
-    if os.path.exists('creds/token.json'):
-        creds = Credentials.from_authorized_user_file('creds/token.json', SCOPES)
+    if os.path.exists(TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
     # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            asyncio.to_thread(creds.refresh, Request())
+            await dependency('google_oauth').call('refresh', creds.refresh, Request())
         else:
             flow = InstalledAppFlow.from_client_secrets_file(
                 '/Users/hp/Documents/projects/lyfe/calendars/creds/gcal_creds.json', SCOPES)
             creds = await asyncio.to_thread(flow.run_local_server, port=0)
         # Save the credentials for the next run
-        with open('creds/token.json', 'w') as token:
+        with open(TOKEN_PATH, 'w') as token:
             token.write(creds.to_json())
 
     async def wrapped_request(request):
         return await asyncio.to_thread(request.execute)
 
-    return build('calendar', 'v3', credentials=creds, requestBuilder=HttpRequest)
+    # Calls are abandoned after the dependency timeout; the socket timeout
+    # frees the worker thread still blocked on them
+    http = AuthorizedHttp(creds, http=httplib2.Http(timeout=dependency('google_calendar').timeout))
+    return build('calendar', 'v3', http=http, requestBuilder=HttpRequest)
+
+
+async def get_calendar_service_for_token(access_token):
+    """
+    A Calendar service acting as the user whose Google OAuth access token
+    this is (the provider token of a Google sign-in), instead of the app's
+    stored credentials.
+    """
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+    from googleapiclient.http import HttpRequest
+    from google_auth_httplib2 import AuthorizedHttp
+    import httplib2
+
+    http = AuthorizedHttp(Credentials(token=access_token),
+                          http=httplib2.Http(timeout=dependency('google_calendar').timeout))
+    return build('calendar', 'v3', http=http, requestBuilder=HttpRequest)
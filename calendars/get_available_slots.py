@@ -1,53 +1,75 @@
 from datetime import datetime, time, timedelta
-import pytz
 import asyncio
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from dateutil import parser
 import json
 
 from calendars.gcal_access import get_calendar_service
+from calendars.event_store import service_page_fetcher, sync_events
+from calendars.timezones import get_zone, user_timezone_cache
+from resilience import dependency
+
+
+def merge_intervals(intervals):
+    """
+    Merge overlapping or touching (start, end) intervals into a sorted list.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+async def get_busy_intervals(service, calendar_ids, start_date, end_date, timezone='UTC'):
+    """
+    Query the freeBusy endpoint for several calendars in one call and return
+    the merged busy intervals as timezone-aware datetimes.
+    """
+    freebusy = await dependency('google_calendar').call(
+        'freebusy.query', lambda: service.freebusy().query(body={
+            'timeMin': start_date.isoformat(),
+            'timeMax': end_date.isoformat(),
+            'timeZone': timezone,
+            'items': [{'id': calendar_id} for calendar_id in calendar_ids],
+        }).execute()
+    )
 
+    intervals = []
+    for calendar_id, calendar in freebusy.get('calendars', {}).items():
+        if calendar.get('errors'):
+            reasons = ', '.join(error.get('reason', 'unknown') for error in calendar['errors'])
+            raise Exception(f"Failed to fetch free/busy for calendar {calendar_id}: {reasons}")
+        intervals.extend(
+            (parser.parse(busy['start']), parser.parse(busy['end']))
+            for busy in calendar.get('busy', [])
+        )
+    return merge_intervals(intervals)
+
+
+def normalize_event(event, tz):
+    return {
+        'start': parser.parse(event['start'].get('dateTime', event['start'].get('date'))).astimezone(tz),
+        'end': parser.parse(event['end'].get('dateTime', event['end'].get('date'))).astimezone(tz),
+        'summary': event.get('summary', 'Busy'),
+        'event_type': event.get('eventType', 'default')
+    }
 
-async def get_calendar_blocks(start_date, end_date, timezone='UTC'):
-    service = await get_calendar_service()
-    # Call the Calendar API to get user's preferred timezone
-    calendar_list_entry = await asyncio.to_thread(
-        lambda: service.calendarList().get(calendarId='primary').execute()
-    )
-    timezone = calendar_list_entry['timeZone']
-    tz = pytz.timezone(timezone)
-    start_date = tz.localize(start_date)
-    end_date = tz.localize(end_date)
-
-    events_result = await asyncio.to_thread(
-        lambda: service.events().list(
-            calendarId='primary',
-            timeMin=start_date.isoformat(),
-            timeMax=end_date.isoformat(),
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-    )
-    events = events_result.get('items', [])
 
+def build_day_blocks(busy_events, start_date, end_date, tz):
+    """
+    Split the date range into per-day lists of available and busy blocks.
+    `busy_events` are normalized events with timezone-aware start/end.
+    """
     calendar_blocks = {}
     current_date = start_date.date()
     while current_date <= end_date.date():
-        day_start = tz.localize(datetime.combine(current_date, time(0, 0)))
+        day_start = datetime.combine(current_date, time(0, 0), tzinfo=tz)
         day_end = day_start + timedelta(days=1)
 
-        day_events = [
-            {
-                'start': parser.parse(event['start'].get('dateTime', event['start'].get('date'))).astimezone(tz),
-                'end': parser.parse(event['end'].get('dateTime', event['end'].get('date'))).astimezone(tz),
-                'summary': event.get('summary', 'Busy'),
-                'event_type': event.get('eventType', 'default')
-            }
-            for event in events
-            if parser.parse(event['start'].get('dateTime', event['start'].get('date'))).astimezone(
-                tz).date() == current_date
-        ]
+        day_events = [event for event in busy_events if event['start'].date() == current_date]
 
         day_blocks = []
         last_time = day_start
@@ -87,13 +109,81 @@ async def get_calendar_blocks(start_date, end_date, timezone='UTC'):
         calendar_blocks[current_date.isoformat()] = day_blocks
         current_date += timedelta(days=1)
 
+    return calendar_blocks
+
+
+async def get_calendar_timezone(service, user_id='default', cache=user_timezone_cache):
+    # The user's preferred timezone, from calendarList().get unless recently cached
+    return await cache.resolve(service, user_id)
+
+
+async def fetch_busy_events(service, tz, start_date, end_date, user_id='default', store=None,
+                            calendar_ids=None, use_freebusy=False):
+    """
+    Normalized busy events for the localized range, from freeBusy, the local
+    event store or a plain events().list call.
+    """
+    if use_freebusy:
+        intervals = await get_busy_intervals(service, calendar_ids or ['primary'], start_date, end_date, tz.key)
+        return [
+            {'start': start.astimezone(tz), 'end': end.astimezone(tz), 'summary': 'Busy', 'event_type': 'default'}
+            for start, end in intervals
+        ]
+
+    if store is not None:
+        # Pull only the changes since the last sync and read the range locally
+        events = []
+        for calendar_id in calendar_ids or ['primary']:
+            await sync_events(store, service_page_fetcher(service, calendar_id), user_id, calendar_id)
+            events += await asyncio.to_thread(store.events_between, user_id, calendar_id, start_date, end_date)
+    else:
+        events_result = await dependency('google_calendar').call(
+            'events.list', lambda: service.events().list(
+                calendarId='primary',
+                timeMin=start_date.isoformat(),
+                timeMax=end_date.isoformat(),
+                singleEvents=True,
+                orderBy='startTime'
+            ).execute()
+        )
+        events = events_result.get('items', [])
+    return [normalize_event(event, tz) for event in events]
+
+
+async def get_calendar_blocks(start_date, end_date, timezone='UTC', user_id='default', store=None,
+                              calendar_ids=None, use_freebusy=False, cache=None):
+    """
+    With `use_freebusy` only busy intervals are fetched, for every calendar in
+    `calendar_ids` (default: primary), and merged into unnamed busy blocks.
+    Results are kept in `cache` (an AvailabilityCache) until the user's
+    calendar push channel reports a change.
+    """
+    cache_key = (start_date.isoformat(), end_date.isoformat(), tuple(calendar_ids or ['primary']), use_freebusy)
+    if cache is not None:
+        version = await asyncio.to_thread(cache.version, user_id)
+        cached = cache.get(user_id, cache_key, version)
+        if cached is not None:
+            return cached
+
+    service = await get_calendar_service()
+    timezone = await get_calendar_timezone(service, user_id)
+    tz = get_zone(timezone)
+    start_date = start_date.replace(tzinfo=tz)
+    end_date = end_date.replace(tzinfo=tz)
+
+    busy_events = await fetch_busy_events(service, tz, start_date, end_date, user_id, store,
+                                          calendar_ids, use_freebusy)
+
     result = {
         'timezone': timezone,
         'time_format': '24hr',
-        'available_blocks': calendar_blocks
+        'available_blocks': build_day_blocks(busy_events, start_date, end_date, tz)
     }
 
-    return json.dumps(result, indent=2)
+    result = json.dumps(result, indent=2)
+    if cache is not None:
+        cache.set(user_id, cache_key, result, version)
+    return result
 
 
 async def main():
@@ -0,0 +1,155 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+NO_WEEK = 0
+INITIAL_CAPACITY = 1024
+
+
+def iso_week_key(start: str) -> int:
+    if not start:
+        return NO_WEEK
+    year, week, _ = datetime.fromisoformat(start).isocalendar()
+    return year * 100 + week
+
+
+class SessionAnalytics:
+    """
+    Columnar store of Notion work sessions (hours, completion, project, ISO
+    week) keyed by page id. Aggregates are cached and only recomputed after
+    a session is added, changed or removed. `version` is the NotionStore
+    version of the database the sessions were last brought up to date with.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._hours = np.zeros(capacity, dtype=np.float64)
+        self._complete = np.zeros(capacity, dtype=bool)
+        self._project = np.zeros(capacity, dtype=np.int32)
+        self._week = np.zeros(capacity, dtype=np.int32)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._projects: List[str] = []
+        self._project_codes: Dict[str, int] = {}
+        self._summary = None
+        self.version: Optional[int] = None
+
+    def _grow(self):
+        capacity = len(self._hours) * 2
+        for name in ('_hours', '_complete', '_project', '_week', '_live'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _project_code(self, project: str) -> int:
+        code = self._project_codes.get(project)
+        if code is None:
+            code = self._project_codes[project] = len(self._projects)
+            self._projects.append(project)
+        return code
+
+    def upsert(self, events: Iterable[Dict[str, Any]]) -> int:
+        changed = 0
+        for event in events:
+            values = (
+                float(event.get('hours_spent') or 0),
+                bool(event.get('is_complete')),
+                self._project_code(event.get('project') or "No Project"),
+                iso_week_key(event.get('start')),
+            )
+            row = self._rows.get(event['id'])
+            if row is None:
+                if self._size == len(self._hours):
+                    self._grow()
+                row = self._rows[event['id']] = self._size
+                self._size += 1
+            elif self._live[row] and values == (self._hours[row], self._complete[row],
+                                                self._project[row], self._week[row]):
+                continue
+            self._hours[row], self._complete[row], self._project[row], self._week[row] = values
+            self._live[row] = True
+            changed += 1
+        if changed:
+            self._summary = None
+        return changed
+
+    def remove(self, page_ids: Iterable[str]) -> int:
+        removed = 0
+        for page_id in page_ids:
+            row = self._rows.get(page_id)
+            if row is not None and self._live[row]:
+                self._live[row] = False
+                removed += 1
+        if removed:
+            self._summary = None
+        return removed
+
+    def sync(self, events: List[Dict[str, Any]]) -> int:
+        """
+        Make the store match `events`, the full current set of sessions.
+        """
+        current = {event['id'] for event in events}
+        return self.remove(set(self._rows) - current) + self.upsert(events)
+
+    def summary(self) -> Dict[str, Any]:
+        if self._summary is None:
+            self._summary = self._aggregate()
+        return self._summary
+
+    def _aggregate(self) -> Dict[str, Any]:
+        live = self._live[:self._size]
+        hours = self._hours[:self._size][live]
+        complete = self._complete[:self._size][live]
+        project = self._project[:self._size][live]
+        week = self._week[:self._size][live]
+
+        codes, project_index = np.unique(project, return_inverse=True)
+        sessions = np.bincount(project_index, minlength=len(codes))
+        completed = np.bincount(project_index, weights=complete, minlength=len(codes))
+        total_hours = np.bincount(project_index, weights=hours, minlength=len(codes))
+
+        dated = week != NO_WEEK
+        pair_keys = project[dated].astype(np.int64) * 1_000_000 + week[dated]
+        pairs, pair_index = np.unique(pair_keys, return_inverse=True)
+        pair_hours = np.bincount(pair_index, weights=hours[dated], minlength=len(pairs))
+
+        weeks_by_project: Dict[int, List[Dict[str, Any]]] = {}
+        for key, pair_total in zip(pairs.tolist(), pair_hours.tolist()):
+            code, week_key = divmod(key, 1_000_000)
+            weeks_by_project.setdefault(code, []).append({
+                'week': f"{week_key // 100}-W{week_key % 100:02d}",
+                'hours': round(pair_total, 2)
+            })
+
+        return {
+            'projects': [
+                {
+                    'project': self._projects[code],
+                    'total_hours': round(total, 2),
+                    'sessions': int(count),
+                    'completed': int(done),
+                    'completion_rate': round(done / count, 4) if count else 0.0,
+                    'weeks': weeks_by_project.get(code, [])
+                }
+                for code, count, done, total in zip(codes.tolist(), sessions.tolist(),
+                                                    completed.tolist(), total_hours.tolist())
+            ]
+        }
+
+
+_analytics: Dict[str, SessionAnalytics] = {}
+
+
+def get_database_analytics(database_id: str, load=None) -> SessionAnalytics:
+    """
+    The process's analytics for a database. A new one is filled with the
+    sessions returned by `load()`, e.g. the database's stored events.
+    """
+    if database_id not in _analytics:
+        analytics = SessionAnalytics()
+        if load is not None:
+            analytics.upsert(load())
+        _analytics[database_id] = analytics
+    return _analytics[database_id]
@@ -0,0 +1,138 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ratelimit import TokenBucket
+from resilience import DependencyFailed, dependency
+
+# Notion allows an average of three requests per second per integration
+NOTION_RATE_PER_SECOND = 3
+NOTION_BURST = 3
+MAX_CONCURRENCY = 3
+MAX_RETRIES = 5
+BASE_DELAY_SECONDS = 0.5
+MAX_DELAY_SECONDS = 30
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(error) -> Optional[float]:
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error) -> bool:
+    from notion_client.errors import RequestTimeoutError
+
+    return isinstance(error, RequestTimeoutError) or getattr(error, 'status', None) in RETRYABLE_STATUSES
+
+
+class _Endpoint:
+    def __init__(self, limiter, endpoint, endpoint_name):
+        self._limiter = limiter
+        self._endpoint = endpoint
+        self._endpoint_name = endpoint_name
+
+    def __getattr__(self, name):
+        method = getattr(self._endpoint, name)
+
+        async def call(**kwargs):
+            return await self._limiter.call(method, operation=f"{self._endpoint_name}.{name}", **kwargs)
+        return call
+
+
+class RateLimitedNotion:
+    """
+    Wraps a notion_client.AsyncClient so that every call goes through a shared
+    token bucket and concurrency limit, and is retried with exponential backoff
+    (honouring Retry-After) on rate limiting and transient errors. Endpoints are
+    exposed the same way as on the client, e.g. `notion.pages.retrieve(...)`.
+    Each attempt goes through the `notion` dependency's timeout and circuit breaker.
+    """
+
+    def __init__(self, client, rate=NOTION_RATE_PER_SECOND, burst=NOTION_BURST,
+                 max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES,
+                 base_delay=BASE_DELAY_SECONDS, max_delay=MAX_DELAY_SECONDS, sleep=asyncio.sleep,
+                 notion_dependency=None):
+        self.client = client
+        self.dependency = notion_dependency or dependency('notion')
+        self.bucket = TokenBucket(rate, burst)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self.stats: Dict[str, float] = {
+            'requests': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'failures': 0,
+            'latency_seconds': 0.0,
+        }
+        self.databases = _Endpoint(self, client.databases, 'databases')
+        self.pages = _Endpoint(self, client.pages, 'pages')
+
+    async def call(self, method, operation='call', **kwargs) -> Any:
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            async with self.semaphore:
+                started = time.perf_counter()
+                self.stats['requests'] += 1
+                try:
+                    # Each attempt is timed on its own so retries show up as separate calls
+                    return await self.dependency.call_async(operation, method, **kwargs)
+                except DependencyFailed as e:
+                    error = e.__cause__
+                except Exception as e:
+                    error = e
+                finally:
+                    self.stats['latency_seconds'] += time.perf_counter() - started
+
+            if not is_retryable(error) or attempt >= self.max_retries:
+                self.stats['failures'] += 1
+                raise error
+
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+            if getattr(error, 'status', None) == 429:
+                self.stats['rate_limited'] += 1
+                retry_after = retry_after_seconds(error)
+                if retry_after is not None:
+                    delay = retry_after
+                # Everyone sharing the bucket backs off, not just this request
+                self.bucket.pause(delay)
+            attempt += 1
+            self.stats['retries'] += 1
+            await self._sleep(delay)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# Notion's rate limit is per integration, so every request made with a token
+# in this process shares its bucket and concurrency limit
+_limiters: Dict[str, RateLimitedNotion] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_notion_limiter(notion_token: str) -> RateLimitedNotion:
+    from notion_client import AsyncClient
+
+    with _limiters_lock:
+        limiter = _limiters.get(notion_token)
+        if limiter is None:
+            client = AsyncClient(auth=notion_token, timeout_ms=int(dependency('notion').timeout * 1000))
+            limiter = _limiters[notion_token] = RateLimitedNotion(client)
+        return limiter
+
+
+async def close_notion_limiters():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+        _limiters.clear()
+    for limiter in limiters:
+        await limiter.aclose()
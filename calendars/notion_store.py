@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+
+DEFAULT_DB_PATH = os.getenv('NOTION_STORE_PATH', 'calendars/creds/notion.db')
+
+
+class NotionStore:
+    """
+    Local copy of processed Notion calendar pages plus a last_edited_time
+    high-water mark per database sync, so refreshes only fetch edited pages,
+    and when each sync last re-read its whole range to find deleted pages.
+    Each database also has a version, bumped whenever its pages change, so
+    a process can tell whether anyone else has changed them.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS notion_pages (
+                    database_id TEXT NOT NULL,
+                    page_id TEXT NOT NULL,
+                    start TEXT,
+                    last_edited_time TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    PRIMARY KEY (database_id, page_id)
+                );
+                CREATE INDEX IF NOT EXISTS notion_pages_by_start ON notion_pages (database_id, start);
+                CREATE TABLE IF NOT EXISTS notion_sync_state (
+                    sync_key TEXT PRIMARY KEY,
+                    high_water_mark TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS notion_sweeps (
+                    sync_key TEXT PRIMARY KEY,
+                    swept_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS notion_versions (
+                    database_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                );
+            """)
+
+    def get_high_water_mark(self, sync_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT high_water_mark FROM notion_sync_state WHERE sync_key = ?", (sync_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_swept_at(self, sync_key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT swept_at FROM notion_sweeps WHERE sync_key = ?", (sync_key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get_version(self, database_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version FROM notion_versions WHERE database_id = ?", (database_id,)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def _bump_version(self, database_id):
+        self._conn.execute(
+            "INSERT INTO notion_versions VALUES (?, 1) "
+            "ON CONFLICT (database_id) DO UPDATE SET version = version + 1", (database_id,)
+        )
+
+    def apply_changes(self, database_id, sync_key, pages, high_water_mark):
+        """
+        `pages` is a list of (page_id, last_edited_time, event, deleted) tuples.
+        Returns whether any stored page changed, which bumps the version.
+        """
+        upserts = []
+        deletes = []
+        for page_id, last_edited_time, event, deleted in pages:
+            if deleted:
+                deletes.append((database_id, page_id))
+            else:
+                upserts.append((database_id, page_id, event.get('start'), last_edited_time, json.dumps(event)))
+
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("DELETE FROM notion_pages WHERE database_id = ? AND page_id = ?", deletes)
+            # Pages re-read without changes are left alone, so they do not bump the version
+            self._conn.executemany(
+                "INSERT INTO notion_pages VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (database_id, page_id) DO UPDATE SET start = excluded.start, "
+                "last_edited_time = excluded.last_edited_time, event = excluded.event "
+                "WHERE notion_pages.event != excluded.event", upserts)
+            changed = self._conn.total_changes > before
+            if changed:
+                self._bump_version(database_id)
+            if high_water_mark:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO notion_sync_state VALUES (?, ?)", (sync_key, high_water_mark)
+                )
+        return changed
+
+    def finish_sweep(self, database_id, sync_key, seen_page_ids, start_date, end_date, swept_at):
+        """
+        After re-reading every page in the range, drop stored pages in the
+        range that were not seen: they have been deleted or archived.
+        Returns the ids of the dropped pages.
+        """
+        query, params = self._range_query("SELECT page_id", database_id, start_date, end_date)
+        with self._lock, self._conn:
+            stored = [row[0] for row in self._conn.execute(query, params)]
+            missing = [page_id for page_id in stored if page_id not in seen_page_ids]
+            self._conn.executemany("DELETE FROM notion_pages WHERE database_id = ? AND page_id = ?",
+                                   [(database_id, page_id) for page_id in missing])
+            if missing:
+                self._bump_version(database_id)
+            self._conn.execute("INSERT OR REPLACE INTO notion_sweeps VALUES (?, ?)", (sync_key, swept_at))
+        return missing
+
+    def _range_query(self, select, database_id, start_date, end_date):
+        query = f"{select} FROM notion_pages WHERE database_id = ?"
+        params = [database_id]
+        if start_date:
+            query += " AND substr(start, 1, 10) >= ?"
+            params.append(start_date[:10])
+        if end_date:
+            query += " AND substr(start, 1, 10) <= ?"
+            params.append(end_date[:10])
+        return query, params
+
+    def events(self, database_id, start_date=None, end_date=None):
+        """
+        Stored events ordered by start, limited to pages whose start date
+        (YYYY-MM-DD) falls within the inclusive range.
+        """
+        query, params = self._range_query("SELECT event", database_id, start_date, end_date)
+        query += " ORDER BY start"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+_store = None
+
+
+def get_notion_store():
+    global _store
+    if _store is None:
+        _store = NotionStore()
+    return _store
+
+
+def close_notion_store():
+    global _store
+    if _store is not None:
+        _store.close()
+        _store = None
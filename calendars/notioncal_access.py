@@ -1,15 +1,22 @@
 # https://www.notion.so/c216f2e6dd6e4beabc83bbe5b1a7de36?v=50d8a5d9981a4f559e861746904cba1e&pvs=4
 # https://www.notion.so/4224be63c6504eadb8c66ab241fcfd46?v=11f52afc2a1a419bb89d6a44a1562370&pvs=4
 
+import logging
 import os
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional, Tuple
 import asyncio
-from notion_client import Client, AsyncClient
+from dataclasses import dataclass, field
 from datetime import datetime
 import json
 from dotenv import load_dotenv
+
+from calendars.notion_api import get_notion_limiter
+from calendars.notion_store import NotionStore, get_notion_store
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 # def get_calendar_events(database_id, notion_token):
 #     # Initialize the Notion client
@@ -77,83 +84,271 @@ load_dotenv()
 # print(calendar_events)
 
 
-async def get_calendar_events(database_id: str, notion_token: str) -> str:
-    async def fetch_project_title(project_id: str) -> str:
+# Project titles rarely change, so resolved titles are reused across runs
+TITLE_CACHE_TTL_SECONDS = 60 * 60
+# Database queries leave out archived pages instead of returning them marked
+# as archived, so a sync re-reads its whole range this often to find deletions
+NOTION_SWEEP_SECONDS = float(os.getenv('NOTION_SWEEP_SECONDS', str(6 * 60 * 60)))
+
+
+class RelationTitleResolver:
+    """
+    Resolves relation page ids to page titles. Each distinct id is retrieved
+    once per batch and successful lookups are cached for `ttl_seconds`.
+    """
+
+    def __init__(self, ttl_seconds: float = TITLE_CACHE_TTL_SECONDS, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._titles: Dict[str, Tuple[float, str]] = {}
+
+    async def fetch_title(self, notion, page_id: str) -> Optional[str]:
         try:
-            project_page = await notion.pages.retrieve(page_id=project_id)
-            return project_page['properties']['Name']['title'][0]['plain_text']
+            page = await notion.pages.retrieve(page_id=page_id)
+            return page['properties']['Name']['title'][0]['plain_text']
         except Exception as e:
-            print(f"Error fetching project title for ID {project_id}: {str(e)}")
-            return "Unknown Project"
-
-    async def process_page(page: Dict[str, Any]) -> Dict[str, Any]:
-        properties = page['properties']
-
-        date_property = properties.get('Date', {}).get('date', {})
-        start = date_property.get('start')
-        end = date_property.get('end')
-
-        start_dt = datetime.fromisoformat(start) if start else None
-        end_dt = datetime.fromisoformat(end) if end else None
-
-        name = properties.get('Name', {}).get('title', [{}])[0].get('plain_text', '')
-        is_complete = properties.get('Complete', {}).get('checkbox', '')
-        hours_spent = properties.get('Hours spent', {}).get('formula', '').get('number', '')
-        day_of_week = properties.get('Day of Week', {}).get('formula', '').get('string', '')
-
-        project_relation = properties.get('Projects', {}).get('relation', [])
-        project_id = project_relation[0]['id'] if project_relation else None
-        project_title = await fetch_project_title(project_id) if project_id else "No Project"
-
-        # day_of_week = start_dt.strftime('%A') if start_dt else None
-        week_number = start_dt.isocalendar()[1] if start_dt else None
-
-        return {
-            'name': name,
-            'start': start,
-            'end': end,
-            'day_of_week': day_of_week,
-            'is_complete': is_complete,
-            'project': project_title,
-            'week_number': week_number,
-            'hours_spent': hours_spent
-        }
+            logger.warning("Error fetching project title for ID %s: %s", page_id, e)
+            return None
 
-    try:
-        notion = AsyncClient(auth=notion_token)
-
-        events: List[Dict[str, Any]] = []
-        has_more = True
-        next_cursor = None
-
-        while has_more:
-            response = await notion.databases.query(
-                database_id=database_id,
-                start_cursor=next_cursor,
-                sorts=[
-                    {
-                        "property": "Date",
-                        "direction": "ascending"
-                    }
-                ]
-            )
-
-            pages = response['results']
-            events.extend(await asyncio.gather(*[process_page(page) for page in pages]))
-
-            has_more = response['has_more']
-            next_cursor = response['next_cursor']
+    async def resolve(self, notion, page_ids: Iterable[str]) -> Dict[str, str]:
+        now = self._clock()
+        titles = {}
+        missing = set()
+        for page_id in set(page_ids):
+            cached = self._titles.get(page_id)
+            if cached and cached[0] > now:
+                titles[page_id] = cached[1]
+            else:
+                missing.add(page_id)
+
+        missing = list(missing)
+        fetched = await asyncio.gather(*[self.fetch_title(notion, page_id) for page_id in missing])
+        for page_id, title in zip(missing, fetched):
+            if title is None:
+                # Failures are not cached so the next run retries them
+                titles[page_id] = "Unknown Project"
+            else:
+                self._titles[page_id] = (now + self.ttl_seconds, title)
+                titles[page_id] = title
+        return titles
+
+
+project_title_resolver = RelationTitleResolver()
+
+
+def project_relation_id(page: Dict[str, Any]) -> Optional[str]:
+    project_relation = page['properties'].get('Projects', {}).get('relation', [])
+    return project_relation[0]['id'] if project_relation else None
+
+
+def process_page(page: Dict[str, Any], project_titles: Dict[str, str]) -> Dict[str, Any]:
+    properties = page['properties']
+
+    date_property = properties.get('Date', {}).get('date', {})
+    start = date_property.get('start')
+    end = date_property.get('end')
+
+    start_dt = datetime.fromisoformat(start) if start else None
+    end_dt = datetime.fromisoformat(end) if end else None
+
+    name = properties.get('Name', {}).get('title', [{}])[0].get('plain_text', '')
+    is_complete = properties.get('Complete', {}).get('checkbox', '')
+    hours_spent = properties.get('Hours spent', {}).get('formula', '').get('number', '')
+    day_of_week = properties.get('Day of Week', {}).get('formula', '').get('string', '')
+
+    project_id = project_relation_id(page)
+    project_title = project_titles[project_id] if project_id else "No Project"
+
+    # day_of_week = start_dt.strftime('%A') if start_dt else None
+    week_number = start_dt.isocalendar()[1] if start_dt else None
+
+    return {
+        'id': page['id'],
+        'name': name,
+        'start': start,
+        'end': end,
+        'day_of_week': day_of_week,
+        'is_complete': is_complete,
+        'project': project_title,
+        'week_number': week_number,
+        'hours_spent': hours_spent
+    }
+
+
+async def process_pages(notion, pages: List[Dict[str, Any]],
+                        resolver: RelationTitleResolver) -> List[Dict[str, Any]]:
+    project_ids = [project_relation_id(page) for page in pages]
+    project_titles = await resolver.resolve(notion, [pid for pid in project_ids if pid])
+    return [process_page(page, project_titles) for page in pages]
+
+
+async def iter_calendar_events(database_id: str, notion_token: str,
+                               resolver: RelationTitleResolver = project_title_resolver,
+                               start_date: Optional[str] = None, end_date: Optional[str] = None
+                               ) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield processed events as each page of query results arrives, so callers
+    can start work before the whole database has been read. `start_date` and
+    `end_date` limit the query to sessions dated within that range.
+    """
+    notion = get_notion_limiter(notion_token)
+    query = {"database_id": database_id, "page_size": 100}
+    query_filter = build_sync_filter(None, start_date, end_date)
+    if query_filter:
+        query["filter"] = query_filter
+
+    has_more = True
+    next_cursor = None
 
+    while has_more:
+        response = await notion.databases.query(
+            start_cursor=next_cursor,
+            sorts=[
+                {
+                    "property": "Date",
+                    "direction": "ascending"
+                }
+            ],
+            **query
+        )
+
+        for event in await process_pages(notion, response['results'], resolver):
+            yield event
+
+        has_more = response['has_more']
+        next_cursor = response['next_cursor']
+
+    logger.info("Notion requests for this integration so far: %s", notion.stats)
+
+
+async def get_calendar_events(database_id: str, notion_token: str,
+                              resolver: RelationTitleResolver = project_title_resolver) -> str:
+    try:
+        events: List[Dict[str, Any]] = [
+            event async for event in iter_calendar_events(database_id, notion_token, resolver)
+        ]
         events_json = json.dumps(events, indent=2)
         return events_json
 
     except Exception as e:
         error_message = f"An error occurred while fetching calendar events: {str(e)}"
-        print(error_message)
+        logger.error(error_message)
         return json.dumps({"error": error_message})
 
-    finally:
-        await notion.aclose()
+
+def build_sync_filter(high_water_mark: Optional[str], start_date: Optional[str],
+                      end_date: Optional[str]) -> Optional[Dict[str, Any]]:
+    conditions = []
+    if high_water_mark:
+        # last_edited_time is rounded to the minute, so re-read the boundary minute
+        conditions.append({"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": high_water_mark}})
+    if start_date:
+        conditions.append({"property": "Date", "date": {"on_or_after": start_date}})
+    if end_date:
+        conditions.append({"property": "Date", "date": {"on_or_before": end_date}})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"and": conditions}
+
+
+@dataclass
+class NotionSyncResult:
+    # Processed events of the pages read by this sync, and ids of pages removed
+    changed: List[Dict[str, Any]] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    # The database's store version before the sync, and after it when no one
+    # else changed the store meanwhile (None otherwise)
+    base_version: int = 0
+    version: Optional[int] = None
+
+
+async def sync_calendar_pages(database_id: str, notion_token: str, store: NotionStore = None,
+                              start_date: Optional[str] = None, end_date: Optional[str] = None,
+                              resolver: RelationTitleResolver = project_title_resolver,
+                              sweep_seconds: float = NOTION_SWEEP_SECONDS, clock=time.time) -> NotionSyncResult:
+    """
+    Merge pages edited since the last sync of this database and date range
+    into the local store, and return what changed.
+
+    Incremental queries are not limited to the date range, so a page moved
+    out of it is still updated. The first sync, and one every
+    `sweep_seconds`, reads every page in the range instead and drops stored
+    pages that are no longer there.
+    """
+    store = store or get_notion_store()
+    sync_key = f"{database_id}:{start_date or ''}:{end_date or ''}"
+    notion = get_notion_limiter(notion_token)
+
+    base_version = await asyncio.to_thread(store.get_version, database_id)
+    bumps = 0
+    high_water_mark = await asyncio.to_thread(store.get_high_water_mark, sync_key)
+    swept_at = await asyncio.to_thread(store.get_swept_at, sync_key)
+    sweep = high_water_mark is None or swept_at is None or clock() - swept_at >= sweep_seconds
+    query = {"database_id": database_id, "page_size": 100}
+    if sweep:
+        query_filter = build_sync_filter(None, start_date, end_date)
+    else:
+        query_filter = build_sync_filter(high_water_mark, None, None)
+    if query_filter:
+        query["filter"] = query_filter
+    started_at = clock()
+    seen = set()
+    result = NotionSyncResult()
+
+    newest = high_water_mark or ''
+    has_more = True
+    next_cursor = None
+    while has_more:
+        response = await notion.databases.query(start_cursor=next_cursor, **query)
+
+        pages = response['results']
+        events = await process_pages(notion, pages, resolver)
+        changes = [(page['id'], page['last_edited_time'], event, False) for page, event in zip(pages, events)]
+        seen.update(page['id'] for page in pages)
+        result.changed.extend(events)
+        newest = max([newest] + [page['last_edited_time'] for page in pages])
+        bumps += await asyncio.to_thread(store.apply_changes, database_id, sync_key, changes, None)
+
+        has_more = response['has_more']
+        next_cursor = response['next_cursor']
+
+    if sweep:
+        result.removed = await asyncio.to_thread(store.finish_sweep, database_id, sync_key, seen, start_date, end_date,
+                                                 started_at)
+        bumps += bool(result.removed)
+        logger.info("Swept Notion database %s: %d pages, %d removed", database_id, len(seen), len(result.removed))
+    # Only advance the mark once every page has been merged, so an
+    # interrupted sync is retried from the previous mark
+    await asyncio.to_thread(store.apply_changes, database_id, sync_key, [], newest or None)
+    version = await asyncio.to_thread(store.get_version, database_id)
+    result.base_version = base_version
+    result.version = version if version == base_version + bumps else None
+
+    logger.info("Notion requests for this integration so far: %s", notion.stats)
+    return result
+
+
+async def sync_calendar_events(database_id: str, notion_token: str, store: NotionStore = None,
+                               start_date: Optional[str] = None, end_date: Optional[str] = None,
+                               resolver: RelationTitleResolver = project_title_resolver,
+                               sweep_seconds: float = NOTION_SWEEP_SECONDS, clock=time.time) -> str:
+    """
+    Incremental variant of get_calendar_events: only pages edited since the
+    last sync of this database and date range are queried and merged into
+    the local store (see sync_calendar_pages), and the result is read back
+    from the store.
+    """
+    store = store or get_notion_store()
+    try:
+        await sync_calendar_pages(database_id, notion_token, store, start_date, end_date, resolver,
+                                  sweep_seconds, clock)
+        events = await asyncio.to_thread(store.events, database_id, start_date, end_date)
+        return json.dumps(events, indent=2)
+
+    except Exception as e:
+        error_message = f"An error occurred while syncing calendar events: {str(e)}"
+        logger.error(error_message)
+        return json.dumps({"error": error_message})
 
 
 # Example usage
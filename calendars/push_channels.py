@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import os
+import secrets
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi import Request as FARequest
+from pydantic import BaseModel
+
+from calendars.availability_cache import CALENDAR_STATE_PATH, availability_cache, connect_state_db
+from calendars.gcal_access import get_calendar_service
+from resilience import dependency
+from routes.auth import current_user
+
+logger = logging.getLogger(__name__)
+
+# Google caps events.watch channels at about a week; renew well before expiry
+CHANNEL_TTL_SECONDS = 7 * 24 * 60 * 60
+RENEW_BEFORE = timedelta(hours=6)
+RENEWAL_INTERVAL_SECONDS = 60 * 60
+# A worker renewing a channel holds it this long before another may retry
+RENEWAL_LEASE_SECONDS = 10 * 60
+CHANNEL_COLUMNS = ('id', 'token', 'user_id', 'calendar_id', 'resource_id', 'expiration')
+
+
+def _channel(row):
+    channel = dict(zip(CHANNEL_COLUMNS, row))
+    channel['expiration'] = datetime.fromtimestamp(channel['expiration'], tz=timezone.utc)
+    return channel
+
+
+class ChannelRegistry:
+    """
+    The push channels we have open, keyed by channel id. Kept in SQLite shared
+    by the worker processes, so any worker can handle a channel's
+    notifications and each expiring channel is renewed by only one of them.
+    """
+
+    def __init__(self, path=CALENDAR_STATE_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = connect_state_db(self.path)
+            with self._conn:
+                self._conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS channels (
+                        id TEXT PRIMARY KEY,
+                        token TEXT NOT NULL,
+                        user_id TEXT NOT NULL,
+                        calendar_id TEXT NOT NULL,
+                        resource_id TEXT NOT NULL,
+                        expiration REAL NOT NULL,
+                        renewing_until REAL
+                    );
+                    CREATE INDEX IF NOT EXISTS channels_by_user ON channels (user_id, calendar_id);
+                    CREATE INDEX IF NOT EXISTS channels_by_expiration ON channels (expiration);
+                """)
+        return self._conn
+
+    def _select(self, where, params):
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {', '.join(CHANNEL_COLUMNS)} FROM channels WHERE {where}", params
+            ).fetchall()
+        return [_channel(row) for row in rows]
+
+    def add(self, channel):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO channels VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                    (channel['id'], channel['token'], channel['user_id'], channel['calendar_id'],
+                     channel['resource_id'], channel['expiration'].timestamp())
+                )
+
+    def get(self, channel_id):
+        channels = self._select("id = ?", (channel_id,))
+        return channels[0] if channels else None
+
+    def remove(self, channel_id):
+        channel = self.get(channel_id)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM channels WHERE id = ?", (channel_id,))
+        return channel
+
+    def for_user(self, user_id, calendar_id='primary'):
+        return self._select("user_id = ? AND calendar_id = ?", (user_id, calendar_id))
+
+    def watched(self, user_id, calendar_ids, now=None):
+        """
+        Whether every one of the user's `calendar_ids` has an unexpired channel.
+        """
+        now = (now or datetime.now(timezone.utc)).timestamp()
+        return all(self._select("user_id = ? AND calendar_id = ? AND expiration > ?", (user_id, calendar_id, now))
+                   for calendar_id in calendar_ids)
+
+    def expiring(self, before):
+        return self._select("expiration <= ?", (before.timestamp(),))
+
+    def claim_expiring(self, before, now, lease_seconds=RENEWAL_LEASE_SECONDS):
+        """
+        Channels expiring before `before` that no other worker is renewing,
+        leased to the caller for `lease_seconds`.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # BEGIN IMMEDIATE takes the write lock, so two workers cannot claim the same channel
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    f"SELECT {', '.join(CHANNEL_COLUMNS)} FROM channels "
+                    "WHERE expiration <= ? AND (renewing_until IS NULL OR renewing_until <= ?)",
+                    (before.timestamp(), now.timestamp())
+                ).fetchall()
+                conn.executemany("UPDATE channels SET renewing_until = ? WHERE id = ?",
+                                 [(now.timestamp() + lease_seconds, row[0]) for row in rows])
+        return [_channel(row) for row in rows]
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM channels")
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+channel_registry = ChannelRegistry()
+
+
+async def watch_calendar(service, user_id, address, calendar_id='primary', registry=channel_registry):
+    """
+    Open an events.watch channel so Google notifies `address` on every change.
+    """
+    body = {
+        'id': str(uuid.uuid4()),
+        'type': 'web_hook',
+        'address': address,
+        'token': secrets.token_urlsafe(32),
+        'params': {'ttl': str(CHANNEL_TTL_SECONDS)},
+    }
+    response = await dependency('google_calendar').call(
+        'events.watch', lambda: service.events().watch(calendarId=calendar_id, body=body).execute(),
+        idempotent=False)
+    channel = {
+        'id': body['id'],
+        'token': body['token'],
+        'user_id': user_id,
+        'calendar_id': calendar_id,
+        'resource_id': response['resourceId'],
+        'expiration': datetime.fromtimestamp(int(response['expiration']) / 1000, tz=timezone.utc),
+    }
+    await asyncio.to_thread(registry.add, channel)
+    return channel
+
+
+async def stop_channel(service, channel, registry=channel_registry):
+    await asyncio.to_thread(registry.remove, channel['id'])
+    await dependency('google_calendar').call(
+        'channels.stop',
+        lambda: service.channels().stop(body={'id': channel['id'], 'resourceId': channel['resource_id']}).execute()
+    )
+
+
+async def renew_expiring_channels(service_factory, address, registry=channel_registry, now=None):
+    """
+    Replace every channel that expires within RENEW_BEFORE with a fresh one.
+    `service_factory(user_id)` must return a Calendar service for that user.
+    Every worker runs this; each channel is claimed by one of them.
+    """
+    now = now or datetime.now(timezone.utc)
+    renewed = []
+    for channel in await asyncio.to_thread(registry.claim_expiring, now + RENEW_BEFORE, now):
+        try:
+            service = await service_factory(channel['user_id'])
+            renewed.append(await watch_calendar(service, channel['user_id'], address,
+                                                channel['calendar_id'], registry))
+            # The old channel may still deliver until stopped, so open the new one first
+            await stop_channel(service, channel, registry)
+        except Exception as e:
+            logger.error("Error renewing channel %s for user %s: %s", channel['id'], channel['user_id'], e)
+        # Anything missed between channels is covered by dropping the cached results
+        await asyncio.to_thread(availability_cache.invalidate, channel['user_id'])
+    return renewed
+
+
+def schedule_channel_renewal(service_factory, address, registry=channel_registry,
+                             interval_seconds=RENEWAL_INTERVAL_SECONDS):
+    async def renewal_loop():
+        while True:
+            await renew_expiring_channels(service_factory, address, registry)
+            await asyncio.sleep(interval_seconds)
+
+    return asyncio.create_task(renewal_loop())
+
+
+router = APIRouter()
+
+
+class WatchRequest(BaseModel):
+    calendar_id: str = 'primary'
+
+
+@router.post("/calendar/watch")
+async def start_watch(watch_request: WatchRequest, user: dict = Depends(current_user)):
+    """
+    Watch the caller's calendar. Channels are recorded under the verified
+    user, the same key /availability caches under.
+    """
+    address = os.getenv("CALENDAR_WEBHOOK_URL")
+    if not address:
+        raise HTTPException(status_code=503, detail="CALENDAR_WEBHOOK_URL is not configured")
+    try:
+        existing = await asyncio.to_thread(channel_registry.for_user, user['user_id'], watch_request.calendar_id)
+        if existing:
+            channel = existing[0]
+        else:
+            service = await get_calendar_service()
+            channel = await watch_calendar(service, user['user_id'], address, watch_request.calendar_id)
+        return {"channel_id": channel['id'], "expiration": channel['expiration']}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/calendar/notifications")
+async def receive_notification(request: FARequest):
+    """
+    Webhook for Google Calendar push channels. Any change to a watched
+    calendar drops that user's cached availability.
+    """
+    channel_id = request.headers.get('X-Goog-Channel-ID')
+    channel = await asyncio.to_thread(channel_registry.get, channel_id)
+    if channel is None:
+        raise HTTPException(status_code=404, detail="Unknown channel")
+    if not secrets.compare_digest(request.headers.get('X-Goog-Channel-Token', ''), channel['token']):
+        raise HTTPException(status_code=403, detail="Invalid channel token")
+
+    state = request.headers.get('X-Goog-Resource-State')
+    # 'sync' is the handshake sent when a channel is opened; nothing changed yet
+    if state != 'sync':
+        dropped = await asyncio.to_thread(availability_cache.invalidate, channel['user_id'])
+        logger.info("Calendar change (%s) for user %s, dropped %d cached entries", state, channel['user_id'], dropped)
+    return {"status": "ok"}
+
+
+def close_calendar_state():
+    channel_registry.close()
+    if availability_cache.versions is not None:
+        availability_cache.versions.close()
+
+
+class FakeChannelSender:
+    """
+    Stand-in for Google's push delivery, for tests and local development.
+    `client` is anything with a `post(url, headers=...)` method, e.g. TestClient.
+    """
+
+    def __init__(self, client, path="/calendar/notifications"):
+        self.client = client
+        self.path = path
+        self.message_number = 0
+
+    def send(self, channel, state='exists', token: Optional[str] = None):
+        self.message_number += 1
+        return self.client.post(self.path, headers={
+            'X-Goog-Channel-ID': channel['id'],
+            'X-Goog-Channel-Token': channel['token'] if token is None else token,
+            'X-Goog-Channel-Expiration': channel['expiration'].strftime('%a, %d %b %Y %H:%M:%S GMT'),
+            'X-Goog-Resource-ID': channel['resource_id'],
+            'X-Goog-Resource-State': state,
+            'X-Goog-Message-Number': str(self.message_number),
+        })
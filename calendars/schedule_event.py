@@ -1,11 +1,18 @@
 import asyncio
 from datetime import datetime, timezone
-from zoneinfo import ZoneInfo
 from calendars.gcal_access import get_calendar_service
+from calendars.timezones import get_zone
+from resilience import dependency
+
+# Google Calendar accepts up to 1000 calls per batch but recommends keeping
+# batches at 50 or fewer.
+MAX_BATCH_SIZE = 50
+# Events accepted by one /schedule-tasks/batch request, which is admitted as one
+MAX_BATCH_EVENTS = 4 * MAX_BATCH_SIZE
 
 
 async def schedule_event(summary, start_time, end_time, tz):
-    pst = ZoneInfo(tz)
+    pst = get_zone(tz)
     service = await get_calendar_service()
     event = {
         'summary': summary,
@@ -18,12 +25,48 @@ async def schedule_event(summary, start_time, end_time, tz):
             'timeZone': tz,
         },
     }
-    event = await asyncio.to_thread(
-        lambda: service.events().insert(calendarId='primary', body=event).execute()
-    )
+    event = await dependency('google_calendar').call(
+        'events.insert', lambda: service.events().insert(calendarId='primary', body=event).execute(),
+        idempotent=False)
     return event
 
 
+async def insert_events_batch(service, events, calendar_id='primary'):
+    """
+    Insert event bodies using batch requests of up to MAX_BATCH_SIZE calls.
+    Returns a (created_event, error) pair per input event, in input order.
+    A batch that fails as a whole marks only its own events as failed, so
+    events created by other batches are still reported. If nothing was
+    created at all the error is raised instead.
+    """
+    results = [(None, None)] * len(events)
+    batch_error = None
+
+    def callback(request_id, response, exception):
+        index = int(request_id)
+        if exception is not None:
+            results[index] = (None, str(exception))
+        else:
+            results[index] = (response, None)
+
+    for offset in range(0, len(events), MAX_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=callback)
+        for index in range(offset, min(offset + MAX_BATCH_SIZE, len(events))):
+            batch.add(service.events().insert(calendarId=calendar_id, body=events[index]),
+                      request_id=str(index))
+        try:
+            await dependency('google_calendar').call('batch', batch.execute, idempotent=False)
+        except Exception as e:
+            batch_error = e
+            for index in range(offset, min(offset + MAX_BATCH_SIZE, len(events))):
+                if results[index] == (None, None):
+                    results[index] = (None, f"Batch failed: {e}")
+
+    if batch_error is not None and not any(created for created, _ in results):
+        raise batch_error
+    return results
+
+
 async def main():
     time_zone = "America/Los_Angeles"
     start = datetime(2024, 7, 20, 15, 0)
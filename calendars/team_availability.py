@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, time, timedelta
+
+import numpy as np
+
+from calendars.get_available_slots import get_busy_intervals
+from calendars.timezones import get_zone
+
+DEFAULT_RESOLUTION_MINUTES = 5
+
+
+def busy_bitmap(intervals, range_start, range_end, resolution=DEFAULT_RESOLUTION_MINUTES):
+    """
+    Mark every `resolution`-minute slot between range_start and range_end that
+    overlaps a busy interval. Partially covered slots count as busy.
+    """
+    slot_seconds = resolution * 60
+    # Subtracting datetimes in the same zone ignores DST shifts, so measure in epoch seconds
+    total_slots = int(np.ceil((range_end.timestamp() - range_start.timestamp()) / slot_seconds))
+    if not intervals:
+        return np.zeros(total_slots, dtype=bool)
+
+    origin = range_start.timestamp()
+    bounds = np.array([(start.timestamp(), end.timestamp()) for start, end in intervals]) - origin
+    start_idx = np.clip(np.floor(bounds[:, 0] / slot_seconds).astype(np.int64), 0, total_slots)
+    end_idx = np.clip(np.ceil(bounds[:, 1] / slot_seconds).astype(np.int64), 0, total_slots)
+
+    # +1 where a busy interval opens and -1 where it closes; a positive running
+    # sum means at least one interval covers the slot
+    edges = np.zeros(total_slots + 1, dtype=np.int32)
+    np.add.at(edges, start_idx, 1)
+    np.add.at(edges, end_idx, -1)
+    return np.cumsum(edges[:-1]) > 0
+
+
+def working_hours_mask(range_start, range_end, tz, working_hours, resolution=DEFAULT_RESOLUTION_MINUTES):
+    """
+    Slots that fall outside the local (start_hour, end_hour) window are marked busy.
+    """
+    start_hour, end_hour = working_hours
+    outside = []
+    current_date = range_start.astimezone(tz).date()
+    while current_date <= range_end.astimezone(tz).date():
+        day_start = datetime.combine(current_date, time(0, 0), tzinfo=tz)
+        next_day = datetime.combine(current_date + timedelta(days=1), time(0, 0), tzinfo=tz)
+        outside.append((day_start, datetime.combine(current_date, time(start_hour, 0), tzinfo=tz)))
+        if end_hour < 24:
+            outside.append((datetime.combine(current_date, time(end_hour, 0), tzinfo=tz), next_day))
+        current_date += timedelta(days=1)
+    return busy_bitmap(outside, range_start, range_end, resolution)
+
+
+def common_free_windows(bitmaps, range_start, resolution=DEFAULT_RESOLUTION_MINUTES, min_duration_minutes=0):
+    """
+    Intersect users' free time. `bitmaps` is a (users, slots) boolean busy array;
+    returns (start, end) UTC datetimes of every run where nobody is busy.
+    """
+    free = ~np.any(np.atleast_2d(bitmaps), axis=0)
+    padded = np.concatenate(([False], free, [False])).astype(np.int8)
+    changes = np.diff(padded)
+    starts = np.flatnonzero(changes == 1)
+    ends = np.flatnonzero(changes == -1)
+
+    min_slots = int(np.ceil(min_duration_minutes / resolution))
+    keep = (ends - starts) >= max(min_slots, 1)
+
+    # Work in UTC so offsets stay correct across DST changes
+    origin = range_start.astimezone(get_zone('UTC'))
+    slot = timedelta(minutes=resolution)
+    return [
+        (origin + int(start) * slot, origin + int(end) * slot)
+        for start, end in zip(starts[keep], ends[keep])
+    ]
+
+
+async def get_team_availability(service_factory, user_ids, start_date, end_date, timezone='UTC',
+                                calendar_ids=None, resolution=DEFAULT_RESOLUTION_MINUTES,
+                                min_duration_minutes=30, working_hours=None, calendars_for=None):
+    """
+    Find windows between start_date and end_date (naive, local to `timezone`)
+    when every user is free. Calendars are fetched concurrently through
+    `service_factory(user_id)`, which must return a Calendar service that can
+    read that user's free/busy. `calendars_for(user_id)` names the calendars
+    queried per user; by default `calendar_ids` (or primary) for everyone.
+    """
+    tz = get_zone(timezone)
+    range_start = start_date.replace(tzinfo=tz)
+    range_end = end_date.replace(tzinfo=tz)
+
+    if calendars_for is None:
+        def calendars_for(user_id):
+            return calendar_ids or ['primary']
+
+    async def fetch_busy(user_id):
+        service = await service_factory(user_id)
+        return await get_busy_intervals(service, calendars_for(user_id), range_start, range_end, timezone)
+
+    busy_by_user = await asyncio.gather(*[fetch_busy(user_id) for user_id in user_ids])
+
+    bitmaps = [busy_bitmap(intervals, range_start, range_end, resolution) for intervals in busy_by_user]
+    if working_hours:
+        bitmaps.append(working_hours_mask(range_start, range_end, tz, working_hours, resolution))
+
+    windows = common_free_windows(np.vstack(bitmaps), range_start, resolution, min_duration_minutes)
+    return {
+        'timezone': timezone,
+        'users': list(user_ids),
+        'free_windows': [
+            {
+                'start': start.astimezone(tz).isoformat(),
+                'end': end.astimezone(tz).isoformat(),
+                'duration_minutes': int((end - start).total_seconds() // 60)
+            }
+            for start, end in windows
+        ]
+    }
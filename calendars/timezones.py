@@ -0,0 +1,77 @@
+import threading
+import time
+from functools import lru_cache
+from zoneinfo import ZoneInfo, available_timezones
+
+from resilience import dependency
+
+# A user's calendar timezone rarely changes, so it is re-read at most hourly
+USER_TIMEZONE_TTL_SECONDS = 60 * 60
+
+
+@lru_cache(maxsize=1)
+def timezone_names():
+    """
+    Every IANA zone name, read from tzdata once per process. available_timezones()
+    walks the whole tzdata tree, so it must not run per request.
+    """
+    return frozenset(available_timezones())
+
+
+def is_valid_timezone(name):
+    return name in timezone_names()
+
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """
+    Cached ZoneInfo for a zone name. Raises ValueError for unknown names.
+    """
+    if not is_valid_timezone(name):
+        raise ValueError(f"Invalid timezone: {name}")
+    return ZoneInfo(name)
+
+
+class UserTimezoneCache:
+    """
+    Users' preferred timezones from calendarList().get('primary'), kept for
+    `ttl_seconds` so availability and scheduling don't re-fetch them per call.
+    """
+
+    def __init__(self, ttl_seconds=USER_TIMEZONE_TTL_SECONDS, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            name, expires_at = entry
+            if self._clock() >= expires_at:
+                del self._entries[user_id]
+                return None
+            return name
+
+    def set(self, user_id, name):
+        with self._lock:
+            self._entries[user_id] = (name, self._clock() + self.ttl_seconds)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    async def resolve(self, service, user_id='default'):
+        name = self.get(user_id)
+        if name is None:
+            calendar_list_entry = await dependency('google_calendar').call(
+                'calendarList.get', lambda: service.calendarList().get(calendarId='primary').execute()
+            )
+            name = calendar_list_entry['timeZone']
+            self.set(user_id, name)
+        return name
+
+
+user_timezone_cache = UserTimezoneCache()
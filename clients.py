@@ -0,0 +1,88 @@
+import os
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Supabase and Gemini SDKs are slow to import and are not needed to answer
+# health checks, so they are only imported and created on first use.
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+generation_config = {
+  "temperature": 1,
+  "top_p": 0.95,
+  "top_k": 64,
+  "max_output_tokens": 8192,
+  "response_mime_type": "application/json",
+}
+
+_lock = threading.Lock()
+_supabase = None
+_model = None
+_http_session = None
+
+
+def get_supabase():
+    global _supabase
+    if _supabase is None:
+        with _lock:
+            if _supabase is None:
+                from supabase import ClientOptions, create_client
+                from resilience import dependency
+                _supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"), options=ClientOptions(
+                    postgrest_client_timeout=dependency('supabase').timeout,
+                ))
+    return _supabase
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _model = genai.GenerativeModel(
+                    model_name=GEMINI_MODEL_NAME,
+                    generation_config=generation_config,
+                )
+    return _model
+
+
+def get_http_session():
+    """
+    Shared requests session so calls to the Google REST API reuse pooled connections.
+    """
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                import requests
+                _http_session = requests.Session()
+    return _http_session
+
+
+def warm_clients():
+    """
+    Create every client up front, for deployments that prefer paying the
+    import cost at startup rather than on the first request.
+    """
+    get_supabase()
+    get_model()
+    get_http_session()
+
+
+def close_clients():
+    global _supabase, _model, _http_session
+    with _lock:
+        # Only close the PostgREST session if a request has opened one
+        postgrest = getattr(_supabase, '_postgrest', None)
+        if postgrest is not None:
+            try:
+                postgrest.session.close()
+            except Exception as e:
+                logger.warning("Error closing Supabase session: %s", e)
+        if _http_session is not None:
+            _http_session.close()
+        _supabase = None
+        _model = None
+        _http_session = None
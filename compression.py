@@ -0,0 +1,134 @@
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional; responses fall back to gzip
+    brotli = None
+
+# Smaller bodies fit in a packet or two either way; compressing them only costs CPU
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+# Responses are compressed per request, so speed matters more than ratio
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '4'))
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def parse_accept_encoding(header):
+    """
+    {coding: q} from an Accept-Encoding header; codings with q=0 are refused.
+    """
+    codings = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            codings[coding.lower()] = q
+    return codings
+
+
+def choose_encoding(header):
+    codings = parse_accept_encoding(header)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0.0
+    for coding in available:
+        q = codings.get(coding, codings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class _Compressor:
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._gzip = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data, final):
+        """
+        Compress a chunk. Chunks of streamed bodies are flushed so clients can
+        decode each one as it arrives.
+        """
+        if self.encoding == 'br':
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._gzip.compress(data)
+        return out + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip, as negotiated by Accept-Encoding, for JSON and text
+    responses of at least `minimum_size` bytes. Streamed responses are
+    compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        accept_encoding = next((value.decode('latin-1') for name, value in scope['headers']
+                                if name == b'accept-encoding'), '')
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message['type'] == 'http.response.start':
+                # Held until the first body chunk shows whether compressing is worthwhile
+                start = message
+                return
+            if message['type'] != 'http.response.body':
+                return await send(message)
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if start is not None:
+                headers = start.get('headers', [])
+                if not self.should_compress(headers, body, more_body):
+                    await send(start)
+                    start = None
+                    return await send(message)
+                compressor = _Compressor(encoding)
+                body = compressor.compress(body, not more_body)
+                headers = [(name, value) for name, value in headers if name != b'content-length']
+                headers += [(b'content-encoding', encoding.encode()), (b'vary', b'Accept-Encoding')]
+                if not more_body:
+                    headers.append((b'content-length', str(len(body)).encode()))
+                await send({**start, 'headers': headers})
+                start = None
+                return await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+            if compressor is None:
+                return await send(message)
+            await send({'type': 'http.response.body', 'body': compressor.compress(body, not more_body),
+                        'more_body': more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def should_compress(self, headers, body, more_body):
+        content_type = b''
+        for name, value in headers:
+            if name == b'content-encoding':
+                return False
+            if name == b'content-type':
+                content_type = value
+        if not content_type.decode('latin-1').startswith(COMPRESSIBLE_TYPES):
+            return False
+        # A streamed body's size is unknown up front, so it is always compressed
+        return more_body or len(body) >= self.minimum_size
@@ -0,0 +1,80 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI
+
+from clients import close_clients, warm_clients
+from compression import CompressionMiddleware
+from logging_config import RequestLogContextMiddleware, configure_logging
+from metrics import MetricsMiddleware, metrics_response
+from profiling import ProfilingMiddleware, router as profiling_router
+from resilience import DependencyError, dependency_error_response
+from calendars.event_store import close_event_store
+from calendars.notion_api import close_notion_limiters
+from calendars.notion_store import close_notion_store
+from calendars.gcal_access import get_calendar_service
+from calendars.push_channels import close_calendar_state, schedule_channel_renewal
+from calendars.timezones import timezone_names
+
+load_dotenv()
+
+# JSON lines written from a background thread; see logging_config
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+def create_lifespan(renew_channels=False):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Runs once per worker process. Clients, the HTTP session and the local
+        # stores are process-wide singletons, so every app mounted in the same
+        # process shares them; each uvicorn worker warms and closes its own.
+        logger.info("Starting worker %s", os.getpid())
+        # Zone names are read from tzdata once, before the first request validates one
+        await asyncio.to_thread(timezone_names)
+        if os.getenv("WARM_CLIENTS_ON_STARTUP"):
+            await asyncio.to_thread(warm_clients)
+        renewal = None
+        if renew_channels and os.getenv("CALENDAR_WEBHOOK_URL"):
+            renewal = schedule_channel_renewal(lambda user_id: get_calendar_service(),
+                                               os.getenv("CALENDAR_WEBHOOK_URL"))
+        yield
+        if renewal:
+            renewal.cancel()
+        close_clients()
+        close_event_store()
+        close_notion_store()
+        await close_notion_limiters()
+        close_calendar_state()
+        logger.info("Stopped worker %s", os.getpid())
+    return lifespan
+
+
+def create_app(*routers, renew_channels=False):
+    """
+    Build an app mounting the given routers, with shared resources opened
+    lazily and released on shutdown.
+    """
+    app = FastAPI(port=8080, lifespan=create_lifespan(renew_channels))
+    app.add_middleware(CompressionMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(RequestLogContextMiddleware)
+    # Outbound failures become 502/503/504 instead of a generic 500
+    app.add_exception_handler(DependencyError, dependency_error_response)
+
+    @app.get("/")
+    def index():
+        return {"message": "Hello, World!"}
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
+
+    app.include_router(profiling_router)
+    for router in routers:
+        app.include_router(router)
+    return app
@@ -0,0 +1,508 @@
+"""
+Local stand-ins for the services the app talks to, so it can be load tested
+offline: a PostgREST-compatible server for Supabase tables, a Gemini model
+with configurable latency, and a Google Calendar API (both the discovery
+client surface and the REST events endpoint used by /calevents).
+"""
+import asyncio
+import json
+import re
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from operator import ge, gt, le, lt
+from types import SimpleNamespace
+from zoneinfo import ZoneInfo
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# Primary keys are generated on insert and used to embed child tables
+PRIMARY_KEYS = {'projects': 'project_id', 'tasks': 'task_id', 'weekly_goal': None, 'tombstones': None,
+                'app_users': 'user_id'}
+COMPARISONS = {'gt': gt, 'gte': ge, 'lt': lt, 'lte': le}
+TASKS_PER_WEEK = 3
+EVENTS_PAGE_SIZE = 250
+
+
+class PostgRESTError(Exception):
+    def __init__(self, message, status_code=400, code='PGRST100'):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+
+def parse_select(select):
+    """
+    Parse a PostgREST `select` like "a, b, child(c, d)" into
+    (columns, {child_table: child_select}). Unbalanced parentheses are
+    rejected the way PostgREST does.
+    """
+    select = re.sub(r'\s', '', select or '*')
+    columns, embeds = [], {}
+    depth, token, start = 0, '', 0
+    for i, char in enumerate(select + ','):
+        if char == '(':
+            depth += 1
+            if depth == 1:
+                start = i
+                continue
+        elif char == ')':
+            depth -= 1
+            if depth < 0:
+                raise PostgRESTError(f"failed to parse select parameter ({select}): unexpected ')'")
+            if depth == 0:
+                embeds[token] = select[start + 1:i]
+                token = None
+                continue
+        if depth:
+            continue
+        if char == ',':
+            if token:
+                columns.append(token)
+            token = ''
+        elif token is not None:
+            token += char
+    if depth:
+        raise PostgRESTError(f"failed to parse select parameter ({select}): unclosed '('")
+    return columns, embeds
+
+
+class FakePostgREST:
+    """
+    In-memory tables served over the subset of the PostgREST API the app uses:
+    column selection with embedded child tables, `eq`, `in` and comparison
+    filters, `order` and `limit`, inserts and upserts, and the `sync_changes` view.
+    """
+
+    def __init__(self, tables=None, latency=0.0):
+        self.tables = {name: [] for name in PRIMARY_KEYS}
+        self.tables.update(tables or {})
+        self.latency = latency
+        self._next_ids = {name: len(rows) + 1 for name, rows in self.tables.items()}
+        self._lock = threading.Lock()
+
+    def select(self, table, select, filters, order=None, limit=None):
+        """
+        `filters` maps columns to conditions like "eq.2", or is a list of
+        (column, condition) pairs when a column has several.
+        """
+        columns, embeds = parse_select(select)
+        filters = list(filters.items() if isinstance(filters, dict) else filters)
+        with self._lock:
+            source = self._sync_changes() if table == 'sync_changes' else self.tables.get(table, [])
+            rows = [row for row in source if self._matches(row, filters)]
+            if order:
+                column, _, direction = order.partition('.')
+                rows.sort(key=lambda row: row.get(column), reverse=direction.startswith('desc'))
+            if limit is not None:
+                rows = rows[:int(limit)]
+            return [self._project(table, row, columns, embeds) for row in rows]
+
+    def insert(self, table, rows):
+        key = PRIMARY_KEYS.get(table)
+        created = []
+        with self._lock:
+            for row in rows:
+                row = dict(row)
+                if key and key not in row:
+                    row[key] = self._next_ids[table]
+                    self._next_ids[table] += 1
+                row.setdefault('updated_at', timestamp())
+                self.tables[table].append(row)
+                created.append(row)
+        return created
+
+    def upsert(self, table, rows, on_conflict):
+        """
+        Insert rows, or return the existing row with the same `on_conflict` value.
+        """
+        upserted = []
+        for row in rows:
+            with self._lock:
+                existing = next((current for current in self.tables[table]
+                                 if current.get(on_conflict) == row[on_conflict]), None)
+                if existing is not None:
+                    existing.update(row)
+                    upserted.append(existing)
+                    continue
+            upserted += self.insert(table, [row])
+        return upserted
+
+    @staticmethod
+    def _matches(row, filters):
+        for column, condition in filters:
+            operator, _, value = condition.partition('.')
+            if operator == 'eq':
+                matches = str(row.get(column)) == value
+            elif operator in COMPARISONS:
+                matches = row.get(column) is not None and COMPARISONS[operator](row[column], type(row[column])(value))
+            elif operator == 'in':
+                matches = str(row.get(column)) in value.strip('()').split(',')
+            else:
+                raise PostgRESTError(f"unsupported operator {operator}")
+            if not matches:
+                return False
+        return True
+
+    def _sync_changes(self):
+        """
+        The rows of the `sync_changes` view (see supabase/migrations): every
+        project, weekly goal and task with its owner, plus tombstones.
+        """
+        owners = {project['project_id']: project['user_id'] for project in self.tables['projects']}
+        changes = []
+        for table, entity, key_columns in (('projects', 'project', ('project_id',)),
+                                           ('weekly_goal', 'weekly_goal', ('project_id', 'week_no')),
+                                           ('tasks', 'task', ('task_id',))):
+            for row in self.tables[table]:
+                if row['project_id'] in owners:
+                    changes.append({'user_id': owners[row['project_id']], 'entity': entity,
+                                    'entity_key': {column: row[column] for column in key_columns},
+                                    'updated_at': row['updated_at'], 'deleted': False, 'data': dict(row)})
+        changes += [{**tombstone, 'deleted': True, 'data': None} for tombstone in self.tables['tombstones']]
+        return changes
+
+    def _project(self, table, row, columns, embeds):
+        if columns in ([], ['*']):
+            result = dict(row)
+        else:
+            missing = [column for column in columns if column not in row]
+            if missing:
+                raise PostgRESTError(f"column {table}.{missing[0]} does not exist", code='42703')
+            result = {column: row[column] for column in columns}
+        key = PRIMARY_KEYS.get(table)
+        for child, child_select in embeds.items():
+            child_columns, child_embeds = parse_select(child_select)
+            result[child] = [
+                self._project(child, child_row, child_columns, child_embeds)
+                for child_row in self.tables.get(child, []) if child_row.get(key) == row[key]
+            ]
+        return result
+
+    async def handle(self, request: Request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        table = request.path_params['table']
+        try:
+            if request.method == 'GET':
+                params = request.query_params
+                filters = [(k, v) for k, v in params.multi_items() if k not in ('select', 'order', 'limit')]
+                return JSONResponse(self.select(table, params.get('select'), filters, params.get('order'),
+                                                params.get('limit')))
+            body = await request.json()
+            rows = body if isinstance(body, list) else [body]
+            on_conflict = request.query_params.get('on_conflict')
+            if on_conflict:
+                return JSONResponse(self.upsert(table, rows, on_conflict), status_code=201)
+            return JSONResponse(self.insert(table, rows), status_code=201)
+        except PostgRESTError as e:
+            return JSONResponse({'code': e.code, 'message': str(e), 'details': None, 'hint': None},
+                                status_code=e.status_code)
+
+
+def timestamp(when=None):
+    """
+    A timestamptz the way PostgREST renders it.
+    """
+    return (when or datetime.now(timezone.utc)).isoformat(timespec='microseconds')
+
+
+def seed_projects(projects=10, weeks=12, user_id=1, tasks_per_week=TASKS_PER_WEEK):
+    """
+    Projects with `weeks` weekly goals and `tasks_per_week` tasks per week,
+    last updated an hour ago.
+    """
+    tables = {'projects': [], 'tasks': [], 'weekly_goal': [], 'tombstones': []}
+    updated_at = timestamp(datetime.now(timezone.utc) - timedelta(hours=1))
+    task_id = 1
+    for project_id in range(1, projects + 1):
+        tables['projects'].append({
+            'project_id': project_id, 'user_id': user_id, 'project_name': f"Project {project_id}",
+            'description': f"Synthetic project {project_id}", 'category': 'tech', 'product_type': 'app',
+            'timeline': f"{weeks} weeks", 'updated_at': updated_at,
+        })
+        for week_no in range(1, weeks + 1):
+            weekly_goal = f"Goal for week {week_no}"
+            tables['weekly_goal'].append({'project_id': project_id, 'week_no': week_no, 'weekly_goal': weekly_goal,
+                                          'updated_at': updated_at})
+            for task_no in range(1, tasks_per_week + 1):
+                tables['tasks'].append({
+                    'task_id': task_id, 'project_id': project_id, 'week_no': week_no, 'task_no': task_no,
+                    'weekly_goal': weekly_goal, 'task': f"Task {task_no} of week {week_no}",
+                    'updated_at': updated_at,
+                })
+                task_id += 1
+    return tables
+
+
+def gemini_project(weeks=4, tasks_per_week=TASKS_PER_WEEK):
+    return {
+        'project_name': 'Synthetic project',
+        'description': 'A generated project used for load testing.',
+        'category': 'tech',
+        'product_type': 'app',
+        'timeline': f"{weeks} weeks",
+        'tasks': [
+            {'week_no': week_no, 'weekly_goal': f"Goal for week {week_no}", 'task_no': task_no,
+             'task': f"Task {task_no} of week {week_no}"}
+            for week_no in range(1, weeks + 1) for task_no in range(1, tasks_per_week + 1)
+        ],
+    }
+
+
+class FakeGemini:
+    """
+    Stand-in for genai.GenerativeModel. Each call takes `latency` seconds plus
+    the time to stream the response at `tokens_per_second` (about four
+    characters per token), blocking like the real synchronous client.
+    """
+
+    def __init__(self, latency=0.5, tokens_per_second=200.0, weeks=4):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.text = json.dumps(gemini_project(weeks))
+        self.calls = 0
+
+    def generate_content(self, contents, request_options=None):
+        self.calls += 1
+        tokens = len(self.text) / 4
+        time.sleep(self.latency + (tokens / self.tokens_per_second if self.tokens_per_second else 0))
+        return SimpleNamespace(text=self.text)
+
+
+def make_events(count=200, start=datetime(2024, 7, 15, tzinfo=timezone.utc), per_day=8):
+    events = []
+    for i in range(count):
+        day, slot = divmod(i, per_day)
+        event_start = start + timedelta(days=day, hours=8 + slot)
+        events.append({
+            'id': f"event{i}",
+            'status': 'confirmed',
+            'summary': f"Event {i}",
+            'eventType': 'default',
+            'start': {'dateTime': event_start.isoformat()},
+            'end': {'dateTime': (event_start + timedelta(minutes=45)).isoformat()},
+        })
+    return events
+
+
+class _Call:
+    def __init__(self, calendar, fn):
+        self._calendar = calendar
+        self._fn = fn
+
+    def execute(self):
+        if self._calendar.latency:
+            time.sleep(self._calendar.latency)
+        return self._fn()
+
+
+class _Batch:
+    def __init__(self, calendar, callback):
+        self._calendar = calendar
+        self._callback = callback
+        self._calls = []
+
+    def add(self, request, request_id):
+        self._calls.append((request_id, request))
+
+    def execute(self):
+        # One round trip for the whole batch
+        if self._calendar.latency:
+            time.sleep(self._calendar.latency)
+        for request_id, request in self._calls:
+            self._callback(request_id, request._fn(), None)
+
+
+class FakeCalendar:
+    """
+    Google Calendar stand-in. It acts as the discovery-based service returned
+    by get_calendar_service(), and `handle_events` serves the REST events list.
+    Every execute() takes `latency` seconds.
+    """
+
+    def __init__(self, events=None, timezone_name='America/Los_Angeles', latency=0.05):
+        self.events_by_id = {event['id']: event for event in (events or [])}
+        self.timezone_name = timezone_name
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    # googleapiclient surface
+    def events(self):
+        return SimpleNamespace(list=self._list, insert=self._insert, watch=self._watch)
+
+    def calendarList(self):
+        return SimpleNamespace(get=lambda calendarId: _Call(self, lambda: {
+            'id': calendarId, 'timeZone': self.timezone_name
+        }))
+
+    def freebusy(self):
+        return SimpleNamespace(query=lambda body: _Call(self, lambda: self._freebusy(body)))
+
+    def channels(self):
+        return SimpleNamespace(stop=lambda body: _Call(self, lambda: {}))
+
+    def new_batch_http_request(self, callback):
+        return _Batch(self, callback)
+
+    def _list(self, calendarId='primary', **params):
+        return _Call(self, lambda: self.list_page(params))
+
+    def _insert(self, calendarId='primary', body=None):
+        def insert():
+            event = {**body, 'id': uuid.uuid4().hex, 'status': 'confirmed',
+                     'htmlLink': 'https://calendar.google.com/event'}
+            # Google stores local times with their zone and returns them with an offset
+            for key in ('start', 'end'):
+                when = datetime.fromisoformat(body[key]['dateTime'])
+                if when.tzinfo is None:
+                    when = when.replace(tzinfo=ZoneInfo(body[key].get('timeZone', 'UTC')))
+                event[key] = {**body[key], 'dateTime': when.isoformat()}
+            with self._lock:
+                self.events_by_id[event['id']] = event
+            return event
+        return _Call(self, insert)
+
+    def _watch(self, calendarId='primary', body=None):
+        expiration = datetime.now(timezone.utc) + timedelta(seconds=int(body['params']['ttl']))
+        return _Call(self, lambda: {'id': body['id'], 'resourceId': uuid.uuid4().hex,
+                                    'expiration': str(int(expiration.timestamp() * 1000))})
+
+    def _freebusy(self, body):
+        time_min = datetime.fromisoformat(body['timeMin'])
+        time_max = datetime.fromisoformat(body['timeMax'])
+        busy = [
+            {'start': event['start']['dateTime'], 'end': event['end']['dateTime']}
+            for event in self._sorted_events()
+            if datetime.fromisoformat(event['start']['dateTime']) < time_max
+            and datetime.fromisoformat(event['end']['dateTime']) > time_min
+        ]
+        return {'calendars': {item['id']: {'busy': busy} for item in body['items']}}
+
+    def _sorted_events(self):
+        with self._lock:
+            events = list(self.events_by_id.values())
+        return sorted(events, key=lambda event: event['start'].get('dateTime', ''))
+
+    def list_page(self, params):
+        """
+        One page of events().list. A sync token returns no changes, since the
+        fake's events only change through inserts made during the run.
+        """
+        if params.get('syncToken'):
+            return {'items': [], 'nextSyncToken': params['syncToken']}
+        events = self._sorted_events()
+        if 'timeMin' in params:
+            time_min = datetime.fromisoformat(params['timeMin'])
+            events = [e for e in events if datetime.fromisoformat(e['end']['dateTime']) > time_min]
+        if 'timeMax' in params:
+            time_max = datetime.fromisoformat(params['timeMax'])
+            events = [e for e in events if datetime.fromisoformat(e['start']['dateTime']) < time_max]
+        offset = int(params.get('pageToken') or 0)
+        page = events[offset:offset + EVENTS_PAGE_SIZE]
+        response = {'items': page}
+        if offset + EVENTS_PAGE_SIZE < len(events):
+            response['nextPageToken'] = str(offset + EVENTS_PAGE_SIZE)
+        else:
+            response['nextSyncToken'] = f"sync-{len(events)}"
+        return response
+
+    async def handle_events(self, request: Request):
+        if not request.headers.get('Authorization', '').startswith('Bearer '):
+            return JSONResponse({'error': {'code': 401, 'message': 'Login Required'}}, status_code=401)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return JSONResponse(self.list_page(dict(request.query_params)))
+
+
+class FakeNotion:
+    """
+    Stand-in for notion_client.AsyncClient serving a sessions database.
+    """
+
+    def __init__(self, pages=None, latency=0.0, page_size=100):
+        self.all_pages = pages or []
+        self.latency = latency
+        self.page_size = page_size
+        self.databases = SimpleNamespace(query=self._query)
+        self.pages = SimpleNamespace(retrieve=self._retrieve)
+
+    def __call__(self, auth=None, **options):
+        # Used in place of the AsyncClient class
+        return self
+
+    async def _query(self, database_id, start_cursor=None, page_size=100, filter=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # Only the last_edited_time filter is applied; archived pages are left out, as by Notion
+        pages = [page for page in self.all_pages if not page.get('archived')]
+        for condition in (filter or {}).get('and', [filter] if filter else []):
+            if condition.get('timestamp') == 'last_edited_time':
+                since = condition['last_edited_time']['on_or_after']
+                pages = [page for page in pages if page['last_edited_time'] >= since]
+        offset = int(start_cursor or 0)
+        results = pages[offset:offset + self.page_size]
+        has_more = offset + self.page_size < len(pages)
+        return {'results': results, 'has_more': has_more,
+                'next_cursor': str(offset + self.page_size) if has_more else None}
+
+    async def _retrieve(self, page_id):
+        return {'properties': {'Name': {'title': [{'plain_text': f"Project {page_id}"}]}}}
+
+    async def aclose(self):
+        pass
+
+
+def make_notion_pages(count=300, projects=5, start=datetime(2024, 7, 15, 9)):
+    pages = []
+    for i in range(count):
+        session_start = start + timedelta(days=i // 4, hours=2 * (i % 4))
+        pages.append({
+            'id': f"page{i}",
+            'last_edited_time': '2024-07-16T10:00:00.000Z',
+            'properties': {
+                'Name': {'title': [{'plain_text': f"Session {i}"}]},
+                'Date': {'date': {'start': session_start.isoformat(),
+                                  'end': (session_start + timedelta(hours=1)).isoformat()}},
+                'Complete': {'checkbox': i % 3 == 0},
+                'Hours spent': {'formula': {'number': 1}},
+                'Day of Week': {'formula': {'string': session_start.strftime('%A')}},
+                'Projects': {'relation': [{'id': f"project{i % projects}"}]},
+            },
+        })
+    return pages
+
+
+class FakeServer:
+    """
+    Serves the fake PostgREST tables under /rest/v1 and the fake Calendar
+    REST API under /calendar/v3 on a local port, in a background thread.
+    """
+
+    def __init__(self, postgrest, calendar):
+        app = Starlette(routes=[
+            Route('/rest/v1/{table}', postgrest.handle, methods=['GET', 'POST']),
+            Route('/calendar/v3/calendars/{calendar_id}/events', calendar.handle_events, methods=['GET']),
+        ])
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=self.port, log_level='warning'))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.should_exit = True
+        self._thread.join()
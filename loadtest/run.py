@@ -0,0 +1,297 @@
+"""
+Drive every endpoint of the app against the local fakes and report latency
+percentiles and throughput per endpoint.
+
+    python -m loadtest.run --requests 200 --concurrency 16 --gemini-latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+from unittest.mock import patch
+
+import httpx
+import jwt
+
+import clients
+from loadtest.fakes import (FakeCalendar, FakeGemini, FakeNotion, FakePostgREST, FakeServer, make_events,
+                            make_notion_pages, seed_projects)
+
+# Supabase auth user ids are uuids; this one owns the seeded projects
+LOADTEST_USER = '00000000-0000-4000-8000-00000000a11c'
+# seed_projects() gives every project to this app user_id, mapped to LOADTEST_USER
+SEED_USER_ID = 1
+# Tokens for the load-test user are signed with this instead of the project's JWT secret
+LOADTEST_JWT_SECRET = 'loadtest-jwt-secret'
+NOTION_DATABASE_ID = 'loadtest-database'
+LOADTEST_ADMIN_TOKEN = 'loadtest-admin-token'
+# Modules that bind get_calendar_service at import time
+CALENDAR_SERVICE_IMPORTS = ['core', 'routes.calendar', 'calendars.get_available_slots',
+                            'calendars.combined_availability', 'calendars.push_channels']
+
+
+def auth_headers(user_id=LOADTEST_USER):
+    """
+    An Authorization header with a Supabase-style access token for `user_id`,
+    valid while offline_services is active.
+    """
+    token = jwt.encode({'sub': str(user_id), 'aud': 'authenticated', 'exp': int(time.time()) + 3600},
+                       LOADTEST_JWT_SECRET, algorithm='HS256')
+    return {'Authorization': f"Bearer {token}"}
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Builds the keyword arguments of one request from its sequence number
+    build: Callable[[int], dict]
+
+
+@dataclass
+class EndpointStats:
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+    last_error: Optional[str] = None
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    @property
+    def requests_per_second(self):
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'endpoint': self.name,
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'p50_ms': round(self.percentile(50) * 1000, 2),
+            'p95_ms': round(self.percentile(95) * 1000, 2),
+            'p99_ms': round(self.percentile(99) * 1000, 2),
+            'rps': round(self.requests_per_second, 1),
+        }
+
+
+def build_scenarios(projects, weeks):
+    def project_id(i):
+        return i % projects + 1
+
+    def event(i):
+        return {'summary': f"Load test event {i}", 'start_time': '2024-07-20T19:00:00',
+                'end_time': '2024-07-20T19:30:00', 'timezone': 'America/Los_Angeles'}
+
+    def notification(i):
+        from calendars.push_channels import channel_registry
+        channel = channel_registry.for_user(LOADTEST_USER, 'primary')[0]
+        return {'url': '/calendar/notifications', 'headers': {
+            'X-Goog-Channel-ID': channel['id'], 'X-Goog-Channel-Token': channel['token'],
+            'X-Goog-Resource-ID': channel['resource_id'], 'X-Goog-Resource-State': 'exists',
+            'X-Goog-Message-Number': str(i + 1),
+        }}
+
+    availability = {'start_date': '2024-07-15T00:00:00', 'end_date': '2024-07-21T00:00:00',
+                    'notion_database_id': NOTION_DATABASE_ID}
+    team = {'members': [f"member{n}@example.com" for n in range(10)], 'start_date': '2024-07-15T00:00:00',
+            'end_date': '2024-07-21T00:00:00', 'timezone': 'America/Los_Angeles', 'working_hours': [9, 17]}
+    return [
+        Scenario('GET /', 'GET', lambda i: {'url': '/'}),
+        Scenario('POST /gen-tasks', 'POST',
+                 lambda i: {'url': '/gen-tasks', 'json': {'text': f"Project idea {i}"}}),
+        Scenario('GET /get-project', 'GET', lambda i: {'url': f"/get-project/{project_id(i)}"}),
+        Scenario('GET /get-tasks', 'GET', lambda i: {'url': f"/get-tasks/{project_id(i)}"}),
+        Scenario('GET /get-weekly-goal', 'GET', lambda i: {'url': f"/get-weekly-goal/{project_id(i)}"}),
+        Scenario('GET /get-weekly-tasks', 'GET',
+                 lambda i: {'url': f"/get-weekly-tasks/{project_id(i)}/{i % weeks + 1}"}),
+        Scenario('GET /calevents', 'GET', lambda i: {'url': '/calevents', 'params': {'access_token': 'loadtest'}}),
+        Scenario('GET /calevents?user_id', 'GET',
+                 lambda i: {'url': '/calevents', 'params': {'access_token': 'loadtest', 'user_id': LOADTEST_USER}}),
+        Scenario('POST /schedule-task', 'POST', lambda i: {'url': '/schedule-task', 'json': event(i)}),
+        Scenario('POST /schedule-tasks/batch', 'POST',
+                 lambda i: {'url': '/schedule-tasks/batch', 'json': [event(i * 10 + j) for j in range(10)]}),
+        Scenario('GET /availability', 'GET', lambda i: {'url': '/availability', 'params': availability}),
+        Scenario('POST /team-availability', 'POST', lambda i: {'url': '/team-availability', 'json': team}),
+        Scenario('GET /notion/events', 'GET',
+                 lambda i: {'url': '/notion/events', 'params': {'database_id': NOTION_DATABASE_ID}}),
+        Scenario('GET /notion/analytics', 'GET',
+                 lambda i: {'url': '/notion/analytics', 'params': {'database_id': NOTION_DATABASE_ID}}),
+        Scenario('POST /calendar/watch', 'POST',
+                 lambda i: {'url': '/calendar/watch', 'json': {'calendar_id': 'primary'}}),
+        Scenario('POST /calendar/notifications', 'POST', notification),
+        Scenario('GET /export', 'GET', lambda i: {'url': '/export'}),
+        Scenario('GET /export?format=csv', 'GET', lambda i: {'url': '/export', 'params': {'format': 'csv'}}),
+        Scenario('GET /sync', 'GET', lambda i: {'url': '/sync'}),
+        # Seeded rows were changed an hour ago, so this is a delta covering all of them
+        Scenario('GET /sync?since', 'GET', lambda i: {
+            'url': '/sync', 'params': {'since': (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()},
+        }),
+        # Sampling a request, then listing the stored profiles
+        Scenario('GET /get-tasks (profiled)', 'GET', lambda i: {
+            'url': f"/get-tasks/{project_id(i)}",
+            'headers': {'X-Profile': '1', 'X-Admin-Token': LOADTEST_ADMIN_TOKEN},
+        }),
+        Scenario('GET /admin/profiles', 'GET',
+                 lambda i: {'url': '/admin/profiles', 'headers': {'X-Admin-Token': LOADTEST_ADMIN_TOKEN}}),
+        # Scraped every few seconds; the exposition grows with every labelled series above
+        Scenario('GET /metrics', 'GET', lambda i: {'url': '/metrics'}),
+    ]
+
+
+@dataclass
+class OfflineServices:
+    postgrest: FakePostgREST
+    calendar: FakeCalendar
+    notion: FakeNotion
+
+
+@contextmanager
+def offline_services(projects=10, weeks=12, events=200, notion_pages=300, gemini_latency=0.5,
+                     gemini_tokens_per_second=200.0, calendar_latency=0.05, postgrest_latency=0.005,
+                     notion_latency=0.05, admission=False):
+    """
+    Start the fakes and point the app's clients at them for the duration.
+    Admission control is off unless `admission` is set, since every scenario
+    runs as one user and would otherwise measure the rate limits. Requests
+    authenticate with auth_headers().
+    """
+    from calendars import event_store, notion_api, notion_store
+    from calendars.availability_cache import CalendarVersions, availability_cache
+    from calendars.push_channels import channel_registry
+    from routes import auth as auth_routes
+    from routes.calendar import schedule_admission
+    from routes.projects import gen_tasks_admission
+
+    tables = seed_projects(projects, weeks, user_id=SEED_USER_ID)
+    tables['app_users'] = [{'user_id': SEED_USER_ID, 'auth_user_id': LOADTEST_USER}]
+    postgrest = FakePostgREST(tables, latency=postgrest_latency)
+    calendar = FakeCalendar(make_events(events), latency=calendar_latency)
+    notion = FakeNotion(make_notion_pages(notion_pages), latency=notion_latency)
+
+    async def get_fake_calendar_service():
+        return calendar
+
+    with FakeServer(postgrest, calendar) as server, ExitStack() as stack:
+        from supabase import create_client
+        stack.enter_context(patch.dict(os.environ, {
+            'CALENDAR_WEBHOOK_URL': f"{server.url}/webhook", 'NOTION_API_KEY': 'loadtest',
+            'ADMIN_TOKEN': LOADTEST_ADMIN_TOKEN,
+        }))
+        stack.enter_context(patch.object(clients, '_supabase', create_client(server.url, 'loadtest-key')))
+        stack.enter_context(patch.object(clients, '_model', FakeGemini(gemini_latency, gemini_tokens_per_second)))
+        stack.enter_context(patch('routes.calendar.CALENDAR_API_URL', f"{server.url}/calendar/v3"))
+        for module in CALENDAR_SERVICE_IMPORTS:
+            stack.enter_context(patch(f"{module}.get_calendar_service", get_fake_calendar_service))
+        stack.enter_context(patch('notion_client.AsyncClient', notion))
+        stack.enter_context(patch.object(notion_api, '_limiters', {}))
+        stack.enter_context(patch.object(event_store, '_store', event_store.EventStore(':memory:')))
+        stack.enter_context(patch.object(notion_store, '_store', notion_store.NotionStore(':memory:')))
+        stack.enter_context(patch.object(auth_routes.token_verifier, 'jwt_secret', LOADTEST_JWT_SECRET))
+        stack.enter_context(patch.object(auth_routes, '_app_user_ids', OrderedDict()))
+        stack.enter_context(patch.object(channel_registry, 'path', ':memory:'))
+        stack.enter_context(patch.object(channel_registry, '_conn', None))
+        stack.enter_context(patch.object(availability_cache, 'versions', CalendarVersions(':memory:')))
+        for controller in (gen_tasks_admission, schedule_admission):
+            stack.enter_context(patch.object(controller, 'enabled', admission))
+        yield OfflineServices(postgrest, calendar, notion)
+
+
+async def drive(client, scenario, requests, concurrency):
+    stats = EndpointStats(scenario.name)
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            kwargs = scenario.build(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, **kwargs)
+                if response.status_code >= 400:
+                    stats.errors += 1
+                    stats.last_error = f"{response.status_code} {response.text[:200]}"
+            except Exception as e:
+                stats.errors += 1
+                stats.last_error = str(e)
+            stats.latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+async def run_load(requests=100, concurrency=8, only=None, **service_options):
+    """
+    Run every scenario (or those named in `only`) one after another against
+    app.py and return an EndpointStats per endpoint.
+    """
+    from app import app
+
+    projects, weeks = service_options.get('projects', 10), service_options.get('weeks', 12)
+    results = []
+    with offline_services(**service_options):
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://loadtest', headers=auth_headers(),
+                                         timeout=60) as client:
+                for scenario in build_scenarios(projects, weeks):
+                    if only and scenario.name not in only:
+                        continue
+                    results.append(await drive(client, scenario, requests, concurrency))
+    return results
+
+
+def format_report(results):
+    header = f"{'endpoint':<32}{'reqs':>6}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+    lines = [header, '-' * len(header)]
+    for stats in results:
+        row = stats.as_dict()
+        lines.append(f"{row['endpoint']:<32}{row['requests']:>6}{row['errors']:>6}{row['p50_ms']:>10.1f}"
+                     f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['rps']:>10.1f}")
+        if stats.last_error:
+            lines.append(f"    last error: {stats.last_error}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=100, help="requests per endpoint")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoint', action='append', dest='only', help="only run this endpoint (repeatable)")
+    parser.add_argument('--projects', type=int, default=10)
+    parser.add_argument('--weeks', type=int, default=12)
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--notion-pages', type=int, default=300)
+    parser.add_argument('--gemini-latency', type=float, default=0.5)
+    parser.add_argument('--gemini-tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--calendar-latency', type=float, default=0.05)
+    parser.add_argument('--postgrest-latency', type=float, default=0.005)
+    parser.add_argument('--notion-latency', type=float, default=0.05)
+    parser.add_argument('--admission', action='store_true', help="keep rate limits and load shedding on")
+    parser.add_argument('--json', action='store_true', help="print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(
+        args.requests, args.concurrency, args.only, projects=args.projects, weeks=args.weeks,
+        events=args.events, notion_pages=args.notion_pages, gemini_latency=args.gemini_latency,
+        gemini_tokens_per_second=args.gemini_tokens_per_second, calendar_latency=args.calendar_latency,
+        postgrest_latency=args.postgrest_latency, notion_latency=args.notion_latency, admission=args.admission,
+    ))
+    if args.json:
+        print(json.dumps([stats.as_dict() for stats in results], indent=2))
+    else:
+        print(format_report(results))
+
+
+if __name__ == '__main__':
+    main()
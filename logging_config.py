@@ -0,0 +1,201 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import time
+import uuid
+from contextvars import ContextVar
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+# Longest message or field value written to the log, in characters
+LOG_MAX_FIELD_CHARS = int(os.getenv('LOG_MAX_FIELD_CHARS', '2000'))
+# Fraction of requests whose DEBUG/INFO records are kept, by path prefix,
+# e.g. "/get-tasks=0.1,/calendar/notifications=0.01". Warnings always pass.
+LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', '')
+
+REDACTED = '[REDACTED]'
+SECRET_KEYS = re.compile(r'^code$|token|secret|password|authorization|api_?key|cookie', re.IGNORECASE)
+SECRET_PATTERNS = [
+    # JWTs, e.g. Supabase access tokens
+    re.compile(r'eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*'),
+    re.compile(r'(Bearer\s+)[^\s\'",]+', re.IGNORECASE),
+    re.compile(r'(\b(?:access_token|refresh_token|provider_token|token|code|code_challenge|code_verifier|key)=)[^&\s\'",]+', re.IGNORECASE),
+]
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+_request_context: ContextVar[dict] = ContextVar('log_request_context', default={})
+
+
+def redact(text):
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(lambda m: (m.group(1) if m.groups() else '') + REDACTED, text)
+    return text
+
+
+def cap(text, limit=LOG_MAX_FIELD_CHARS):
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def clean(key, value):
+    if SECRET_KEYS.search(key):
+        return REDACTED
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    return cap(redact(value if isinstance(value, str) else str(value)))
+
+
+def _jsonable(value):
+    # Pydantic models, e.g. response models, serialize as their fields
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(mode='json')
+    return str(value)
+
+
+class LazyJson:
+    """
+    Defers serializing a payload until a handler actually writes the record,
+    so `logger.debug("...", extra={'payload': LazyJson(data)})` costs nothing
+    when DEBUG is off or the request isn't sampled.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(self.value, default=_jsonable)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, message, the request
+    context and any `extra` fields. Secrets are redacted and long values capped.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': cap(redact(record.getMessage())),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = clean(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = cap(redact(record.exc_text))
+        return json.dumps(entry, default=str)
+
+
+def parse_sample_rates(spec):
+    rates = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        prefix, _, rate = item.partition('=')
+        rates.append((prefix, float(rate)))
+    return rates
+
+
+class RequestSamplingFilter(logging.Filter):
+    """
+    Drops DEBUG/INFO records of requests that were not sampled, and adds the
+    request id and path to every record logged while serving a request.
+    """
+
+    def filter(self, record):
+        context = _request_context.get()
+        if context:
+            record.request_id = context['request_id']
+            record.path = context['path']
+            if record.levelno < logging.WARNING and not context['sampled']:
+                return False
+        return True
+
+
+class _PreparedQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Merge args in the caller's thread, where payloads are still valid, but
+        # leave JSON formatting and redaction to the listener thread
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        for key, value in record.__dict__.items():
+            if isinstance(value, LazyJson):
+                setattr(record, key, str(value))
+        return record
+
+
+class RequestLogContextMiddleware:
+    """
+    Decides once per request whether its DEBUG/INFO records are kept, so a
+    sampled request keeps all of its lines.
+    """
+
+    def __init__(self, app, sample_rates=None):
+        self.app = app
+        if sample_rates is None:
+            sample_rates = parse_sample_rates(LOG_SAMPLE_RATES)
+        # Longest prefix wins
+        self.sample_rates = sorted(sample_rates, key=lambda entry: len(entry[0]), reverse=True)
+
+    def sample_rate(self, path):
+        for prefix, rate in self.sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return 1.0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        rate = self.sample_rate(scope['path'])
+        token = _request_context.set({
+            'request_id': uuid.uuid4().hex[:12],
+            'path': scope['path'],
+            'sampled': rate >= 1.0 or random.random() < rate,
+        })
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_context.reset(token)
+
+
+_listener = None
+
+
+def configure_logging(level=LOG_LEVEL, stream=None):
+    """
+    Route all logging through a queue so request handlers never block on I/O;
+    a background listener formats records as JSON and writes them out.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.SimpleQueue()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    queue_handler = _PreparedQueueHandler(log_queue)
+    queue_handler.addFilter(RequestSamplingFilter())
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(queue_handler)
+
+
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
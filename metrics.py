@@ -0,0 +1,102 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from starlette.responses import Response
+
+from profiling import record_span
+
+# Outbound calls range from a few ms (Supabase) to tens of seconds (Gemini)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Time spent serving HTTP requests, including streamed bodies',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being served', ['method'],
+    multiprocess_mode='livesum',
+)
+DEPENDENCY_CALL_DURATION = Histogram(
+    'dependency_call_duration_seconds', 'Time spent in calls to external services',
+    ['dependency', 'operation'], buckets=LATENCY_BUCKETS,
+)
+DEPENDENCY_CALLS = Counter(
+    'dependency_calls_total', 'Calls to external services by outcome',
+    ['dependency', 'operation', 'outcome'],
+)
+# 0 closed, 1 half-open, 2 open; the worst state across live workers
+CIRCUIT_BREAKER_STATE = Gauge(
+    'circuit_breaker_state', 'State of the circuit breaker of each external service', ['dependency'],
+    multiprocess_mode='livemax',
+)
+ADMISSION_REQUESTS = Counter(
+    'admission_requests_total', 'Requests to rate limited endpoints, admitted or shed by reason',
+    ['endpoint', 'outcome'],
+)
+
+
+@contextmanager
+def track_dependency(dependency, operation):
+    """
+    Time one outbound call, e.g. `with track_dependency('supabase', 'tasks.select'):`.
+    The outcome is 'success' or the name of the exception raised.
+    """
+    started = time.perf_counter()
+    outcome = 'success'
+    try:
+        yield
+    except BaseException as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        DEPENDENCY_CALL_DURATION.labels(dependency, operation).observe(duration)
+        DEPENDENCY_CALLS.labels(dependency, operation, outcome).inc()
+        record_span(f"{dependency}.{operation}", started, duration, outcome)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency and in-flight requests. Routes
+    are labelled by their path template, so ids in URLs don't add series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        method = scope['method']
+        status = [500]
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            HTTP_REQUEST_DURATION.labels(method, route, str(status[0])).observe(time.perf_counter() - started)
+
+
+def metrics_response():
+    """
+    Exposition for /metrics. With several workers, set PROMETHEUS_MULTIPROC_DIR
+    so every worker's samples are aggregated instead of just this process's.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,189 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, field_validator
+
+from calendars.timezones import is_valid_timezone
+
+# One freeBusy call per member; Google also caps a query at 50 calendars
+MAX_TEAM_MEMBERS = 50
+
+
+class TextInput(BaseModel):
+    text: str
+    # Ignored: projects are created for the signed-in user
+    user_id: Optional[int] = None
+
+
+class Task(BaseModel):
+    week_no: int
+    task_no: int
+    weekly_goal: str
+    task: str
+
+
+class ProjectResponse(BaseModel):
+    project_id: int
+    project_name: str
+    description: str
+    category: str
+    product_type: str
+    timeline: str
+    tasks: List[Task]
+
+
+class ProjectDB(BaseModel):
+    project_id: int
+    user_id: int
+    project_name: str
+    description: str
+    category: str
+    product_type: str
+    timeline: str
+
+
+class TaskDB(BaseModel):
+    task: str
+    task_id: int
+    task_no: int
+
+
+class WeekDB(BaseModel):
+    week_no: int
+    tasks: List[TaskDB]
+
+
+class TasksDB(BaseModel):
+    project_id: int
+    project_name: str
+    description: str
+    category: str
+    weeks: List[WeekDB]
+
+
+class WeeklyGoal(BaseModel):
+    project_id: int
+    week_no: int
+    weekly_goal: str
+
+
+class WeeklyGoalDB(BaseModel):
+    project_id: int
+    project_name: str
+    description: str
+    category: str
+    weekly_goal: List[WeeklyGoal]
+
+
+class WeeklyTasks(BaseModel):
+    task_id: int
+    week_no: int
+    task_no: int
+    task: str
+
+
+class WeeklyTasksDB(BaseModel):
+    project_id: int
+    week_no: int
+    weekly_goal: str
+    tasks: List[WeeklyTasks]
+
+
+class CalEventRequest(BaseModel):
+    access_token: str
+    calendar_id: str = 'primary'
+
+
+class EventTime(BaseModel):
+    dateTime: Optional[str]
+
+
+class CalEvent(BaseModel):
+    summary: str
+    start: EventTime
+    end: EventTime
+
+
+class CalEventDB(BaseModel):
+    events: List[CalEvent]
+
+
+class EventRequest(BaseModel):
+    summary: str
+    start_time: datetime
+    end_time: datetime
+    timezone: str
+
+    @field_validator('timezone')
+    def validate_timezone(cls, v):
+        if not is_valid_timezone(v):
+            raise ValueError(f"Invalid timezone: {v}")
+        return v
+
+    @field_validator('end_time')
+    def validate_end_time(cls, v, info) -> datetime:
+        values = info.data
+        start_time = values.get('start_time')
+        if start_time and v <= start_time:
+            raise ValueError("end_time must be after start_time")
+        return v
+
+
+class TeamAvailabilityRequest(BaseModel):
+    # Google calendar ids, usually the members' email addresses
+    members: List[str]
+    start_date: datetime
+    end_date: datetime
+    timezone: str = 'UTC'
+    min_duration_minutes: int = 30
+    working_hours: Optional[Tuple[int, int]] = None
+
+    @field_validator('members')
+    def validate_members(cls, v):
+        if not 1 <= len(v) <= MAX_TEAM_MEMBERS:
+            raise ValueError(f"members must list between 1 and {MAX_TEAM_MEMBERS} calendars")
+        return v
+
+    @field_validator('timezone')
+    def validate_timezone(cls, v):
+        if not is_valid_timezone(v):
+            raise ValueError(f"Invalid timezone: {v}")
+        return v
+
+    @field_validator('end_date')
+    def validate_end_date(cls, v, info) -> datetime:
+        start_date = info.data.get('start_date')
+        if start_date and v <= start_date:
+            raise ValueError("end_date must be after start_date")
+        return v
+
+    @field_validator('working_hours')
+    def validate_working_hours(cls, v):
+        if v is not None and not 0 <= v[0] < v[1] <= 24:
+            raise ValueError("working_hours must be (start, end) hours with 0 <= start < end <= 24")
+        return v
+
+
+class EventResponse(BaseModel):
+    id: str
+    html_link: str
+    summary: str
+    start: datetime
+    end: datetime
+
+
+class BatchEventResult(BaseModel):
+    index: int
+    event: Optional[EventResponse] = None
+    error: Optional[str] = None
+
+
+class BatchEventResponse(BaseModel):
+    results: List[BatchEventResult]
+
+
+class AuthRequest(BaseModel):
+    provider: str
+
+class CallbackRequest(BaseModel):
+    callback_url: str
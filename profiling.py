@@ -0,0 +1,233 @@
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi import Request as FARequest
+from fastapi.responses import PlainTextResponse
+
+# Requests carrying this header set to a true value and a valid X-Admin-Token are profiled
+PROFILE_HEADER = 'x-profile'
+TRUE_VALUES = {b'1', b'true', b'yes', b'on'}
+ADMIN_TOKEN_HEADER = 'x-admin-token'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_SECONDS = float(os.getenv('PROFILE_INTERVAL_SECONDS', '0.001'))
+MAX_PROFILES = int(os.getenv('MAX_PROFILES', '50'))
+# Reading profiles or metrics must not push real requests out of the store
+UNPROFILED_PREFIXES = ('/admin/', '/metrics')
+
+_current_profile: ContextVar[Optional['Profile']] = ContextVar('current_profile', default=None)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold_stack(frame):
+    """
+    Root-first `a;b;c` stack, the collapsed format read by flamegraph.pl and speedscope.
+    """
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack every `interval` seconds from a
+    background thread. Profiling the event loop thread captures everything
+    running on it, so concurrent requests can show up in the samples too.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[fold_stack(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Profile:
+    def __init__(self, method, path, trigger):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.samples = Counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def record_span(self, name, started, duration, outcome):
+        # Called from the event loop and from worker threads running to_thread calls
+        with self._lock:
+            self.spans.append({'name': name, 'offset_ms': round((started - self._started) * 1000, 3),
+                               'duration_ms': round(duration * 1000, 3), 'outcome': outcome})
+
+    def finish(self, status, samples):
+        self.duration = time.perf_counter() - self._started
+        self.status = status
+        self.samples = samples
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self):
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'trigger': self.trigger,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'status': self.status,
+            'samples': sum(self.samples.values()),
+            'spans': sorted(self.spans, key=lambda span: span['offset_ms']),
+        }
+
+
+class ProfileStore:
+    """
+    The last `max_profiles` finished profiles, oldest dropped first.
+    """
+
+    def __init__(self, max_profiles=MAX_PROFILES):
+        self._profiles = deque(maxlen=max_profiles)
+        self._lock = threading.Lock()
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((profile for profile in self._profiles if profile.id == profile_id), None)
+
+    def list(self):
+        with self._lock:
+            return list(reversed(self._profiles))
+
+
+profile_store = ProfileStore()
+
+
+def record_span(name, started, duration, outcome='success'):
+    """
+    Attach a timed span to the profile of the current request, if it is being profiled.
+    """
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record_span(name, started, duration, outcome)
+
+
+def is_admin(token):
+    admin_token = os.getenv('ADMIN_TOKEN')
+    return bool(admin_token and token and secrets.compare_digest(token, admin_token))
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that ask for it with `X-Profile: 1` plus a valid
+    X-Admin-Token, and a random PROFILE_SAMPLE_RATE fraction of the rest.
+    Other requests only pay for a header lookup and a random() call.
+    """
+
+    def __init__(self, app, store=profile_store, sample_rate=PROFILE_SAMPLE_RATE,
+                 interval=PROFILE_INTERVAL_SECONDS):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    def trigger(self, scope):
+        if scope['path'].startswith(UNPROFILED_PREFIXES):
+            return None
+        headers = dict(scope['headers'])
+        requested = headers.get(PROFILE_HEADER.encode(), b'').strip().lower() in TRUE_VALUES
+        if requested and is_admin(headers.get(ADMIN_TOKEN_HEADER.encode(), b'').decode()):
+            return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        trigger = self.trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        profile = Profile(scope['method'], scope['path'], trigger)
+        status = [500]
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                message['headers'] = [*message.get('headers', []), (b'x-profile-id', profile.id.encode())]
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        token = _current_profile.set(profile)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            _current_profile.reset(token)
+            profile.finish(status[0], sampler.samples)
+            self.store.add(profile)
+
+
+router = APIRouter()
+
+
+def require_admin(request: FARequest):
+    if not is_admin(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.get("/admin/profiles", include_in_schema=False)
+async def list_profiles(request: FARequest):
+    require_admin(request)
+    return {"profiles": [profile.summary() for profile in profile_store.list()]}
+
+
+@router.get("/admin/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str, request: FARequest, format: str = Query('folded')):
+    """
+    `format=folded` returns collapsed stacks for flamegraph.pl or speedscope;
+    `format=json` returns the summary with the request's spans.
+    """
+    require_admin(request)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == 'json':
+        return profile.summary()
+    return PlainTextResponse(profile.folded())
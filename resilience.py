@@ -0,0 +1,309 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.responses import JSONResponse
+
+from metrics import CIRCUIT_BREAKER_STATE, DEPENDENCY_CALLS, track_dependency
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Transport errors of httpx (Supabase), notion_client and google.api_core (Gemini)
+TRANSIENT_ERROR_NAMES = {'TransportError', 'TimeoutException', 'RequestTimeoutError', 'DeadlineExceeded',
+                         'ServiceUnavailable'}
+
+
+class DependencyError(Exception):
+    """
+    An outbound call that failed for reasons outside the request: the
+    dependency is down, too slow, or kept failing after retries.
+    """
+    status_code = 502
+
+    def __init__(self, dependency, operation, message):
+        super().__init__(f"{dependency} {operation}: {message}")
+        self.dependency = dependency
+        self.operation = operation
+
+
+class DependencyUnavailable(DependencyError):
+    status_code = 503
+
+    def __init__(self, dependency, operation, retry_after):
+        super().__init__(dependency, operation, "circuit open, failing fast")
+        self.retry_after = retry_after
+
+
+class DependencyTimeout(DependencyError):
+    status_code = 504
+
+    def __init__(self, dependency, operation, timeout):
+        super().__init__(dependency, operation, f"no response within {timeout:g}s")
+
+
+class DependencyFailed(DependencyError):
+    pass
+
+
+def error_status(error):
+    for value in (getattr(error, 'status_code', None), getattr(error, 'status', None),
+                  getattr(error, 'code', None), getattr(getattr(error, 'resp', None), 'status', None),
+                  getattr(getattr(error, 'response', None), 'status_code', None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_transient(error):
+    """
+    Failures that say the dependency is unhealthy rather than that the request
+    was wrong; only these are retried and count against the circuit breaker.
+    """
+    if isinstance(error, (TimeoutError, OSError, DependencyTimeout)):
+        return True
+    if error_status(error) in RETRYABLE_STATUSES:
+        return True
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures, failing
+    calls fast for `reset_timeout` seconds. Then one probe call is let
+    through: success closes the breaker, failure opens it again.
+    """
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = None
+        self._lock = threading.Lock()
+        CIRCUIT_BREAKER_STATE.labels(name).set(self.CLOSED)
+
+    def _set_state(self, state):
+        self._state = state
+        CIRCUIT_BREAKER_STATE.labels(self.name).set(state)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._set_state(self.HALF_OPEN)
+            return self._state
+
+    def allow(self):
+        """
+        Returns 0 if a call may go ahead, otherwise seconds until the next probe.
+        """
+        state = self.state
+        with self._lock:
+            now = self._clock()
+            if state == self.CLOSED:
+                return 0.0
+            if state == self.OPEN:
+                return self._opened_at + self.reset_timeout - now
+            # A probe that never reported back, e.g. a cancelled request, is replaced
+            if self._probe_started is None or now - self._probe_started >= self.reset_timeout:
+                self._probe_started = now
+                return 0.0
+            return self._probe_started + self.reset_timeout - now
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._probe_started = None
+                self._opened_at = self._clock()
+                self._set_state(self.OPEN)
+
+
+class RetryBudget:
+    """
+    Caps retries at `ratio` of first attempts, so retries can't multiply the
+    load on a dependency that is already struggling. Up to `max_tokens`
+    retries can be saved up while things are healthy.
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self):
+        with self._lock:
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class Dependency:
+    """
+    Timeout, retries with jittered backoff, retry budget and circuit breaker
+    for one external service. Every attempt is timed with track_dependency.
+    """
+
+    def __init__(self, name, timeout, max_retries=2, base_delay=0.1, max_delay=2.0, breaker=None,
+                 budget=None, breaker_ignores=()):
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker(name)
+        self.budget = budget or RetryBudget()
+        # Statuses that are retried but not counted against the breaker
+        self.breaker_ignores = set(breaker_ignores)
+
+    def _check_breaker(self, operation):
+        retry_after = self.breaker.allow()
+        if retry_after:
+            DEPENDENCY_CALLS.labels(self.name, operation, 'circuit_open').inc()
+            raise DependencyUnavailable(self.name, operation, retry_after)
+
+    def _should_retry(self, error, attempt, idempotent):
+        """
+        Record the outcome of a failed attempt and decide whether to try again.
+        """
+        if not is_transient(error):
+            # The dependency answered, so it is up; the request itself was bad
+            self.breaker.record_success()
+            return False
+        if error_status(error) not in self.breaker_ignores:
+            self.breaker.record_failure()
+        return idempotent and attempt < self.max_retries and self.budget.try_withdraw()
+
+    def _failure(self, error, operation):
+        if isinstance(error, DependencyError) or not is_transient(error):
+            return error
+        failure = DependencyFailed(self.name, operation, str(error))
+        failure.__cause__ = error
+        return failure
+
+    def _delay(self, attempt):
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def call_async(self, operation, fn, *args, idempotent=True, **kwargs):
+        """
+        Await `fn(*args, **kwargs)` with the timeout, retrying transient failures.
+        """
+        attempt = 0
+        self.budget.deposit()
+        while True:
+            self._check_breaker(operation)
+            try:
+                with track_dependency(self.name, operation):
+                    try:
+                        result = await asyncio.wait_for(fn(*args, **kwargs), self.timeout)
+                    except asyncio.TimeoutError:
+                        raise DependencyTimeout(self.name, operation, self.timeout) from None
+            except Exception as e:
+                if not self._should_retry(e, attempt, idempotent):
+                    raise self._failure(e, operation)
+                attempt += 1
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call(self, operation, fn, *args, idempotent=True, **kwargs):
+        """
+        Run a blocking SDK call in a worker thread. On timeout the request
+        stops waiting, but the thread runs until the client's own HTTP
+        timeout, so clients are configured with the same timeout too.
+        """
+        return await self.call_async(operation, asyncio.to_thread, fn, *args, idempotent=idempotent, **kwargs)
+
+    def call_sync(self, operation, fn, *args, idempotent=True, **kwargs):
+        """
+        For code already running in a worker thread. There is no way to
+        abandon a blocking call, so `fn` must apply `self.timeout` itself.
+        """
+        attempt = 0
+        self.budget.deposit()
+        while True:
+            self._check_breaker(operation)
+            try:
+                with track_dependency(self.name, operation):
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                if not self._should_retry(e, attempt, idempotent):
+                    raise self._failure(e, operation)
+                attempt += 1
+                time.sleep(self._delay(attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+
+DEPENDENCIES = {
+    'supabase': Dependency('supabase', timeout=float(os.getenv('SUPABASE_TIMEOUT_SECONDS', '5'))),
+    # Generation takes seconds and is billed, so it is retried at most once
+    'gemini': Dependency('gemini', timeout=float(os.getenv('GEMINI_TIMEOUT_SECONDS', '60')), max_retries=1),
+    'google_calendar': Dependency('google_calendar',
+                                  timeout=float(os.getenv('GOOGLE_CALENDAR_TIMEOUT_SECONDS', '15'))),
+    'google_oauth': Dependency('google_oauth', timeout=float(os.getenv('GOOGLE_OAUTH_TIMEOUT_SECONDS', '10'))),
+    # RateLimitedNotion retries with Retry-After itself, and a 429 there means
+    # our shared bucket needs to slow down, not that Notion is down
+    'notion': Dependency('notion', timeout=float(os.getenv('NOTION_TIMEOUT_SECONDS', '30')), max_retries=0,
+                         breaker_ignores={429}),
+}
+
+
+def dependency(name):
+    return DEPENDENCIES[name]
+
+
+class StaleCache:
+    """
+    Last good responses of read endpoints, served while their dependency is
+    failing. Entries older than `max_age` seconds are not served.
+    """
+
+    def __init__(self, max_entries=1000, max_age=24 * 60 * 60, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() - entry[1] > self.max_age:
+                return None
+            return entry[0]
+
+
+def dependency_error_response(request, exc):
+    headers = {}
+    if isinstance(exc, DependencyUnavailable):
+        headers['Retry-After'] = str(max(1, round(exc.retry_after)))
+    return JSONResponse({'detail': str(exc)}, status_code=exc.status_code, headers=headers)
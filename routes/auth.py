@@ -0,0 +1,148 @@
+import logging
+import os
+from collections import OrderedDict
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi import Request as FARequest
+
+from auth import SupabaseTokenVerifier, user_dependency
+from clients import get_supabase
+from models import AuthRequest, CallbackRequest
+from resilience import DependencyError, dependency
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+token_verifier = SupabaseTokenVerifier(remote_get_user=lambda access_token: get_supabase().auth.get_user(access_token))
+# Dependency for protected routes: verifies the Bearer token locally
+current_user = user_dependency(token_verifier)
+
+# Auth users whose app user_id is kept in memory; mappings never change
+MAX_CACHED_APP_USERS = int(os.getenv('MAX_CACHED_APP_USERS', '10000'))
+_app_user_ids: "OrderedDict[str, int]" = OrderedDict()
+
+
+async def resolve_app_user_id(auth_user_id: str) -> int:
+    """
+    Projects are owned by a bigint user_id, while Supabase identifies users
+    by the uuid in their token. app_users (see supabase/migrations) maps one
+    to the other; a user's row is created the first time they are seen.
+    """
+    app_user_id = _app_user_ids.get(auth_user_id)
+    if app_user_id is None:
+        result = await dependency('supabase').call('app_users.upsert', lambda: (
+            get_supabase().table("app_users")
+            .upsert({"auth_user_id": auth_user_id}, on_conflict="auth_user_id")
+            .execute()))
+        app_user_id = result.data[0]['user_id']
+    _app_user_ids[auth_user_id] = app_user_id
+    _app_user_ids.move_to_end(auth_user_id)
+    if len(_app_user_ids) > MAX_CACHED_APP_USERS:
+        _app_user_ids.popitem(last=False)
+    return app_user_id
+
+
+async def current_user_id(user: dict = Depends(current_user)) -> int:
+    """
+    Dependency for routes that read or write the caller's projects: their
+    app user_id, not the auth uuid in `current_user`.
+    """
+    return await resolve_app_user_id(user['user_id'])
+
+
+@router.post("/auth/signin")
+async def sign_in_with_provider(auth_request: AuthRequest):
+    """
+    Initiate the sign-in process with a social provider.
+    """
+    try:
+        logger.info("Attempting to sign in with provider: %s", auth_request.provider)
+        response = await dependency('supabase').call('auth.sign_in_with_oauth', lambda: get_supabase().auth.sign_in_with_oauth({
+            "provider": auth_request.provider,
+            # "options": {
+            #     "redirect_to": "http://localhost:8000/auth-callback"  # Local callback URL
+            # }
+        }))
+        logger.info("Successfully initiated %s sign-in", auth_request.provider)
+        # The URL carries the PKCE code_challenge; it is redacted when written out
+        logger.debug("Auth URL: %s", response.url)
+
+        return {"auth_url": response.url}
+    except DependencyError:
+        raise
+    except Exception as e:
+        logger.error("Error initiating %s sign-in: %s", auth_request.provider, e)
+        if "Unsupported provider" in str(e):
+            logger.error("Provider '%s' may not be enabled in Supabase settings.", auth_request.provider)
+            raise HTTPException(status_code=400,
+                                detail=f"Provider '{auth_request.provider}' is not enabled. Please check your Supabase configuration.")
+        raise HTTPException(status_code=400, detail=f"Error initiating {auth_request.provider} sign-in: {str(e)}")
+
+
+
+@router.get("/auth-callback")
+async def auth_callback(request: FARequest):
+    """
+    Handle the callback after social authentication.
+    """
+    # Get all query parameters. They carry tokens, so only their names are logged.
+    params = dict(request.query_params)
+    logger.info("Received callback request with params: %s", sorted(params))
+
+    # Check for error
+    if 'error' in params:
+        logger.error("Error in OAuth callback: %s", params['error'])
+        raise HTTPException(status_code=400, detail=f"OAuth error: {params['error']}")
+
+    # If we have an access_token and refresh_token, we can use them directly
+    if 'access_token' in params and 'refresh_token' in params:
+        try:
+            logger.info("Attempting to get user with access token")
+            user = await token_verifier.verify(params['access_token'])
+            logger.info("Successfully authenticated user %s", user['user_id'])
+            return user
+        except Exception as e:
+            logger.error("Error getting user information: %s", e)
+            raise HTTPException(status_code=400, detail=f"Error getting user information: {str(e)}")
+    else:
+        logger.error("No access_token found in callback parameters")
+        raise HTTPException(status_code=400, detail="Invalid callback parameters")
+
+
+@router.post("/auth/callback")
+async def handle_auth_callback(callback_request: CallbackRequest):
+    """
+    Handle the callback after social authentication.
+    """
+    try:
+        # An auth code can only be exchanged once
+        response = await dependency('supabase').call(
+            'auth.exchange_code_for_session',
+            lambda: get_supabase().auth.exchange_code_for_session(callback_request.callback_url), idempotent=False)
+        session = response.session
+        if session and session.user:
+            return {
+                "user_id": session.user.id,
+                "email": session.user.email,
+                "provider": session.user.app_metadata.get("provider")
+            }
+        else:
+            raise HTTPException(status_code=400, detail="Failed to get user information")
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error handling auth callback: {str(e)}")
+
+
+@router.get("/user")
+async def get_user(access_token: str):
+    """
+    Retrieve user information using the access token.
+    """
+    try:
+        return await token_verifier.verify(access_token)
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error retrieving user information: {str(e)}")
@@ -0,0 +1,225 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import Response
+
+from admission import AdmissionController, admission_dependency
+from clients import get_http_session
+from models import (BatchEventResponse, BatchEventResult, CalEventDB, EventRequest, EventResponse,
+                    TeamAvailabilityRequest)
+from resilience import DependencyError, dependency
+from routes.auth import current_user, token_verifier
+from calendars.event_store import SyncTokenExpired, get_event_store, sync_events
+from calendars.gcal_access import get_calendar_service, get_calendar_service_for_token
+from calendars.schedule_event import MAX_BATCH_EVENTS, insert_events_batch
+from calendars.availability_cache import availability_cache
+from calendars.combined_availability import get_combined_availability
+
+# Every route here acts for a signed-in user
+router = APIRouter(dependencies=[Depends(current_user)])
+
+CALENDAR_API_URL = os.getenv('GOOGLE_CALENDAR_API_URL', 'https://www.googleapis.com/calendar/v3')
+
+# Scheduling writes to Google Calendar, which enforces per-project write quotas
+schedule_admission = AdmissionController(
+    'schedule-task',
+    user_rate=float(os.getenv('SCHEDULE_USER_RATE', '1')),
+    user_burst=float(os.getenv('SCHEDULE_USER_BURST', '10')),
+    global_rate=float(os.getenv('SCHEDULE_GLOBAL_RATE', '20')),
+    global_burst=float(os.getenv('SCHEDULE_GLOBAL_BURST', '50')),
+    max_concurrency=int(os.getenv('SCHEDULE_MAX_CONCURRENCY', '32')),
+    target_delay=float(os.getenv('SCHEDULE_TARGET_DELAY', '0.5')),
+)
+admit_schedule = Depends(admission_dependency(schedule_admission, token_verifier))
+
+
+def get_calendar_events(access_token, calendar_id='primary'):
+    url = f'{CALENDAR_API_URL}/calendars/{calendar_id}/events'
+    headers = {
+        'Authorization': f'Bearer {access_token}'
+    }
+    google_calendar = dependency('google_calendar')
+    response = google_calendar.call_sync('events.list', get_http_session().get, url, headers=headers,
+                                         timeout=google_calendar.timeout)
+
+    if response.status_code == 200:
+        events = response.json().get('items', [])
+        return events
+    else:
+        raise Exception(f"Failed to fetch calendar events: {response.status_code} {response.text}")
+
+
+def calendar_page_fetcher(access_token, calendar_id='primary'):
+    url = f'{CALENDAR_API_URL}/calendars/{calendar_id}/events'
+    headers = {
+        'Authorization': f'Bearer {access_token}'
+    }
+
+    google_calendar = dependency('google_calendar')
+
+    def fetch_page(params):
+        response = google_calendar.call_sync('events.list', get_http_session().get, url, headers=headers,
+                                             params=params, timeout=google_calendar.timeout)
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code == 410:
+            raise SyncTokenExpired()
+        raise Exception(f"Failed to fetch calendar events: {response.status_code} {response.text}")
+    return fetch_page
+
+
+@router.get("/calevents", response_model=CalEventDB)
+async def fetch_events(access_token: str = Query(...), calendar_id: str = Query('primary'),
+                       user_id: Optional[str] = Query(None), user: dict = Depends(current_user)):
+    """
+    With `user_id` (which must be the caller's own) events are served from the
+    local store, keyed on the verified user rather than on the parameter.
+    """
+    if user_id and user_id != str(user['user_id']):
+        raise HTTPException(status_code=403, detail="Cannot read another user's events")
+    try:
+        if user_id:
+            # Serve from the local store, pulling only what changed since the last sync
+            store = get_event_store()
+            await sync_events(store, calendar_page_fetcher(access_token, calendar_id), user['user_id'], calendar_id)
+            events = await asyncio.to_thread(store.events_between, user['user_id'], calendar_id)
+        else:
+            events = await asyncio.to_thread(get_calendar_events, access_token, calendar_id)
+        # Construct the result in the required format
+        constructed_result = {
+            "events": [
+                {
+                    "summary": event.get("summary", ""),
+                    "start": {"dateTime": event.get("start", {}).get("dateTime")},
+                    "end": {"dateTime": event.get("end", {}).get("dateTime")}
+                }
+                for event in events
+            ]
+        }
+        return CalEventDB(**constructed_result)
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/availability")
+async def get_availability(start_date: datetime = Query(...), end_date: datetime = Query(...),
+                           notion_database_id: str = Query(...), use_freebusy: bool = Query(False),
+                           calendar_ids: List[str] = Query(None), user: dict = Depends(current_user)):
+    """
+    Free/busy blocks combining Google Calendar and Notion work sessions.
+    `calendar_ids` (repeatable, default primary) picks the calendars read.
+    Calendar reads are cached until a push notification for the user's
+    calendar (see /calendar/watch) drops them, or briefly when the
+    calendar is not being watched.
+    """
+    try:
+        availability = await get_combined_availability(start_date, end_date, notion_database_id,
+                                                       calendar_ids=calendar_ids, use_freebusy=use_freebusy,
+                                                       user_id=user['user_id'],
+                                                       cache=availability_cache, store=get_event_store())
+        return Response(content=availability, media_type="application/json")
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/team-availability")
+async def team_availability(team_request: TeamAvailabilityRequest, access_token: Optional[str] = Query(None),
+                            user: dict = Depends(current_user)):
+    """
+    Windows when every member is free. Members' free/busy is read as the
+    caller, with their Google `access_token` when given and the app's
+    calendar credentials otherwise, so it covers the calendars they can see.
+    """
+    # Loads numpy, which is kept out of startup
+    from calendars.team_availability import get_team_availability
+
+    try:
+        if access_token:
+            service = await get_calendar_service_for_token(access_token)
+        else:
+            service = await get_calendar_service()
+
+        async def service_factory(member):
+            return service
+
+        return await get_team_availability(
+            service_factory, team_request.members, team_request.start_date, team_request.end_date,
+            team_request.timezone, min_duration_minutes=team_request.min_duration_minutes,
+            working_hours=team_request.working_hours, calendars_for=lambda member: [member])
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def build_event_body(event_request: EventRequest) -> dict:
+    return {
+        'summary': event_request.summary,
+        'start': {
+            'dateTime': event_request.start_time.isoformat(),
+            'timeZone': event_request.timezone,
+        },
+        'end': {
+            'dateTime': event_request.end_time.isoformat(),
+            'timeZone': event_request.timezone,
+        },
+    }
+
+
+def to_event_response(created_event: dict) -> EventResponse:
+    return EventResponse(
+        id=created_event['id'],
+        html_link=created_event['htmlLink'],
+        summary=created_event['summary'],
+        start=datetime.fromisoformat(created_event['start']['dateTime']),
+        end=datetime.fromisoformat(created_event['end']['dateTime'])
+    )
+
+
+@router.post("/schedule-task", response_model=EventResponse, dependencies=[admit_schedule])
+async def schedule_event(event_request: EventRequest):
+    try:
+        service = await get_calendar_service()
+        event = build_event_body(event_request)
+
+        created_event = await dependency('google_calendar').call(
+            'events.insert', lambda: service.events().insert(calendarId='primary', body=event).execute(),
+            idempotent=False)
+
+        return to_event_response(created_event)
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/schedule-tasks/batch", response_model=BatchEventResponse, dependencies=[admit_schedule])
+async def schedule_events_batch(event_requests: List[EventRequest] = Body(..., max_length=MAX_BATCH_EVENTS)):
+    """
+    Schedule up to MAX_BATCH_EVENTS events with one service build and batched
+    inserts. Failures are reported per event instead of failing the whole request.
+    """
+    if not event_requests:
+        raise HTTPException(status_code=400, detail="No events to schedule")
+    try:
+        service = await get_calendar_service()
+        created = await insert_events_batch(service, [build_event_body(e) for e in event_requests])
+
+        results = []
+        for index, (created_event, error) in enumerate(created):
+            if error is None:
+                results.append(BatchEventResult(index=index, event=to_event_response(created_event)))
+            else:
+                results.append(BatchEventResult(index=index, error=error))
+        return BatchEventResponse(results=results)
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+import logging
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from clients import get_supabase
+from resilience import DependencyError, dependency
+from routes.auth import current_user, current_user_id
+
+logger = logging.getLogger(__name__)
+
+# Every route here acts for a signed-in user
+router = APIRouter(dependencies=[Depends(current_user)])
+
+# Rows fetched per query; memory per export is bounded by this, not by account size
+EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', '500'))
+PROJECT_COLUMNS = ('project_id', 'project_name', 'description', 'category', 'product_type', 'timeline')
+TASK_COLUMNS = ('task_id', 'project_id', 'week_no', 'weekly_goal', 'task_no', 'task')
+# One CSV table for both row types; columns a type lacks are left empty
+CSV_COLUMNS = ('type',) + PROJECT_COLUMNS + tuple(name for name in TASK_COLUMNS if name not in PROJECT_COLUMNS)
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+async def iter_export_pages(user_id, page_size=None):
+    """
+    Yield ('project', rows) and ('task', rows) pages for all of a user's
+    projects and their tasks. Both tables are paged with keyset cursors on
+    their primary keys, so every query is an index range scan however deep
+    the export gets; tasks are fetched for a page of projects at a time.
+    """
+    page_size = page_size or EXPORT_PAGE_SIZE
+    supabase = dependency('supabase')
+    last_project_id = 0
+    while True:
+        projects = (await supabase.call('projects.select', lambda: (
+            get_supabase().table("projects")
+            .select(", ".join(PROJECT_COLUMNS))
+            .eq("user_id", user_id)
+            .gt("project_id", last_project_id)
+            .order("project_id")
+            .limit(page_size)
+            .execute()))).data
+        if not projects:
+            return
+        yield 'project', projects
+
+        project_ids = [project['project_id'] for project in projects]
+        last_task_id = 0
+        while True:
+            tasks = (await supabase.call('tasks.select', lambda: (
+                get_supabase().table("tasks")
+                .select(", ".join(TASK_COLUMNS))
+                .in_("project_id", project_ids)
+                .gt("task_id", last_task_id)
+                .order("task_id")
+                .limit(page_size)
+                .execute()))).data
+            if tasks:
+                yield 'task', tasks
+            if len(tasks) < page_size:
+                break
+            last_task_id = tasks[-1]['task_id']
+
+        if len(projects) < page_size:
+            return
+        last_project_id = projects[-1]['project_id']
+
+
+def ndjson_page(row_type, rows):
+    return "".join(json.dumps({'type': row_type, **row}) + "\n" for row in rows)
+
+
+def csv_page(row_type, rows, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writer.writerows({'type': row_type, **row} for row in rows)
+    return buffer.getvalue()
+
+
+@router.get("/export")
+async def export_projects(format: str = Query('ndjson'), user_id: int = Depends(current_user_id)):
+    """
+    Stream all of the signed-in user's projects and tasks as NDJSON (one object per row,
+    tagged with its `type`) or CSV. Each page is written out as soon as it is
+    fetched, so a large account neither waits for nor buffers the full dump.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    logger.info("Exporting projects for user %s as %s", user_id, format)
+    pages = iter_export_pages(user_id)
+    # Fetched before the response starts, so an unreachable database is still a proper error status
+    try:
+        first_page = await anext(pages, None)
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def chunks():
+        page, header = first_page, True
+        try:
+            while page is not None:
+                row_type, rows = page
+                if format == 'csv':
+                    yield csv_page(row_type, rows, header)
+                else:
+                    yield ndjson_page(row_type, rows)
+                page, header = await anext(pages, None), False
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error("Error exporting projects for user %s: %s", user_id, e)
+            if format == 'ndjson':
+                yield json.dumps({'type': 'error', 'error': str(e)}) + "\n"
+        if format == 'csv' and header:
+            yield csv_page('project', [], header=True)
+
+    return StreamingResponse(chunks(), media_type=EXPORT_FORMATS[format],
+                             headers={'Content-Disposition': f'attachment; filename="export.{format}"'})
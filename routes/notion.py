@@ -0,0 +1,66 @@
+import asyncio
+import os
+import json
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from resilience import DependencyError
+from routes.auth import current_user
+from calendars.notioncal_access import iter_calendar_events, sync_calendar_pages
+from calendars.notion_store import get_notion_store
+
+logger = logging.getLogger(__name__)
+
+# Every route here acts for a signed-in user
+router = APIRouter(dependencies=[Depends(current_user)])
+
+
+@router.get("/notion/events")
+async def stream_notion_events(database_id: str = Query(...)):
+    """
+    Stream a Notion calendar database as NDJSON, one event per line, as pages arrive.
+    """
+    notion_token = os.getenv("NOTION_API_KEY")
+
+    async def ndjson_lines():
+        try:
+            async for event in iter_calendar_events(database_id, notion_token):
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error("Error streaming Notion database %s: %s", database_id, e)
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/notion/analytics")
+async def notion_analytics(database_id: str = Query(...)):
+    """
+    Hours per project per ISO week and completion rates for a Notion
+    sessions database. Only pages edited since the last call are fetched,
+    and only those are applied to the aggregates, unless another worker has
+    changed the stored pages since this one last saw them.
+    """
+    # numpy is only needed here, so it is not loaded at startup
+    from calendars.notion_analytics import get_database_analytics
+
+    try:
+        result = await sync_calendar_pages(database_id, os.getenv("NOTION_API_KEY"))
+        analytics = get_database_analytics(database_id)
+        if result.version is not None and analytics.version == result.base_version:
+            analytics.upsert(result.changed)
+            analytics.remove(result.removed)
+            analytics.version = result.version
+        else:
+            # First call in this worker, or other workers synced pages it has not seen
+            store = get_notion_store()
+            analytics.version = await asyncio.to_thread(store.get_version, database_id)
+            analytics.sync(await asyncio.to_thread(store.events, database_id))
+        return {"database_id": database_id, **analytics.summary()}
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+
+from admission import AdmissionController, admission_dependency
+from clients import get_model, get_supabase
+from logging_config import LazyJson
+from models import ProjectDB, ProjectResponse, TasksDB, TextInput, WeeklyGoalDB, WeeklyTasksDB
+from resilience import DependencyError, StaleCache, dependency
+from routes.auth import current_user, current_user_id, token_verifier
+
+logger = logging.getLogger(__name__)
+
+# Every route here acts for a signed-in user
+router = APIRouter(dependencies=[Depends(current_user)])
+
+# Each generation is a Gemini call lasting seconds, billed against a shared quota
+gen_tasks_admission = AdmissionController(
+    'gen-tasks',
+    user_rate=float(os.getenv('GEN_TASKS_USER_RATE', str(5 / 60))),
+    user_burst=float(os.getenv('GEN_TASKS_USER_BURST', '3')),
+    global_rate=float(os.getenv('GEN_TASKS_GLOBAL_RATE', '2')),
+    global_burst=float(os.getenv('GEN_TASKS_GLOBAL_BURST', '10')),
+    max_concurrency=int(os.getenv('GEN_TASKS_MAX_CONCURRENCY', '16')),
+    target_delay=float(os.getenv('GEN_TASKS_TARGET_DELAY', '1')),
+)
+# Last good reads, served while Supabase is down
+project_fallback = StaleCache()
+tasks_fallback = StaleCache()
+STALE_HEADERS = {'X-Cache': 'stale'}
+
+# Task fields a compact response can be narrowed to with `fields=`
+TASK_FIELDS = ('task_id', 'task_no', 'task')
+GENERATED_TASK_FIELDS = ('task_no', 'task')
+
+
+def parse_fields(fields, allowed):
+    """
+    The task fields asked for with `fields=a,b`, in the order of `allowed`;
+    all of them when `fields` is None. Unknown names are a 400.
+    """
+    if fields is None:
+        return allowed
+    requested = {name.strip() for name in fields.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in requested)
+
+
+def compact_weeks(tasks, fields):
+    """
+    Tasks grouped per week with the weekly goal stated once per week rather
+    than on every task, and each task narrowed to `fields`.
+    """
+    weeks = {}
+    for task in tasks:
+        week = weeks.get(task['week_no'])
+        if week is None:
+            week = weeks[task['week_no']] = {'week_no': task['week_no'], 'weekly_goal': task.get('weekly_goal'),
+                                             'tasks': []}
+        week['tasks'].append({name: task[name] for name in fields})
+    return list(weeks.values())
+
+
+def select_owned_project(columns, project_id, user_id):
+    """
+    The project, if it belongs to `user_id`; no rows otherwise.
+    """
+    return (get_supabase().table("projects")
+            .select(columns)
+            .eq("project_id", project_id)
+            .eq("user_id", user_id)
+            .execute())
+
+
+@router.post("/gen-tasks", response_model=ProjectResponse,
+             dependencies=[Depends(admission_dependency(gen_tasks_admission, token_verifier))])
+async def generate_tasks(input_data: TextInput, compact: bool = Query(False), fields: Optional[str] = Query(None),
+                         user_id: int = Depends(current_user_id)):
+    """
+    With `compact=true` tasks are returned grouped per week, see compact_weeks.
+    `fields=` narrows the tasks and implies compact.
+    """
+    task_fields = parse_fields(fields, GENERATED_TASK_FIELDS)
+    try:
+        # Call Gemini API
+        gemini = dependency('gemini')
+        response = await gemini.call('generate_content', lambda: get_model().generate_content([
+                "You're an expert in generating tasks for project ideas. You'll be given a project idea, this could be a project in tech space like AI, software, application development or music or film making, or any kind of artistic project. You are responsible for generating step by step tasks for how to execute that idea. Keep the tasks as simple as possible. The tasks you generate must be able to be completed within the timeline provided to you. Keep it simple when generating tasks, I want the tasks to be high level and easily achieving rather than an overwhelming list that is not very motivating to begin the work. Don't generate more than three tasks per week. Make sure the tasks for each week are scoped in a way that they can be completed within specified weeks. It is very important that you scope the tasks within the limits of the project idea. Do not include anything that is not in the scope of the project idea. Include project name, description of the project, category, product_type, timeline, weeks the tasks for each week.",
+                "input: wip - Track Your Health Trends. Upload your medical data and lab reports. Get insights and see how diet and supplement protocols affect you over time. I want to finish this project in 4 weeks",
+                "output: {\"project_name\":\"WIP: Health Trend Tracker\",\"description\":\"WIP is a web application that allows users to upload medical data (lab reports, etc.) and track health trends over time. It provides insights on how diet, supplements, and lifestyle choices affect various health parameters.\",\"category\":\"health\",\"product_type\":\"app\",\"timeline\":\"4 weeks\",\"tasks\":[{\"week_no\":1,\"weekly_goal\":\"Project Setup and User Interface Design\",\"task_no\":1,\"task\":\"Define user personas and key features for the app.\"},{\"week_no\":1,\"weekly_goal\":\"Project Setup and User Interface Design\",\"task_no\":2,\"task\":\"Research existing health tracking apps and data visualization tools.\"},{\"week_no\":1,\"weekly_goal\":\"Project Setup and User Interface Design\",\"task_no\":3,\"task\":\"Create a basic wireframe for the app's UI and data input/output methods.\"},{\"week_no\":1,\"weekly_goal\":\"Project Setup and User Interface Design\",\"task_no\":4,\"task\":\"Choose the technology stack for frontend and backend development.\"},{\"week_no\":2,\"weekly_goal\":\"Data Input and Storage\",\"task_no\":1,\"task\":\"Develop the user authentication and profile creation system.\"},{\"week_no\":2,\"weekly_goal\":\"Data Input and Storage\",\"task_no\":2,\"task\":\"Build the interface for uploading and storing medical data.\"},{\"week_no\":2,\"weekly_goal\":\"Data Input and Storage\",\"task_no\":3,\"task\":\"Implement basic data visualization capabilities (charts, graphs).\"},{\"week_no\":2,\"weekly_goal\":\"Data Input and Storage\",\"task_no\":4,\"task\":\"Start building the trend analysis and insight generation algorithms.\"},{\"week_no\":3,\"weekly_goal\":\"Trend Analysis and Visualization\",\"task_no\":1,\"task\":\"Enhance data visualization with interactive features and filtering options.\"},{\"week_no\":3,\"weekly_goal\":\"Trend Analysis and Visualization\",\"task_no\":2,\"task\":\"Integrate AI-powered insights based on user data and research trends.\"},{\"week_no\":3,\"weekly_goal\":\"Trend Analysis and Visualization\",\"task_no\":3,\"task\":\"Develop a personalized dashboard for users to track their health trends over time.\"},{\"week_no\":3,\"weekly_goal\":\"Trend Analysis and Visualization\",\"task_no\":4,\"task\":\"Conduct user testing and gather feedback for improvement.\"},{\"week_no\":4,\"weekly_goal\":\"Testing and Deployment\",\"task_no\":1,\"task\":\"Implement secure data storage and privacy features.\"},{\"week_no\":4,\"weekly_goal\":\"Testing and Deployment\",\"task_no\":2,\"task\":\"Integrate with wearable devices and other health data sources.\"},{\"week_no\":4,\"weekly_goal\":\"Testing and Deployment\",\"task_no\":3,\"task\":\"Develop a marketing strategy and plan for launch.\"},{\"week_no\":4,\"weekly_goal\":\"Testing and Deployment\",\"task_no\":4,\"task\":\"Finalize the application and deploy it on a chosen platform.\"}]}",
+                f"input: {input_data.text}",
+                "output: ",
+            ], request_options={'timeout': gemini.timeout}))
+        # response = model.generate_content(input_data.text)
+        gemini_data = json.loads(response.text)
+        logger.info("Generated project with %d tasks", len(gemini_data.get("tasks", [])))
+        logger.debug("Response from LLM", extra={'payload': LazyJson(gemini_data)})
+
+        # Insert project data
+        project_data = {
+            "user_id": user_id,
+            "project_name": gemini_data["project_name"],
+            "description": gemini_data["description"],
+            "category": gemini_data["category"],
+            "product_type": gemini_data["product_type"],
+            "timeline": gemini_data["timeline"]
+        }
+        project_result = await dependency('supabase').call(
+            'projects.insert', lambda: get_supabase().table("projects").insert(project_data).execute(),
+            idempotent=False)
+        project_id = project_result.data[0]['project_id']
+        logger.info("Inserted project %s", project_id)
+
+        tasks = gemini_data["tasks"]
+        tasks[:] = [{**task, 'project_id': project_id} for task in tasks]
+        response = await dependency('supabase').call(
+            'tasks.insert', lambda: get_supabase().table("tasks").insert(tasks).execute(), idempotent=False)
+        logger.info("Inserted %d tasks for project %s", len(response.data), project_id)
+
+        gemini_data['project_id'] = project_id
+        project = ProjectResponse(**gemini_data)
+        if compact or fields is not None:
+            return JSONResponse({**project.model_dump(exclude={'tasks'}),
+                                 'weeks': compact_weeks(gemini_data['tasks'], task_fields)})
+        return project
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/get-project/{project_id}", response_model=ProjectDB)
+async def get_project(project_id: int, response: Response, user_id: int = Depends(current_user_id)):
+    try:
+        projects_result = await dependency('supabase').call(
+            'projects.select', select_owned_project,
+            "project_id, project_name, description, category, product_type, timeline, user_id", project_id, user_id)
+        if not projects_result.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+        project = ProjectDB(**projects_result.data[0])
+        project_fallback.set((user_id, project_id), project)
+        return project
+    except DependencyError:
+        project = project_fallback.get((user_id, project_id))
+        if project is None:
+            raise
+        logger.warning("Serving cached project %s", project_id)
+        response.headers.update(STALE_HEADERS)
+        return project
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def group_tasks_by_week(tasks):
+    """
+    Group task rows into weeks, in order of first appearance. Removes
+    `week_no` from each task.
+    """
+    weeks_dict = defaultdict(list)
+    for task in tasks:
+        week_no = task.pop('week_no')
+        weeks_dict[week_no].append(task)
+    return [{'week_no': week_no, 'tasks': tasks} for week_no, tasks in weeks_dict.items()]
+
+
+def build_tasks_response(project):
+    return TasksDB(
+        project_id=project['project_id'],
+        project_name=project['project_name'],
+        description=project['description'],
+        category=project['category'],
+        weeks=group_tasks_by_week(project['tasks'])
+    )
+
+
+def build_compact_tasks(project, fields):
+    return {
+        'project_id': project['project_id'],
+        'project_name': project['project_name'],
+        'description': project['description'],
+        'category': project['category'],
+        'weeks': compact_weeks(project['tasks'], fields),
+    }
+
+
+@router.get("/get-tasks/{project_id}", response_model=TasksDB)
+async def get_tasks(project_id: int, response: Response, compact: bool = Query(False),
+                    fields: Optional[str] = Query(None), user_id: int = Depends(current_user_id)):
+    """
+    With `compact=true` each week also carries its weekly goal, see
+    compact_weeks. `fields=` narrows the tasks and implies compact.
+    """
+    task_fields = parse_fields(fields, TASK_FIELDS)
+    compact = compact or fields is not None
+    cache_key = (user_id, project_id, task_fields) if compact else (user_id, project_id)
+    task_columns = "task_id, week_no, task_no, task, weekly_goal" if compact else "task_id, week_no, task_no, task"
+    try:
+        logger.info("Retrieving tasks for project %s", project_id)
+        result = await dependency('supabase').call(
+            'projects.select', select_owned_project,
+            f"project_id, project_name, description, category, tasks({task_columns})", project_id, user_id)
+        if not result.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+        if compact:
+            tasks_db = build_compact_tasks(result.data[0], task_fields)
+        else:
+            tasks_db = build_tasks_response(result.data[0])
+        tasks_fallback.set(cache_key, tasks_db)
+        logger.debug("Sending response", extra={'payload': LazyJson(tasks_db)})
+        return JSONResponse(tasks_db) if compact else tasks_db
+    except DependencyError:
+        tasks_db = tasks_fallback.get(cache_key)
+        if tasks_db is None:
+            raise
+        logger.warning("Serving cached tasks for project %s", project_id)
+        if compact:
+            return JSONResponse(tasks_db, headers=STALE_HEADERS)
+        response.headers.update(STALE_HEADERS)
+        return tasks_db
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/get-weekly-goal/{project_id}", response_model=WeeklyGoalDB)
+async def get_weekly_goal(project_id: int, user_id: int = Depends(current_user_id)):
+    try:
+        logger.info("Retrieving weekly goals for project %s", project_id)
+        supabase = dependency('supabase')
+        project_details_res = await supabase.call('projects.select', select_owned_project,
+                                                  "project_id, project_name, description, category", project_id,
+                                                  user_id)
+        if not project_details_res.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+        weekly_goals_res = await supabase.call('weekly_goal.select', lambda: (
+            get_supabase().table("weekly_goal")
+            .select("project_id, week_no, weekly_goal")
+            .eq("project_id", project_id)
+            .execute()))
+        project_details_res = project_details_res.data[0]
+        weekly_goals_res = weekly_goals_res.data
+        constructed_result = {
+            'project_id': project_details_res['project_id'],
+            'project_name': project_details_res['project_name'],
+            'description': project_details_res['description'],
+            'category': project_details_res['category'],
+            'weekly_goal': weekly_goals_res
+        }
+        logger.debug("Sending response", extra={'payload': LazyJson(constructed_result)})
+        return WeeklyGoalDB(**constructed_result)
+    except DependencyError:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/get-weekly-tasks/{project_id}/{week_no}", response_model=WeeklyTasksDB)
+async def get_weekly_tasks(project_id: int, week_no: int, compact: bool = Query(False),
+                           fields: Optional[str] = Query(None), user_id: int = Depends(current_user_id)):
+    """
+    With `compact=true` tasks leave out the week number they share.
+    `fields=` narrows the tasks and implies compact.
+    """
+    task_fields = parse_fields(fields, TASK_FIELDS)
+    try:
+        logger.info("Retrieving week %s tasks for project %s", week_no, project_id)
+        supabase = dependency('supabase')
+        # Tasks carry no owner, so the project is checked alongside
+        owned, weekly_tasks_res = await asyncio.gather(
+            supabase.call('projects.select', select_owned_project, "project_id", project_id, user_id),
+            supabase.call('tasks.select', lambda: (
+                get_supabase().table("tasks")
+                .select("project_id, week_no, weekly_goal, task_id, task_no, task")
+                .filter('project_id', 'eq', str(project_id))
+                .filter('week_no', 'eq', str(week_no))
+                .execute())))
+        if not owned.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+        weekly_goal_details = weekly_tasks_res.data[0]
+        constructed_result = {
+            'project_id': weekly_goal_details['project_id'],
+            'week_no': weekly_goal_details['week_no'],
+            'weekly_goal': weekly_goal_details['weekly_goal'],
+            'tasks': weekly_tasks_res.data
+        }
+        logger.debug("Sending response", extra={'payload': LazyJson(constructed_result)})
+        if compact or fields is not None:
+            return JSONResponse({**constructed_result,
+                                 'tasks': [{name: task[name] for name in task_fields} for task in weekly_tasks_res.data]})
+        return WeeklyTasksDB(**constructed_result)
+    except DependencyError:
+        raise
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
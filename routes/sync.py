@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from clients import get_supabase
+from resilience import DependencyError, dependency
+from routes.auth import current_user, current_user_id
+
+logger = logging.getLogger(__name__)
+
+# Every route here acts for a signed-in user
+router = APIRouter(dependencies=[Depends(current_user)])
+
+# Changes younger than this are held back until the next sync, so a slow
+# transaction that commits after a faster, later one is not skipped by the
+# cursor. Rows are stamped when written, not when committed (see the
+# migration), so a transaction open for longer than this can still commit
+# changes behind a cursor already handed out; keep it above the database's
+# statement timeout.
+SYNC_SETTLE_SECONDS = float(os.getenv('SYNC_SETTLE_SECONDS', '5'))
+# Tombstones are purged after this long (see supabase/migrations), so older
+# cursors cannot see every delete and get a full resync instead
+SYNC_RETENTION_DAYS = int(os.getenv('SYNC_RETENTION_DAYS', '30'))
+# Changes per response; clients keep syncing while `has_more` is set
+SYNC_PAGE_SIZE = int(os.getenv('SYNC_PAGE_SIZE', '500'))
+# Marks cursors handed out part way through a full resync. They are exempt
+# from the retention check, since the client is rebuilding from scratch
+RESYNC_CURSOR_SUFFIX = '~resync'
+# Response keys for the entities in the sync_changes view
+SYNC_ENTITIES = {'project': 'projects', 'weekly_goal': 'weekly_goals', 'task': 'tasks'}
+
+
+def parse_cursor(since):
+    """
+    The cursor's timestamp in UTC, and whether it continues a full resync.
+    """
+    resync = since.endswith(RESYNC_CURSOR_SUFFIX)
+    if resync:
+        since = since[:-len(RESYNC_CURSOR_SUFFIX)]
+    try:
+        cursor = datetime.fromisoformat(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid sync cursor: {since}")
+    cursor = cursor.astimezone(timezone.utc) if cursor.tzinfo else cursor.replace(tzinfo=timezone.utc)
+    return cursor, resync
+
+
+def build_sync_response(changes, cursor, reset, has_more=False):
+    """
+    Group changes by entity. Only the latest change to each row is kept, so
+    a row created and deleted since the cursor arrives as a single delete.
+    """
+    latest = {}
+    for change in changes:
+        latest[change['entity'], json.dumps(change['entity_key'], sort_keys=True)] = change
+    response = {'cursor': cursor, 'reset': reset, 'has_more': has_more,
+                **{key: [] for key in SYNC_ENTITIES.values()}, 'deleted': []}
+    for change in latest.values():
+        if change['deleted']:
+            response['deleted'].append({'type': change['entity'], **change['entity_key']})
+        else:
+            response[SYNC_ENTITIES[change['entity']]].append(change['data'])
+    return response
+
+
+def fetch_changes(user_id, since, until, limit=None, at=None):
+    query = (get_supabase().table("sync_changes")
+             .select("entity, entity_key, updated_at, deleted, data")
+             .eq("user_id", user_id))
+    if at is not None:
+        query = query.eq("updated_at", at)
+    else:
+        query = query.lte("updated_at", until)
+        if since is not None:
+            query = query.gt("updated_at", since)
+    query = query.order("updated_at")
+    if limit is not None:
+        query = query.limit(limit)
+    return query.execute().data
+
+
+@router.get("/sync")
+async def sync(since: Optional[str] = Query(None), user_id: int = Depends(current_user_id)):
+    """
+    The signed-in user's projects, weekly goals and tasks created, updated
+    or deleted since the `since` cursor, plus the cursor to pass next time.
+    Without a cursor, or with one older than tombstones are kept, everything
+    is returned with `reset: true` and the client should replace its copy.
+    At most SYNC_PAGE_SIZE changes are returned at a time; while `has_more`
+    is set, sync again straight away with the new cursor.
+    """
+    now = datetime.now(timezone.utc)
+    since_at, resync = parse_cursor(since) if since else (None, False)
+    reset = since_at is None or (not resync and since_at < now - timedelta(days=SYNC_RETENTION_DAYS))
+    settled_at = now - timedelta(seconds=SYNC_SETTLE_SECONDS)
+    cursor = settled_at.isoformat(timespec='microseconds')
+    if not reset and since_at >= settled_at:
+        return build_sync_response([], since, False)
+    try:
+        lower = None if reset else since_at.isoformat(timespec='microseconds')
+        supabase = dependency('supabase')
+        changes = await supabase.call('sync_changes.select', fetch_changes, user_id, lower, cursor,
+                                      SYNC_PAGE_SIZE + 1)
+        has_more = len(changes) > SYNC_PAGE_SIZE
+        if has_more:
+            extra, changes = changes[SYNC_PAGE_SIZE], changes[:SYNC_PAGE_SIZE]
+            last = changes[-1]['updated_at']
+            if extra['updated_at'] == last:
+                # The next page starts after the cursor, so rows sharing the
+                # last timestamp must not be split across pages
+                earlier = [change for change in changes if change['updated_at'] != last]
+                if earlier:
+                    changes = earlier
+                else:
+                    # The whole page shares one timestamp: take every row with it
+                    changes = await supabase.call('sync_changes.select', fetch_changes, user_id, None, None,
+                                                  at=last)
+            cursor = changes[-1]['updated_at']
+            if reset or resync:
+                cursor += RESYNC_CURSOR_SUFFIX
+        if reset:
+            # Nothing to delete on a client that starts from scratch
+            changes = [change for change in changes if not change['deleted']]
+        logger.info("Sync for user %s: %d changes%s%s", user_id, len(changes), " (reset)" if reset else "",
+                    ", more to come" if has_more else "")
+        return build_sync_response(changes, cursor, reset, has_more)
+    except DependencyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
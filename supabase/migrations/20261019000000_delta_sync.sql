@@ -0,0 +1,100 @@
+-- Delta sync (GET /sync): change timestamps on every synced table, tombstones
+-- for deleted rows, and one view over both that serves all of a user's
+-- changes since a cursor as a single indexed range query.
+
+alter table projects add column if not exists updated_at timestamptz not null default clock_timestamp();
+alter table weekly_goal add column if not exists updated_at timestamptz not null default clock_timestamp();
+alter table tasks add column if not exists updated_at timestamptz not null default clock_timestamp();
+
+-- clock_timestamp() rather than now(): rows written by one transaction still
+-- get distinct, increasing timestamps. Either way this is when the row was
+-- written, not when its transaction committed, so a long transaction can
+-- commit rows stamped before a cursor /sync has already handed out. /sync
+-- only serves changes older than SYNC_SETTLE_SECONDS to cover that, which
+-- holds as long as no transaction writing these tables runs longer.
+create or replace function set_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at := clock_timestamp();
+    return new;
+end
+$$;
+
+drop trigger if exists projects_set_updated_at on projects;
+create trigger projects_set_updated_at before insert or update on projects
+    for each row execute function set_updated_at();
+drop trigger if exists weekly_goal_set_updated_at on weekly_goal;
+create trigger weekly_goal_set_updated_at before insert or update on weekly_goal
+    for each row execute function set_updated_at();
+drop trigger if exists tasks_set_updated_at on tasks;
+create trigger tasks_set_updated_at before insert or update on tasks
+    for each row execute function set_updated_at();
+
+create table if not exists tombstones (
+    user_id bigint not null,
+    entity text not null,
+    entity_key jsonb not null,
+    updated_at timestamptz not null default clock_timestamp(),
+    primary key (entity, entity_key)
+);
+
+-- Trigger arguments: the entity name, then the columns identifying a row.
+-- Rows removed by a cascading project delete find no owner and are skipped;
+-- the project's own tombstone tells clients to drop its children.
+create or replace function record_tombstone() returns trigger
+language plpgsql as $$
+declare
+    owner bigint;
+    key jsonb;
+begin
+    if tg_table_name = 'projects' then
+        owner := old.user_id;
+    else
+        select user_id into owner from projects where project_id = old.project_id;
+    end if;
+    if owner is not null then
+        select jsonb_object_agg(k, to_jsonb(old) -> k) into key from unnest(tg_argv[1:tg_nargs - 1]) as k;
+        insert into tombstones (user_id, entity, entity_key) values (owner, tg_argv[0], key)
+        on conflict (entity, entity_key) do update
+            set user_id = excluded.user_id, updated_at = excluded.updated_at;
+    end if;
+    return old;
+end
+$$;
+
+drop trigger if exists projects_tombstone on projects;
+create trigger projects_tombstone after delete on projects
+    for each row execute function record_tombstone('project', 'project_id');
+drop trigger if exists weekly_goal_tombstone on weekly_goal;
+create trigger weekly_goal_tombstone after delete on weekly_goal
+    for each row execute function record_tombstone('weekly_goal', 'project_id', 'week_no');
+drop trigger if exists tasks_tombstone on tasks;
+create trigger tasks_tombstone after delete on tasks
+    for each row execute function record_tombstone('task', 'task_id');
+
+create index if not exists projects_user_id_updated_at on projects (user_id, updated_at);
+create index if not exists weekly_goal_project_id_updated_at on weekly_goal (project_id, updated_at);
+create index if not exists tasks_project_id_updated_at on tasks (project_id, updated_at);
+create index if not exists tombstones_user_id_updated_at on tombstones (user_id, updated_at);
+
+-- Filters on user_id and updated_at are pushed into each branch, so every
+-- branch is a range scan on one of the indexes above
+create or replace view sync_changes with (security_invoker = true) as
+    select p.user_id, 'project' as entity, jsonb_build_object('project_id', p.project_id) as entity_key,
+           p.updated_at, false as deleted, to_jsonb(p) as data
+    from projects p
+    union all
+    select p.user_id, 'weekly_goal', jsonb_build_object('project_id', g.project_id, 'week_no', g.week_no),
+           g.updated_at, false, to_jsonb(g)
+    from weekly_goal g join projects p on p.project_id = g.project_id
+    union all
+    select p.user_id, 'task', jsonb_build_object('task_id', t.task_id), t.updated_at, false, to_jsonb(t)
+    from tasks t join projects p on p.project_id = t.project_id
+    union all
+    select user_id, entity, entity_key, updated_at, true, null
+    from tombstones;
+
+-- Tombstones only need to outlive the oldest cursor /sync accepts
+-- (SYNC_RETENTION_DAYS, 30 by default); older cursors get a full resync.
+-- Purge them on a schedule, e.g. with pg_cron:
+--   delete from tombstones where updated_at < now() - interval '30 days';
@@ -0,0 +1,18 @@
+-- Maps Supabase auth users (the uuid `sub` of their access token) to the
+-- bigint user_id that owns projects and tombstones. The API creates a user's
+-- row the first time they call a route that needs it (routes/auth.py).
+
+create table if not exists app_users (
+    user_id bigint generated by default as identity primary key,
+    auth_user_id uuid not null unique references auth.users (id) on delete cascade,
+    created_at timestamptz not null default now()
+);
+
+alter table app_users enable row level security;
+
+-- New ids start after those already used by projects. Users who own projects
+-- from before this migration need their row inserted by hand with that id:
+--   insert into app_users (user_id, auth_user_id) values (<user_id>, '<auth uuid>');
+select setval(pg_get_serial_sequence('app_users', 'user_id'),
+              greatest((select coalesce(max(user_id), 0) from projects),
+                       (select coalesce(max(user_id), 0) from app_users), 1));
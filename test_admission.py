@@ -0,0 +1,136 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.testclient import TestClient
+
+from admission import AdmissionController, admission_dependency
+from core import create_app
+from metrics import ADMISSION_REQUESTS
+from models import TextInput
+from routes.auth import current_user
+
+
+def make_controller(**overrides):
+    options = dict(user_rate=0.01, user_burst=2, global_rate=100, global_burst=100, max_concurrency=4,
+                   target_delay=0.05)
+    options.update(overrides)
+    return AdmissionController('test', **options)
+
+
+class FakeVerifier:
+    async def verify(self, token):
+        if not token.startswith('user-'):
+            raise ValueError("Invalid token")
+        return {'user_id': token}
+
+
+def as_user(user_id):
+    return {'Authorization': f"Bearer user-{user_id}"}
+
+
+def make_client(controller):
+    router = APIRouter()
+
+    @router.post("/expensive", dependencies=[Depends(admission_dependency(controller, FakeVerifier()))])
+    async def expensive(input_data: TextInput):
+        return {"user_id": input_data.user_id}
+
+    return TestClient(create_app(router))
+
+
+def test_per_user_rate_limit_returns_429_with_retry_after():
+    controller = make_controller()
+    client = make_client(controller)
+    shed_before = ADMISSION_REQUESTS.labels('test', 'user_rate')._value.get()
+
+    statuses = [client.post("/expensive", json={'text': 'idea', 'user_id': 1}, headers=as_user(1)).status_code
+                for _ in range(2)]
+    limited = client.post("/expensive", json={'text': 'idea', 'user_id': 1}, headers=as_user(1))
+    # The body's user_id is ignored, so claiming another user does not help
+    spoofed = client.post("/expensive", json={'text': 'idea', 'user_id': 2}, headers=as_user(1))
+    other_user = client.post("/expensive", json={'text': 'idea', 'user_id': 2}, headers=as_user(2))
+
+    assert statuses == [200, 200]
+    assert limited.status_code == 429 and int(limited.headers['retry-after']) >= 1
+    assert spoofed.status_code == 429
+    assert other_user.status_code == 200
+    assert ADMISSION_REQUESTS.labels('test', 'user_rate')._value.get() == shed_before + 2
+
+
+def test_requests_without_a_valid_token_are_charged_to_the_client_address():
+    client = make_client(make_controller())
+
+    statuses = [client.post("/expensive", json={'text': 'idea', 'user_id': user_id}).status_code
+                for user_id in (1, 2, 3)]
+    invalid = client.post("/expensive", json={'text': 'idea', 'user_id': 4}, headers={'Authorization': 'Bearer x'})
+
+    assert statuses == [200, 200, 429] and invalid.status_code == 429
+
+
+def test_global_rate_limit_returns_503():
+    client = make_client(make_controller(user_burst=10, global_rate=0.01, global_burst=1))
+
+    assert client.post("/expensive", json={'text': 'idea', 'user_id': 1}, headers=as_user(1)).status_code == 200
+    response = client.post("/expensive", json={'text': 'idea', 'user_id': 2}, headers=as_user(2))
+    assert response.status_code == 503 and 'retry-after' in response.headers
+
+
+@pytest.mark.asyncio
+async def test_requests_queue_for_a_slot_then_shed_past_target_delay():
+    controller = make_controller(user_burst=10, max_concurrency=1, target_delay=0.05)
+    release = asyncio.Event()
+    order = []
+
+    async def hold(user, seconds=None):
+        async with controller.admit(user):
+            order.append(user)
+            if seconds is None:
+                await release.wait()
+            else:
+                await asyncio.sleep(seconds)
+
+    first = asyncio.create_task(hold('a'))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as shed:
+        await hold('b', 0)
+    assert shed.value.status_code == 503
+
+    waiting = asyncio.create_task(hold('c', 0))
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(first, waiting)
+
+    assert order == ['a', 'c']
+    assert controller.in_flight == 0 and not controller._waiters
+
+
+def test_global_limit_is_split_between_workers():
+    controller = make_controller(global_rate=8, global_burst=20, workers=4)
+    small_burst = make_controller(global_rate=8, global_burst=2, workers=4)
+
+    assert (controller.global_bucket.rate, controller.global_bucket.capacity) == (2, 5)
+    assert small_burst.global_bucket.capacity == 1
+
+
+def test_user_buckets_are_bounded():
+    controller = make_controller(max_tracked_users=2)
+    for user in ['a', 'b', 'c']:
+        controller.user_bucket(user)
+
+    assert list(controller._user_buckets) == ['b', 'c']
+
+
+def test_gen_tasks_is_admission_controlled(monkeypatch):
+    from routes import projects
+
+    # Less than one token per user, so the first request is already limited
+    monkeypatch.setattr(projects.gen_tasks_admission, 'user_burst', 0.5)
+    monkeypatch.setattr(projects.gen_tasks_admission, '_user_buckets', OrderedDict())
+
+    app = create_app(projects.router)
+    app.dependency_overrides[current_user] = lambda: {'user_id': '1'}
+    response = TestClient(app).post("/gen-tasks", json={'text': 'idea', 'user_id': 1})
+
+    assert response.status_code == 429
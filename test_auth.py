@@ -0,0 +1,113 @@
+import json
+import time
+import jwt
+import pytest
+from types import SimpleNamespace
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from auth import SupabaseTokenVerifier, user_dependency
+
+SECRET = 'super-secret-jwt-token-with-at-least-32-characters'
+
+
+def claims(**overrides):
+    return {
+        'sub': 'user-1',
+        'email': 'user@example.com',
+        'aud': 'authenticated',
+        'exp': int(time.time()) + 3600,
+        'app_metadata': {'provider': 'google'},
+        **overrides,
+    }
+
+
+def make_jwk(private_key, kid):
+    jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+    return {**jwk, 'kid': kid, 'alg': 'ES256', 'use': 'sig'}
+
+
+@pytest.mark.asyncio
+async def test_verifies_hs256_tokens_with_shared_secret():
+    verifier = SupabaseTokenVerifier(supabase_url='http://supabase', jwt_secret=SECRET)
+
+    user = await verifier.verify(jwt.encode(claims(), SECRET, algorithm='HS256'))
+
+    assert user == {'user_id': 'user-1', 'email': 'user@example.com', 'provider': 'google'}
+    with pytest.raises(jwt.ExpiredSignatureError):
+        await verifier.verify(jwt.encode(claims(exp=int(time.time()) - 10), SECRET, algorithm='HS256'))
+    with pytest.raises(jwt.InvalidSignatureError):
+        await verifier.verify(jwt.encode(claims(), SECRET + 'x', algorithm='HS256'))
+
+
+@pytest.mark.asyncio
+async def test_verifies_jwks_tokens_and_refetches_on_rotation():
+    old_key, new_key = ec.generate_private_key(ec.SECP256R1()), ec.generate_private_key(ec.SECP256R1())
+    jwks = {'keys': [make_jwk(old_key, 'old')]}
+    fetches = []
+    now = [0.0]
+
+    def fetch_jwks():
+        fetches.append(now[0])
+        return jwks
+
+    verifier = SupabaseTokenVerifier(supabase_url='http://supabase', fetch_jwks=fetch_jwks, clock=lambda: now[0])
+
+    token = jwt.encode(claims(), old_key, algorithm='ES256', headers={'kid': 'old'})
+    assert (await verifier.verify(token))['user_id'] == 'user-1'
+    assert (await verifier.verify(token))['user_id'] == 'user-1'
+    assert fetches == [0.0]
+
+    jwks['keys'].append(make_jwk(new_key, 'new'))
+    now[0] = 60.0
+    token = jwt.encode(claims(sub='user-2'), new_key, algorithm='ES256', headers={'kid': 'new'})
+    assert (await verifier.verify(token))['user_id'] == 'user-2'
+    assert fetches == [0.0, 60.0]
+
+
+@pytest.mark.asyncio
+async def test_unknown_key_id_falls_back_to_remote_check():
+    signing_key = ec.generate_private_key(ec.SECP256R1())
+    remote_calls = []
+
+    def remote_get_user(access_token):
+        remote_calls.append(access_token)
+        user = SimpleNamespace(id='user-3', email='remote@example.com', app_metadata={'provider': 'github'})
+        return SimpleNamespace(user=user)
+
+    verifier = SupabaseTokenVerifier(supabase_url='http://supabase', fetch_jwks=lambda: {'keys': []},
+                                     remote_get_user=remote_get_user)
+    token = jwt.encode(claims(), signing_key, algorithm='ES256', headers={'kid': 'unknown'})
+
+    assert await verifier.verify(token) == {'user_id': 'user-3', 'email': 'remote@example.com', 'provider': 'github'}
+    assert remote_calls == [token]
+
+
+def test_user_dependency_requires_valid_bearer_token():
+    app = FastAPI()
+    current_user = user_dependency(SupabaseTokenVerifier(supabase_url='http://supabase', jwt_secret=SECRET))
+
+    @app.get("/me")
+    async def me(user: dict = Depends(current_user)):
+        return user
+
+    client = TestClient(app)
+    token = jwt.encode(claims(), SECRET, algorithm='HS256')
+
+    assert client.get("/me", headers={'Authorization': f"Bearer {token}"}).json()['user_id'] == 'user-1'
+    assert client.get("/me").status_code == 401
+    assert client.get("/me", headers={'Authorization': 'Bearer not-a-jwt'}).status_code == 401
+
+
+def test_app_routes_require_a_signed_in_user():
+    from app import app
+
+    client = TestClient(app)
+    requests = [("GET", "/get-project/1"), ("GET", "/get-tasks/1"), ("POST", "/gen-tasks"),
+                ("POST", "/schedule-task"), ("POST", "/schedule-tasks/batch"), ("GET", "/calevents"),
+                ("GET", "/notion/events"), ("GET", "/notion/analytics"), ("GET", "/export"), ("GET", "/sync")]
+
+    for method, path in requests:
+        assert client.request(method, path).status_code == 401, path
@@ -0,0 +1,21 @@
+import os
+
+from benchmarks.suite import find_regressions, load_baselines, run_suite
+
+# Generous so slow or busy CI machines don't flake; tighten locally with --threshold
+BENCHMARK_THRESHOLD = float(os.getenv("BENCHMARK_THRESHOLD", "2.0"))
+
+
+def test_find_regressions_uses_relative_threshold():
+    results = {'a': {'seconds': 1.0, 'relative': 1.4}, 'b': {'seconds': 1.0, 'relative': 1.6},
+               'c': {'seconds': 1.0, 'relative': 9.0}}
+
+    assert find_regressions(results, {'a': 1.0, 'b': 1.0}, threshold=0.5) == [('b', 1.0, 1.6)]
+
+
+def test_hot_paths_within_baseline():
+    results = run_suite('realistic', rounds=3, min_time=0.02)
+    baselines = load_baselines()
+
+    assert set(results) <= set(baselines)
+    assert find_regressions(results, baselines, BENCHMARK_THRESHOLD) == []
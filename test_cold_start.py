@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Import budget per entry point; generous so slow CI machines don't flake
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "1200"))
+# SDKs that must only be imported on first use, never at startup
+DEFERRED_MODULES = ['google.generativeai', 'googleapiclient.discovery', 'google_auth_oauthlib', 'supabase',
+                    'notion_client', 'numpy']
+
+
+def import_times(module):
+    """
+    Import `module` in a fresh interpreter under `-X importtime` and return
+    the cumulative import time in microseconds of every module it loaded.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize('entry_point', ['app', 'backend'])
+def test_entry_point_defers_heavy_imports(entry_point):
+    loaded = import_times(entry_point)
+
+    assert [module for module in DEFERRED_MODULES if module in loaded] == []
+
+
+@pytest.mark.parametrize('entry_point', ['app', 'backend'])
+def test_entry_point_import_time_within_budget(entry_point):
+    # Best of three runs to keep scheduler noise out of the measurement
+    best_ms = min(import_times(entry_point)[entry_point] for _ in range(3)) / 1000
+
+    assert best_ms <= COLD_START_BUDGET_MS, f"Importing {entry_point} took {best_ms:.0f}ms"
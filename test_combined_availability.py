@@ -0,0 +1,151 @@
+import json
+import pytest
+from zoneinfo import ZoneInfo
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+from calendars.availability_cache import AvailabilityCache, CalendarVersions
+from calendars.combined_availability import get_combined_availability, merge_busy_events, normalize_notion_event
+from calendars.event_store import EventStore
+
+TZ = ZoneInfo('America/Los_Angeles')
+
+
+def test_normalize_notion_event():
+    timed = normalize_notion_event({'name': 'Deep work', 'start': '2024-07-16T09:00:00.000-07:00',
+                                    'end': '2024-07-16T11:00:00.000-07:00'}, TZ)
+    by_hours = normalize_notion_event({'name': 'Mixing', 'start': '2024-07-16T13:00:00', 'end': None,
+                                       'hours_spent': 1.5}, TZ)
+
+    assert (timed['start'].strftime('%H:%M'), timed['end'].strftime('%H:%M')) == ('09:00', '11:00')
+    assert (by_hours['start'].strftime('%H:%M'), by_hours['end'].strftime('%H:%M')) == ('13:00', '14:30')
+    assert normalize_notion_event({'name': 'Plan', 'start': '2024-07-16', 'end': None}, TZ) is None
+
+
+def test_merge_busy_events_folds_overlaps():
+    def busy(start, end, summary, event_type):
+        return {'start': datetime(2024, 7, 16, *start, tzinfo=TZ), 'end': datetime(2024, 7, 16, *end, tzinfo=TZ),
+                'summary': summary, 'event_type': event_type}
+
+    merged = merge_busy_events([
+        busy((10, 30), (12, 0), 'Deep work', 'notion'),
+        busy((9, 0), (11, 0), 'Standup', 'default'),
+        busy((13, 0), (14, 0), 'Lunch', 'default'),
+    ])
+
+    assert [(m['start'].hour, m['end'].hour, m['summary'], m['event_type']) for m in merged] == [
+        (9, 12, 'Standup, Deep work', 'mixed'),
+        (13, 14, 'Lunch', 'default'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_combined_availability_merges_sources():
+    service = MagicMock()
+    service.calendarList().get().execute.return_value = {'timeZone': 'America/Los_Angeles'}
+    service.events().list().execute.return_value = {'items': [{
+        'summary': 'Standup',
+        'start': {'dateTime': '2024-07-16T09:00:00-07:00'},
+        'end': {'dateTime': '2024-07-16T10:00:00-07:00'},
+    }]}
+
+    async def fake_service():
+        return service
+
+    async def fake_notion_events(database_id, notion_token, start_date=None, end_date=None):
+        assert (start_date, end_date) == ('2024-07-16', '2024-07-16')
+        yield {'name': 'Deep work', 'start': '2024-07-16T09:30:00.000-07:00', 'end': '2024-07-16T11:00:00.000-07:00'}
+
+    with patch('calendars.combined_availability.get_calendar_service', fake_service), \
+            patch('calendars.combined_availability.iter_calendar_events', fake_notion_events):
+        result = json.loads(await get_combined_availability(datetime(2024, 7, 16), datetime(2024, 7, 16, 23),
+                                                            'db', 'token'))
+
+    assert result['available_blocks']['2024-07-16'] == [
+        {'start': '00:00', 'end': '09:00', 'is_available': True},
+        {'start': '09:00', 'end': '11:00', 'is_available': False,
+         'event_name': 'Standup, Deep work', 'event_type': 'mixed'},
+        {'start': '11:00', 'end': '00:00', 'is_available': True},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_calendar_reads_are_cached_until_a_push_notification():
+    service = MagicMock()
+    service.calendarList().get().execute.return_value = {'timeZone': 'America/Los_Angeles'}
+    service.events().list().execute.return_value = {'items': []}
+    cache = AvailabilityCache(versions=CalendarVersions(':memory:'))
+
+    async def fake_service():
+        return service
+
+    async def fake_notion_events(database_id, notion_token, start_date=None, end_date=None):
+        return
+        yield
+
+    async def availability():
+        return await get_combined_availability(datetime(2024, 7, 16), datetime(2024, 7, 16, 23), 'db', 'token',
+                                               user_id='user-1', cache=cache)
+
+    with patch('calendars.combined_availability.get_calendar_service', fake_service), \
+            patch('calendars.combined_availability.iter_calendar_events', fake_notion_events):
+        service.events().list.reset_mock()
+        await availability()
+        await availability()
+        assert service.events().list.call_count == 1
+        cache.invalidate('user-1')
+        await availability()
+        assert service.events().list.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_calendar_reads_go_through_the_event_store():
+    service = MagicMock()
+    service.calendarList().get().execute.return_value = {'timeZone': 'America/Los_Angeles'}
+    service.events().list().execute.return_value = {'items': [{
+        'id': 'e1', 'summary': 'Standup',
+        'start': {'dateTime': '2024-07-16T09:00:00-07:00'},
+        'end': {'dateTime': '2024-07-16T10:00:00-07:00'},
+    }], 'nextSyncToken': 's1'}
+    store = EventStore(':memory:')
+
+    async def fake_service():
+        return service
+
+    async def fake_notion_events(database_id, notion_token, start_date=None, end_date=None):
+        return
+        yield
+
+    with patch('calendars.combined_availability.get_calendar_service', fake_service), \
+            patch('calendars.combined_availability.iter_calendar_events', fake_notion_events):
+        service.events().list.reset_mock()
+        for _ in range(2):
+            result = json.loads(await get_combined_availability(datetime(2024, 7, 16), datetime(2024, 7, 16, 23),
+                                                                'db', 'token', user_id='user-1', store=store))
+
+    # The second read only asks Google for what changed since the first
+    assert [call.kwargs.get('syncToken') for call in service.events().list.call_args_list] == [None, 's1']
+    assert [e['id'] for e in store.events_between('user-1', 'primary')] == ['e1']
+    assert result['available_blocks']['2024-07-16'][1]['event_name'] == 'Standup'
+
+
+def test_availability_route_passes_calendar_ids(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app import app
+    from loadtest.run import auth_headers, offline_services
+
+    calls = []
+
+    async def fake_availability(start_date, end_date, notion_database_id, **kwargs):
+        calls.append(kwargs['calendar_ids'])
+        return '{}'
+
+    monkeypatch.setattr('routes.calendar.get_combined_availability', fake_availability)
+    params = {'start_date': '2024-07-16T00:00:00', 'end_date': '2024-07-17T00:00:00', 'notion_database_id': 'db'}
+    with offline_services(gemini_latency=0, calendar_latency=0, postgrest_latency=0, notion_latency=0):
+        client = TestClient(app, headers=auth_headers())
+        client.get("/availability", params=params)
+        client.get("/availability", params={**params, 'calendar_ids': ['primary', 'work@example.com']})
+
+    assert calls == [None, ['primary', 'work@example.com']]
@@ -0,0 +1,130 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from fastapi import APIRouter
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compression
+from compression import choose_encoding, parse_accept_encoding
+from core import create_app
+from loadtest.run import auth_headers, offline_services
+
+LARGE = {'items': [{'task': f"Task {i}", 'weekly_goal': "Ship the first version"} for i in range(100)]}
+
+
+def make_client():
+    router = APIRouter()
+
+    @router.get("/large")
+    def large():
+        return LARGE
+
+    @router.get("/small")
+    def small():
+        return {'ok': True}
+
+    @router.get("/encoded")
+    def encoded():
+        return Response(gzip.compress(b'x' * 5000), media_type='text/plain', headers={'Content-Encoding': 'gzip'})
+
+    @router.get("/stream")
+    def stream():
+        return StreamingResponse((f"line {i}\n" * 10 for i in range(5)), media_type='application/x-ndjson')
+
+    @router.get("/image")
+    def image():
+        return Response(b'\x89PNG' + b'\x00' * 5000, media_type='image/png')
+
+    return TestClient(create_app(router))
+
+
+def test_negotiates_encoding():
+    assert parse_accept_encoding("gzip;q=0.5, br, *;q=0") == {'gzip': 0.5, 'br': 1.0, '*': 0.0}
+    assert choose_encoding("gzip, deflate") == 'gzip'
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("*") in ('br', 'gzip')
+
+
+def test_brotli_preferred_when_installed(monkeypatch):
+    if compression.brotli is None:
+        monkeypatch.setattr(compression, 'brotli', object())
+    assert choose_encoding("gzip, br") == 'br'
+    monkeypatch.setattr(compression, 'brotli', None)
+    assert choose_encoding("gzip, br") == 'gzip'
+
+
+def test_compresses_large_json_only():
+    client = make_client()
+    headers = {'Accept-Encoding': 'gzip'}
+
+    large = client.get("/large", headers=headers)
+    small = client.get("/small", headers=headers)
+    identity = client.get("/large", headers={'Accept-Encoding': 'identity'})
+    image = client.get("/image", headers=headers)
+
+    assert large.headers['content-encoding'] == 'gzip' and 'accept-encoding' in large.headers['vary'].lower()
+    assert large.json() == LARGE
+    assert int(large.headers['content-length']) < len(identity.content) / 5
+    assert 'content-encoding' not in small.headers
+    assert 'content-encoding' not in identity.headers
+    assert 'content-encoding' not in image.headers
+
+
+def test_does_not_recompress_encoded_responses():
+    response = make_client().get("/encoded", headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.text == 'x' * 5000
+
+
+def test_streams_compressed_chunks():
+    response = make_client().get("/stream", headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.text == ''.join(f"line {i}\n" * 10 for i in range(5))
+
+
+def test_gzip_chunks_decode_as_they_arrive():
+    compressor = compression._Compressor('gzip')
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    assert decompressor.decompress(compressor.compress(b'first', final=False)) == b'first'
+    assert decompressor.decompress(compressor.compress(b' second', final=True)) == b' second'
+
+
+@pytest.fixture
+def offline_client():
+    from app import app
+
+    with offline_services(projects=1, weeks=4, gemini_latency=0, gemini_tokens_per_second=0, calendar_latency=0,
+                          postgrest_latency=0, notion_latency=0):
+        with TestClient(app, headers=auth_headers()) as client:
+            yield client
+
+
+def test_compact_tasks_hoist_weekly_goals_and_project_fields(offline_client):
+    full = offline_client.get("/get-tasks/1", headers={'Accept-Encoding': 'identity'})
+    compact = offline_client.get("/get-tasks/1", params={'fields': 'task_id,task'},
+                                 headers={'Accept-Encoding': 'identity'})
+
+    weeks = compact.json()['weeks']
+    assert [week['week_no'] for week in weeks] == [1, 2, 3, 4]
+    assert weeks[0]['weekly_goal'] == "Goal for week 1"
+    assert set(weeks[0]['tasks'][0]) == {'task_id', 'task'}
+    assert len(compact.content) < len(full.content)
+    assert offline_client.get("/get-tasks/1", params={'fields': 'task,secret'}).status_code == 400
+
+
+def test_compact_generated_and_weekly_tasks(offline_client):
+    generated = offline_client.post("/gen-tasks", params={'compact': 'true'}, json={'text': 'idea'})
+    weekly = offline_client.get("/get-weekly-tasks/1/2", params={'fields': 'task_no'})
+
+    body = generated.json()
+    assert 'tasks' not in body and body['weeks'][0]['weekly_goal']
+    assert set(body['weeks'][0]['tasks'][0]) == {'task_no', 'task'}
+    assert weekly.json()['weekly_goal'] == "Goal for week 2"
+    assert all(task == {'task_no': task['task_no']} for task in weekly.json()['tasks'])
+    assert json.loads(offline_client.get("/get-weekly-tasks/1/2").content)['tasks'][0]['week_no'] == 2
@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock, patch
+
+from fastapi import APIRouter
+from fastapi.testclient import TestClient
+
+import clients
+from core import create_app
+
+
+def test_app_and_backend_mount_the_same_routers():
+    import app
+    import backend
+    from routes import projects
+
+    app_paths, backend_paths = set(app.app.openapi()['paths']), set(backend.app.openapi()['paths'])
+
+    for path in ['/gen-tasks', '/get-tasks/{project_id}', '/schedule-task', '/calevents']:
+        assert path in app_paths and path in backend_paths
+    assert '/notion/events' in app_paths and '/user' in backend_paths
+    assert app.generate_tasks is projects.generate_tasks
+
+
+def test_lifespan_warms_and_releases_shared_resources(monkeypatch):
+    router = APIRouter()
+
+    @router.get("/ping")
+    def ping():
+        return {"session": id(clients.get_http_session())}
+
+    monkeypatch.setenv("WARM_CLIENTS_ON_STARTUP", "1")
+    with patch('core.warm_clients') as warm, patch('core.close_clients') as close, \
+            patch('core.close_event_store') as close_events, patch('core.close_notion_store') as close_notion:
+        with TestClient(create_app(router)) as client:
+            first = client.get("/ping").json()
+            second = client.get("/ping").json()
+            assert client.get("/").json() == {"message": "Hello, World!"}
+            warm.assert_called_once()
+            close.assert_not_called()
+        close.assert_called_once()
+        close_events.assert_called_once()
+        close_notion.assert_called_once()
+    assert first == second
+    clients.close_clients()
+
+
+def test_close_clients_closes_http_session():
+    session = clients.get_http_session()
+    session.close = MagicMock()
+
+    clients.close_clients()
+
+    session.close.assert_called_once()
+    assert clients.get_http_session() is not session
+    clients.close_clients()
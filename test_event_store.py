@@ -0,0 +1,116 @@
+import pytest
+from datetime import datetime, timezone
+
+from calendars.event_store import EventStore, SyncTokenExpired, sync_events
+
+
+def make_event(event_id, start, end, summary='Busy'):
+    return {
+        'id': event_id,
+        'summary': summary,
+        'start': {'dateTime': start},
+        'end': {'dateTime': end},
+    }
+
+
+class FakeCalendar:
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = []
+
+    def __call__(self, params):
+        self.calls.append(dict(params))
+        key = params.get('syncToken')
+        if key == 'expired':
+            raise SyncTokenExpired()
+        return self.pages[(key, params.get('pageToken'))]
+
+
+@pytest.fixture
+def store():
+    store = EventStore(':memory:')
+    yield store
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_full_then_incremental_sync(store):
+    fetch_page = FakeCalendar({
+        (None, None): {
+            'items': [make_event('a', '2024-07-16T09:00:00Z', '2024-07-16T10:00:00Z')],
+            'nextPageToken': 'p2',
+        },
+        (None, 'p2'): {
+            'items': [make_event('b', '2024-07-17T09:00:00Z', '2024-07-17T10:00:00Z')],
+            'nextSyncToken': 's1',
+        },
+        ('s1', None): {
+            'items': [
+                {'id': 'a', 'status': 'cancelled'},
+                make_event('c', '2024-07-18T09:00:00Z', '2024-07-18T10:00:00Z'),
+            ],
+            'nextSyncToken': 's2',
+        },
+    })
+
+    await sync_events(store, fetch_page, 'user-1')
+    assert [e['id'] for e in store.events_between('user-1', 'primary')] == ['a', 'b']
+    assert store.get_sync_token('user-1', 'primary') == 's1'
+
+    await sync_events(store, fetch_page, 'user-1')
+    assert fetch_page.calls[-1] == {'singleEvents': True, 'syncToken': 's1'}
+    assert [e['id'] for e in store.events_between('user-1', 'primary')] == ['b', 'c']
+    assert store.get_sync_token('user-1', 'primary') == 's2'
+
+
+@pytest.mark.asyncio
+async def test_expired_sync_token_triggers_full_sync(store):
+    store.apply_changes('user-1', 'primary',
+                        [make_event('stale', '2024-07-16T09:00:00Z', '2024-07-16T10:00:00Z')], 'expired')
+    fetch_page = FakeCalendar({
+        (None, None): {
+            'items': [make_event('fresh', '2024-07-16T11:00:00Z', '2024-07-16T12:00:00Z')],
+            'nextSyncToken': 's1',
+        },
+    })
+
+    await sync_events(store, fetch_page, 'user-1')
+
+    assert [e['id'] for e in store.events_between('user-1', 'primary')] == ['fresh']
+    assert store.get_sync_token('user-1', 'primary') == 's1'
+
+
+def test_events_between_filters_range(store):
+    store.apply_changes('user-1', 'primary', [
+        make_event('early', '2024-07-15T09:00:00Z', '2024-07-15T10:00:00Z'),
+        make_event('inside', '2024-07-16T09:00:00Z', '2024-07-16T10:00:00Z'),
+        {'id': 'all-day', 'start': {'date': '2024-07-17'}, 'end': {'date': '2024-07-18'}},
+    ], 's1')
+
+    events = store.events_between('user-1', 'primary',
+                                  datetime(2024, 7, 16, tzinfo=timezone.utc),
+                                  datetime(2024, 7, 17, tzinfo=timezone.utc))
+
+    assert [e['id'] for e in events] == ['inside', 'all-day']
+    assert store.events_between('user-2', 'primary') == []
+
+
+def test_calevents_store_is_keyed_on_the_verified_user():
+    from fastapi.testclient import TestClient
+
+    from app import app
+    from calendars.event_store import get_event_store
+    from loadtest.run import LOADTEST_USER, auth_headers, offline_services
+
+    with offline_services(events=5, gemini_latency=0, calendar_latency=0, postgrest_latency=0, notion_latency=0):
+        client = TestClient(app)
+        params = {'access_token': 'google-token', 'user_id': LOADTEST_USER}
+
+        own = client.get("/calevents", params=params, headers=auth_headers())
+        other = client.get("/calevents", params=params, headers=auth_headers('someone-else'))
+        anonymous = client.get("/calevents", params=params)
+
+        assert own.status_code == 200 and len(own.json()['events']) == 5
+        assert len(get_event_store().events_between(LOADTEST_USER, 'primary')) == 5
+        assert get_event_store().events_between('someone-else', 'primary') == []
+    assert other.status_code == 403 and anonymous.status_code == 401
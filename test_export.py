@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from loadtest.run import auth_headers, offline_services
+from routes import export
+
+
+OTHER_USER = str(uuid.uuid4())
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    from app import app
+
+    monkeypatch.setattr(export, 'EXPORT_PAGE_SIZE', 4)
+    with offline_services(projects=5, weeks=2, gemini_latency=0, gemini_tokens_per_second=0, calendar_latency=0,
+                          postgrest_latency=0, notion_latency=0) as services:
+        other_user_id = services.postgrest.insert('app_users', [{'auth_user_id': OTHER_USER}])[0]['user_id']
+        services.postgrest.tables['projects'].append({
+            'project_id': 6, 'user_id': other_user_id, 'project_name': "Someone else's", 'description': '', 'category': 'tech',
+            'product_type': 'app', 'timeline': '1 week',
+        })
+        pages = []
+        select = services.postgrest.select
+
+        def record_select(table, *args, **kwargs):
+            rows = select(table, *args, **kwargs)
+            pages.append((table, len(rows)))
+            return rows
+        services.postgrest.select = record_select
+        with TestClient(app, headers=auth_headers()) as client:
+            yield client, pages
+
+
+def test_ndjson_export_pages_through_all_rows(offline):
+    client, pages = offline
+    response = client.get("/export")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    projects = [row for row in rows if row['type'] == 'project']
+    tasks = [row for row in rows if row['type'] == 'task']
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    assert [project['project_id'] for project in projects] == [1, 2, 3, 4, 5]
+    assert len(tasks) == 5 * 2 * 3 and len({task['task_id'] for task in tasks}) == len(tasks)
+    assert tasks[0]['weekly_goal'] == "Goal for week 1"
+    # Every query is bounded by the page size, however many rows the user has
+    assert max(count for _, count in pages) == 4
+    assert ('projects', 1) in pages
+
+
+def test_csv_export(offline):
+    client, _ = offline
+    response = client.get("/export", params={'format': 'csv'})
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert response.headers['content-type'].startswith('text/csv')
+    assert tuple(rows[0]) == export.CSV_COLUMNS
+    assert rows[0]['type'] == 'project' and rows[0]['task'] == ''
+    assert sum(row['type'] == 'task' for row in rows) == 30
+
+
+def test_export_of_empty_account_and_bad_format(offline):
+    client, _ = offline
+
+    empty = auth_headers(str(uuid.uuid4()))
+
+    assert client.get("/export", headers=empty).text == ''
+    assert client.get("/export", params={'format': 'csv'}, headers=empty).text.strip() == ','.join(export.CSV_COLUMNS)
+    assert client.get("/export", params={'format': 'xml'}).status_code == 400
+
+
+def test_export_only_returns_the_signed_in_users_data(offline):
+    client, _ = offline
+
+    # A user_id parameter naming someone else is ignored
+    rows = [json.loads(line) for line in client.get("/export", params={'user_id': 1},
+                                                    headers=auth_headers(OTHER_USER)).text.splitlines()]
+
+    assert [(row['type'], row['project_id']) for row in rows] == [('project', 6)]
+    assert client.get("/export", headers={'Authorization': 'Bearer forged'}).status_code == 401
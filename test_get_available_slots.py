@@ -0,0 +1,62 @@
+import pytest
+from zoneinfo import ZoneInfo
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from calendars.get_available_slots import build_day_blocks, get_busy_intervals, merge_intervals
+
+
+def test_merge_intervals_coalesces_overlaps():
+    intervals = [(5, 7), (1, 3), (2, 4), (7, 8), (10, 11)]
+
+    assert merge_intervals(intervals) == [(1, 4), (5, 8), (10, 11)]
+
+
+@pytest.mark.asyncio
+async def test_get_busy_intervals_merges_calendars():
+    service = MagicMock()
+    service.freebusy().query().execute.return_value = {
+        'calendars': {
+            'primary': {'busy': [{'start': '2024-07-16T09:00:00-07:00', 'end': '2024-07-16T10:00:00-07:00'}]},
+            'work@example.com': {'busy': [{'start': '2024-07-16T09:30:00-07:00', 'end': '2024-07-16T11:00:00-07:00'}]},
+        }
+    }
+    tz = ZoneInfo('America/Los_Angeles')
+
+    intervals = await get_busy_intervals(service, ['primary', 'work@example.com'],
+                                         datetime(2024, 7, 16, tzinfo=tz), datetime(2024, 7, 17, tzinfo=tz),
+                                         'America/Los_Angeles')
+
+    body = service.freebusy().query.call_args.kwargs['body']
+    assert body['items'] == [{'id': 'primary'}, {'id': 'work@example.com'}]
+    assert [(s.strftime('%H:%M'), e.strftime('%H:%M')) for s, e in intervals] == [('09:00', '11:00')]
+
+
+@pytest.mark.asyncio
+async def test_get_busy_intervals_raises_on_calendar_errors():
+    service = MagicMock()
+    service.freebusy().query().execute.return_value = {
+        'calendars': {'missing@example.com': {'errors': [{'reason': 'notFound'}]}}
+    }
+
+    with pytest.raises(Exception, match='notFound'):
+        await get_busy_intervals(service, ['missing@example.com'], datetime(2024, 7, 16), datetime(2024, 7, 17))
+
+
+def test_build_day_blocks():
+    tz = ZoneInfo('UTC')
+    busy = [{
+        'start': datetime(2024, 7, 16, 9, tzinfo=tz),
+        'end': datetime(2024, 7, 16, 10, tzinfo=tz),
+        'summary': 'Standup',
+        'event_type': 'default',
+    }]
+
+    blocks = build_day_blocks(busy, datetime(2024, 7, 16, tzinfo=tz), datetime(2024, 7, 17, tzinfo=tz), tz)
+
+    assert blocks['2024-07-16'] == [
+        {'start': '00:00', 'end': '09:00', 'is_available': True},
+        {'start': '09:00', 'end': '10:00', 'is_available': False, 'event_name': 'Standup', 'event_type': 'default'},
+        {'start': '10:00', 'end': '00:00', 'is_available': True},
+    ]
+    assert blocks['2024-07-17'] == [{'start': '00:00', 'end': '00:00', 'is_available': True}]
@@ -0,0 +1,35 @@
+import pytest
+
+from loadtest.fakes import FakePostgREST, PostgRESTError, parse_select, seed_projects
+from loadtest.run import build_scenarios, run_load
+
+
+def test_parse_select_handles_embeds_and_rejects_unbalanced_parentheses():
+    assert parse_select("project_id, name, tasks(task_id, week_no)") == (
+        ['project_id', 'name'], {'tasks': 'task_id,week_no'}
+    )
+    with pytest.raises(PostgRESTError):
+        parse_select("project_id, category)")
+
+
+def test_fake_postgrest_embeds_child_rows_and_generates_keys():
+    postgrest = FakePostgREST(seed_projects(projects=2, weeks=2))
+
+    [project] = postgrest.select('projects', 'project_id, tasks(task_no)', {'project_id': 'eq.2'})
+    created = postgrest.insert('projects', [{'project_name': 'New'}])
+
+    assert project == {'project_id': 2, 'tasks': [{'task_no': n} for n in (1, 2, 3, 1, 2, 3)]}
+    assert created[0]['project_id'] == 3
+
+
+@pytest.mark.asyncio
+async def test_every_endpoint_succeeds_against_the_fakes():
+    results = await run_load(requests=3, concurrency=2, projects=2, weeks=2, events=20, notion_pages=10,
+                             gemini_latency=0, gemini_tokens_per_second=0, calendar_latency=0,
+                             postgrest_latency=0, notion_latency=0)
+
+    assert [stats.name for stats in results] == [scenario.name for scenario in build_scenarios(2, 2)]
+    for stats in results:
+        assert stats.errors == 0, f"{stats.name}: {stats.last_error}"
+        assert len(stats.latencies) == 3
+        assert 0 < stats.percentile(50) <= stats.percentile(99)
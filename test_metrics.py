@@ -0,0 +1,55 @@
+import pytest
+from fastapi import APIRouter, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from core import create_app
+from metrics import track_dependency
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_routes_are_timed_by_template_and_exposed():
+    router = APIRouter()
+
+    @router.get("/widgets/{widget_id}")
+    async def get_widget(widget_id: int):
+        if widget_id == 0:
+            raise HTTPException(status_code=404, detail="Not found")
+        return {"id": widget_id}
+
+    before_ok = sample('http_request_duration_seconds_count', method='GET', route='/widgets/{widget_id}', status='200')
+    before_missing = sample('http_request_duration_seconds_count', method='GET', route='/widgets/{widget_id}',
+                            status='404')
+    with TestClient(create_app(router)) as client:
+        client.get("/widgets/1")
+        client.get("/widgets/2")
+        client.get("/widgets/0")
+        body = client.get("/metrics").text
+
+    assert sample('http_request_duration_seconds_count', method='GET', route='/widgets/{widget_id}',
+                  status='200') == before_ok + 2
+    assert sample('http_request_duration_seconds_count', method='GET', route='/widgets/{widget_id}',
+                  status='404') == before_missing + 1
+    assert sample('http_requests_in_flight', method='GET') == 0
+    assert 'http_request_duration_seconds_bucket{' in body
+    assert 'dependency_calls_total' in body
+
+
+def test_dependency_calls_record_latency_and_outcome():
+    labels = {'dependency': 'gemini', 'operation': 'test_call'}
+    before_success = sample('dependency_calls_total', outcome='success', **labels)
+    before_error = sample('dependency_calls_total', outcome='TimeoutError', **labels)
+    before_count = sample('dependency_call_duration_seconds_count', **labels)
+
+    with track_dependency('gemini', 'test_call'):
+        pass
+    with pytest.raises(TimeoutError):
+        with track_dependency('gemini', 'test_call'):
+            raise TimeoutError()
+
+    assert sample('dependency_calls_total', outcome='success', **labels) == before_success + 1
+    assert sample('dependency_calls_total', outcome='TimeoutError', **labels) == before_error + 1
+    assert sample('dependency_call_duration_seconds_count', **labels) == before_count + 2
@@ -0,0 +1,115 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from calendars import notion_analytics
+from calendars.notion_analytics import SessionAnalytics
+
+
+def make_event(page_id, project, start, hours, complete=False):
+    return {'id': page_id, 'project': project, 'start': start, 'hours_spent': hours, 'is_complete': complete}
+
+
+def test_summary_aggregates_hours_per_project_week():
+    analytics = SessionAnalytics(capacity=2)
+    analytics.upsert([
+        make_event('s1', 'Lyfe', '2024-07-15T09:00:00', 1.5, True),
+        make_event('s2', 'Lyfe', '2024-07-16T09:00:00', 2),
+        make_event('s3', 'Lyfe', '2024-07-22T09:00:00', 1),
+        make_event('s4', 'Album', '2024-07-16T09:00:00', '', True),
+        make_event('s5', 'Album', None, 0.5),
+    ])
+
+    assert analytics.summary() == {'projects': [
+        {'project': 'Lyfe', 'total_hours': 4.5, 'sessions': 3, 'completed': 1, 'completion_rate': 0.3333,
+         'weeks': [{'week': '2024-W29', 'hours': 3.5}, {'week': '2024-W30', 'hours': 1.0}]},
+        {'project': 'Album', 'total_hours': 0.5, 'sessions': 2, 'completed': 1, 'completion_rate': 0.5,
+         'weeks': [{'week': '2024-W29', 'hours': 0.0}]},
+    ]}
+
+
+def test_sync_applies_only_changes_and_reuses_cached_summary():
+    analytics = SessionAnalytics()
+    events = [make_event('s1', 'Lyfe', '2024-07-15T09:00:00', 1), make_event('s2', 'Lyfe', '2024-07-16T09:00:00', 2)]
+    analytics.sync(events)
+    first = analytics.summary()
+
+    assert analytics.sync(events) == 0
+    assert analytics.summary() is first
+
+    assert analytics.sync([make_event('s1', 'Lyfe', '2024-07-15T09:00:00', 4)]) == 2
+    assert analytics.summary()['projects'][0]['total_hours'] == 4
+
+
+def test_analytics_route_applies_only_changed_pages(monkeypatch):
+    from app import app
+    from loadtest.run import NOTION_DATABASE_ID, auth_headers, offline_services
+
+    monkeypatch.setattr(notion_analytics, '_analytics', {})
+    with offline_services(notion_pages=8, gemini_latency=0, calendar_latency=0, postgrest_latency=0,
+                          notion_latency=0) as services:
+        client = TestClient(app, headers=auth_headers())
+        params = {'database_id': NOTION_DATABASE_ID}
+        first = client.get("/notion/analytics", params=params).json()
+        assert sum(project['sessions'] for project in first['projects']) == 8
+
+        analytics = notion_analytics._analytics[NOTION_DATABASE_ID]
+        changed = []
+        upsert = analytics.upsert
+        monkeypatch.setattr(analytics, 'upsert', lambda events: changed.append((len(events), upsert(events))))
+        # Move the other pages' edits out of the boundary minute that is always re-read
+        for page in services.notion.all_pages:
+            page['last_edited_time'] = '2024-07-16T09:00:00.000Z'
+        services.notion.all_pages[0]['last_edited_time'] = '2024-07-17T10:00:00.000Z'
+        services.notion.all_pages[0]['properties']['Hours spent']['formula']['number'] = 3
+        second = client.get("/notion/analytics", params=params).json()
+
+    assert changed == [(1, 1)]
+    assert sum(project['total_hours'] for project in second['projects']) == 10
+
+
+def test_analytics_route_picks_up_changes_synced_by_other_workers(monkeypatch):
+    from app import app
+    from calendars.notion_store import get_notion_store
+    from loadtest.run import NOTION_DATABASE_ID, auth_headers, offline_services
+
+    monkeypatch.setattr(notion_analytics, '_analytics', {})
+    with offline_services(notion_pages=8, gemini_latency=0, calendar_latency=0, postgrest_latency=0,
+                          notion_latency=0):
+        client = TestClient(app, headers=auth_headers())
+        params = {'database_id': NOTION_DATABASE_ID}
+        first = client.get("/notion/analytics", params=params).json()
+
+        # Another worker syncs an edit and sweeps out a deleted page. Its mark
+        # is past every page, so this worker's next sync reads nothing itself
+        store = get_notion_store()
+        events = store.events(NOTION_DATABASE_ID)
+        edited, deleted = events[:2]
+        sync_key = f"{NOTION_DATABASE_ID}::"
+        store.apply_changes(NOTION_DATABASE_ID, sync_key, [
+            (edited['id'], '2099-01-01T00:00:00.000Z', {**edited, 'hours_spent': edited['hours_spent'] + 5}, False),
+        ], '2099-01-01T00:00:00.000Z')
+        store.finish_sweep(NOTION_DATABASE_ID, sync_key, {event['id'] for event in events if event is not deleted},
+                           None, None, time.time())
+        second = client.get("/notion/analytics", params=params).json()
+
+    def totals(summary):
+        return (sum(project['sessions'] for project in summary['projects']),
+                round(sum(project['total_hours'] for project in summary['projects']), 2))
+
+    sessions, hours = totals(first)
+    assert totals(second) == (sessions - 1, round(hours + 5 - deleted['hours_spent'], 2))
+
+
+def test_analytics_route_raises_on_failure(monkeypatch):
+    from app import app
+    from loadtest.run import auth_headers, offline_services
+
+    async def failing_sync(*args, **kwargs):
+        raise ValueError("Notion is unreachable")
+
+    monkeypatch.setattr('routes.notion.sync_calendar_pages', failing_sync)
+    with offline_services(gemini_latency=0, calendar_latency=0, postgrest_latency=0, notion_latency=0):
+        response = TestClient(app, headers=auth_headers()).get("/notion/analytics", params={'database_id': 'db'})
+
+    assert response.status_code == 500 and response.json()['detail'] == "Notion is unreachable"
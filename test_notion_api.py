@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+
+from calendars.notion_api import RateLimitedNotion
+from ratelimit import TokenBucket
+
+
+class FakeHTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.headers = headers or {}
+
+
+class FlakyPages:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def retrieve(self, page_id):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0)
+        self.active -= 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return {'id': page_id}
+
+
+class FakeClient:
+    def __init__(self, pages):
+        self.pages = pages
+        self.databases = None
+
+
+def make_notion(pages, **kwargs):
+    delays = []
+
+    async def fake_sleep(seconds):
+        delays.append(seconds)
+
+    notion = RateLimitedNotion(FakeClient(pages), rate=1000, burst=1000, sleep=fake_sleep, **kwargs)
+    return notion, delays
+
+
+@pytest.mark.asyncio
+async def test_retries_rate_limited_requests_after_retry_after():
+    pages = FlakyPages([FakeHTTPError(429, {'retry-after': '0.05'}), FakeHTTPError(503)])
+    notion, delays = make_notion(pages)
+
+    assert await notion.pages.retrieve(page_id='p1') == {'id': 'p1'}
+    assert pages.calls == 3
+    assert delays[0] == 0.05
+    assert notion.stats['retries'] == 2
+    assert notion.stats['rate_limited'] == 1
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_client_errors():
+    pages = FlakyPages([FakeHTTPError(404)])
+    notion, delays = make_notion(pages)
+
+    with pytest.raises(FakeHTTPError):
+        await notion.pages.retrieve(page_id='missing')
+    assert pages.calls == 1
+    assert notion.stats['failures'] == 1
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries():
+    pages = FlakyPages([FakeHTTPError(500)] * 3)
+    notion, delays = make_notion(pages, max_retries=2)
+
+    with pytest.raises(FakeHTTPError):
+        await notion.pages.retrieve(page_id='p1')
+    assert pages.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_bounds_concurrency():
+    pages = FlakyPages([])
+    notion, _ = make_notion(pages, max_concurrency=2)
+
+    await asyncio.gather(*[notion.pages.retrieve(page_id=f"p{i}") for i in range(10)])
+
+    assert pages.max_active == 2
+
+
+def test_token_bucket_refills_and_pauses():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+    now[0] = 0.5
+    assert bucket.try_acquire() == 0
+
+    bucket.pause(3)
+    now[0] = 2.0
+    assert bucket.try_acquire() == pytest.approx(1.5)
+    now[0] = 4.0
+    assert bucket.try_acquire() == 0
@@ -0,0 +1,214 @@
+import json
+import pytest
+from unittest.mock import patch
+
+from calendars import notion_api
+from calendars.notion_store import NotionStore
+from calendars.notioncal_access import (
+    RelationTitleResolver,
+    get_calendar_events,
+    iter_calendar_events,
+    process_page,
+    sync_calendar_events,
+)
+
+
+def make_page(page_id, project_id=None, start='2024-07-16T09:00:00', hours=1.5, complete=False,
+              last_edited_time='2024-07-16T10:00:00.000Z'):
+    return {
+        'id': page_id,
+        'last_edited_time': last_edited_time,
+        'properties': {
+            'Name': {'title': [{'plain_text': f"Session {page_id}"}]},
+            'Date': {'date': {'start': start, 'end': None}},
+            'Complete': {'checkbox': complete},
+            'Hours spent': {'formula': {'number': hours}},
+            'Day of Week': {'formula': {'string': 'Tuesday'}},
+            'Projects': {'relation': [{'id': project_id}] if project_id else []},
+        },
+    }
+
+
+class FakePages:
+    def __init__(self, titles):
+        self.titles = titles
+        self.retrieved = []
+
+    async def retrieve(self, page_id):
+        self.retrieved.append(page_id)
+        if page_id not in self.titles:
+            raise Exception("Could not find page")
+        return {'properties': {'Name': {'title': [{'plain_text': self.titles[page_id]}]}}}
+
+
+class FakeDatabases:
+    def __init__(self, batches):
+        self.batches = batches
+
+    async def query(self, database_id, start_cursor=None, **kwargs):
+        index = int(start_cursor or 0)
+        has_more = index + 1 < len(self.batches)
+        return {
+            'results': self.batches[index],
+            'has_more': has_more,
+            'next_cursor': str(index + 1) if has_more else None,
+        }
+
+
+class FakeNotion:
+    def __init__(self, batches=(), titles=None):
+        self.pages = FakePages(titles or {})
+        self.databases = FakeDatabases(list(batches))
+
+    async def aclose(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def notion_limiters(monkeypatch):
+    # Each test patches in its own fake client
+    monkeypatch.setattr(notion_api, '_limiters', {})
+
+
+def test_process_page_uses_resolved_title():
+    event = process_page(make_page('s1', 'p1'), {'p1': 'Lyfe'})
+
+    assert event['project'] == 'Lyfe'
+    assert event['week_number'] == 29
+    assert event['hours_spent'] == 1.5
+    assert process_page(make_page('s2'), {})['project'] == 'No Project'
+
+
+@pytest.mark.asyncio
+async def test_get_calendar_events_fetches_each_project_once():
+    batches = [
+        [make_page(f"s{i}", f"p{i % 2}") for i in range(10)],
+        [make_page(f"t{i}", 'p0') for i in range(5)],
+    ]
+    notion = FakeNotion(batches, titles={'p0': 'Lyfe', 'p1': 'Album'})
+    resolver = RelationTitleResolver()
+
+    with patch('notion_client.AsyncClient', return_value=notion):
+        events = json.loads(await get_calendar_events('db', 'token', resolver))
+
+    assert len(events) == 15
+    assert sorted(notion.pages.retrieved) == ['p0', 'p1']
+    assert {e['project'] for e in events} == {'Lyfe', 'Album'}
+
+
+@pytest.mark.asyncio
+async def test_iter_calendar_events_yields_before_reading_next_page():
+    notion = FakeNotion([[make_page('s0')], [make_page('s1')]])
+    queried = []
+    query = notion.databases.query
+
+    async def tracking_query(**kwargs):
+        queried.append(kwargs.get('start_cursor'))
+        return await query(**kwargs)
+    notion.databases.query = tracking_query
+
+    with patch('notion_client.AsyncClient', return_value=notion):
+        events = iter_calendar_events('db', 'token', RelationTitleResolver())
+        first = await events.__anext__()
+        assert first['name'] == 'Session s0'
+        assert queried == [None]
+        assert [e['name'] async for e in events] == ['Session s1']
+    assert queried == [None, '1']
+
+
+@pytest.mark.asyncio
+async def test_resolver_caches_titles_until_ttl_and_retries_failures():
+    now = [0]
+    resolver = RelationTitleResolver(ttl_seconds=60, clock=lambda: now[0])
+    notion = FakeNotion(titles={'p0': 'Lyfe'})
+
+    assert await resolver.resolve(notion, ['p0', 'p0', 'missing']) == {'p0': 'Lyfe', 'missing': 'Unknown Project'}
+    await resolver.resolve(notion, ['p0', 'missing'])
+    assert sorted(notion.pages.retrieved) == ['missing', 'missing', 'p0']
+
+    now[0] = 61
+    await resolver.resolve(notion, ['p0'])
+    assert notion.pages.retrieved.count('p0') == 2
+
+
+class EditedSinceDatabases:
+    """
+    Applies last_edited_time and Date filters and, like Notion, leaves
+    archived pages out of query results.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.queries = []
+
+    async def query(self, database_id, start_cursor=None, **kwargs):
+        self.queries.append(kwargs)
+        query_filter = kwargs.get('filter', {})
+        results = [page for page in self.pages if not page.get('archived')]
+        for condition in query_filter.get('and', [query_filter] if query_filter else []):
+            if condition.get('timestamp') == 'last_edited_time':
+                since = condition['last_edited_time']['on_or_after']
+                results = [page for page in results if page['last_edited_time'] >= since]
+            else:
+                (op, value), = condition['date'].items()
+                results = [page for page in results
+                           if (page['properties']['Date']['date']['start'][:10] >= value if op == 'on_or_after'
+                               else page['properties']['Date']['date']['start'][:10] <= value)]
+        return {'results': results, 'has_more': False, 'next_cursor': None}
+
+
+@pytest.mark.asyncio
+async def test_sync_calendar_events_only_fetches_edited_pages():
+    store = NotionStore(':memory:')
+    notion = FakeNotion(titles={'p0': 'Lyfe'})
+    notion.databases = EditedSinceDatabases([
+        make_page('s1', 'p0', start='2024-07-16T09:00:00', last_edited_time='2024-07-16T10:00:00.000Z'),
+        make_page('s2', 'p0', start='2024-07-17T09:00:00', last_edited_time='2024-07-16T11:00:00.000Z'),
+        make_page('s4', 'p0', start='2024-07-18T09:00:00', last_edited_time='2024-07-16T11:00:00.000Z'),
+    ])
+    now = 0
+
+    def sync():
+        return sync_calendar_events('db', 'token', store, '2024-07-15', '2024-07-21', clock=lambda: now)
+
+    with patch('notion_client.AsyncClient', return_value=notion):
+        events = json.loads(await sync())
+        assert [e['name'] for e in events] == ['Session s1', 'Session s2', 'Session s4']
+        assert notion.databases.queries[0]['page_size'] == 100
+        assert notion.databases.queries[0]['filter']['and'] == [
+            {'property': 'Date', 'date': {'on_or_after': '2024-07-15'}},
+            {'property': 'Date', 'date': {'on_or_before': '2024-07-21'}},
+        ]
+
+        pages = notion.databases.pages
+        pages[0] = make_page('s1', 'p0', start='2024-07-16T09:00:00', hours=3,
+                             last_edited_time='2024-07-16T12:00:00.000Z')
+        # Moved out of the range: only an unfiltered incremental query sees it
+        pages[1] = make_page('s2', 'p0', start='2024-08-01T09:00:00', last_edited_time='2024-07-16T12:00:00.000Z')
+        pages[2]['archived'] = True
+        pages.append(make_page('s3', start='2024-07-18T09:00:00', last_edited_time='2024-07-16T09:00:00.000Z'))
+        now = 60
+        events = json.loads(await sync())
+
+        assert notion.databases.queries[1]['filter'] == {
+            'timestamp': 'last_edited_time', 'last_edited_time': {'on_or_after': '2024-07-16T11:00:00.000Z'}}
+        # The archived page is only dropped by the next sweep
+        assert [(e['name'], e['hours_spent']) for e in events] == [('Session s1', 3), ('Session s4', 1.5)]
+
+        now = 6 * 60 * 60
+        events = json.loads(await sync())
+
+    assert 'and' in notion.databases.queries[2]['filter']
+    assert [e['name'] for e in events] == ['Session s1', 'Session s3']
+
+
+@pytest.mark.asyncio
+async def test_requests_with_one_token_share_a_limiter():
+    notion = FakeNotion([[make_page('s0')]])
+
+    with patch('notion_client.AsyncClient', return_value=notion) as client:
+        await get_calendar_events('db', 'token', RelationTitleResolver())
+        await get_calendar_events('db', 'token', RelationTitleResolver())
+        await get_calendar_events('db', 'other-token', RelationTitleResolver())
+
+    assert [call.kwargs['auth'] for call in client.call_args_list] == ['token', 'other-token']
@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from fastapi import APIRouter
+from fastapi.testclient import TestClient
+
+import profiling
+from core import create_app
+from metrics import track_dependency
+from profiling import ProfileStore, ProfilingMiddleware
+
+ADMIN = {'X-Admin-Token': 'admin-secret'}
+
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def make_client(monkeypatch, sample_rate=0.0):
+    monkeypatch.setenv('ADMIN_TOKEN', 'admin-secret')
+    monkeypatch.setattr(profiling, 'profile_store', ProfileStore(max_profiles=2))
+    router = APIRouter()
+
+    @router.get("/slow")
+    async def slow():
+        with track_dependency('supabase', 'tasks.select'):
+            await asyncio.sleep(0.01)
+        busy_wait(0.05)
+        return {"ok": True}
+
+    app = create_app(router)
+    app.user_middleware = [m for m in app.user_middleware if m.cls is not ProfilingMiddleware]
+    app.add_middleware(ProfilingMiddleware, store=profiling.profile_store, sample_rate=sample_rate)
+    return TestClient(app)
+
+
+def test_admin_header_profiles_request(monkeypatch):
+    client = make_client(monkeypatch)
+
+    assert 'x-profile-id' not in client.get("/slow").headers
+    assert 'x-profile-id' not in client.get("/slow", headers={'X-Profile': '1'}).headers
+    assert 'x-profile-id' not in client.get("/slow", headers={'X-Profile': '0', **ADMIN}).headers
+    assert 'x-profile-id' not in client.get("/slow", headers={'X-Profile': 'false', **ADMIN}).headers
+    assert 'x-profile-id' in client.get("/slow", headers={'X-Profile': 'True', **ADMIN}).headers
+
+    profile_id = client.get("/slow", headers={'X-Profile': '1', **ADMIN}).headers['x-profile-id']
+    summary = client.get(f"/admin/profiles/{profile_id}", params={'format': 'json'}, headers=ADMIN).json()
+    folded = client.get(f"/admin/profiles/{profile_id}", headers=ADMIN).text
+
+    assert summary['trigger'] == 'header' and summary['status'] == 200
+    assert [span['name'] for span in summary['spans']] == ['supabase.tasks.select']
+    assert 'busy_wait (test_profiling.py:' in folded
+    stack, count = folded.splitlines()[0].rsplit(' ', 1)
+    assert int(count) > 0 and ';' in stack
+
+
+def test_profiles_need_admin_token_and_keep_last_n(monkeypatch):
+    client = make_client(monkeypatch, sample_rate=1.0)
+
+    ids = [client.get("/slow").headers['x-profile-id'] for _ in range(3)]
+
+    assert client.get("/admin/profiles").status_code == 403
+    listed = [profile['id'] for profile in client.get("/admin/profiles", headers=ADMIN).json()['profiles']]
+    assert listed == [ids[2], ids[1]]
+    assert client.get(f"/admin/profiles/{ids[0]}", headers=ADMIN).status_code == 404
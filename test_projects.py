@@ -0,0 +1,42 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from loadtest.run import SEED_USER_ID, auth_headers, offline_services
+
+
+@pytest.fixture
+def offline():
+    from app import app
+
+    with offline_services(projects=1, weeks=2, gemini_latency=0, gemini_tokens_per_second=0, calendar_latency=0,
+                          postgrest_latency=0, notion_latency=0) as services:
+        with TestClient(app, headers=auth_headers()) as client:
+            yield client, services.postgrest.tables
+
+
+def test_projects_are_only_served_to_their_owner(offline):
+    client, _ = offline
+    other = auth_headers(str(uuid.uuid4()))
+    paths = ["/get-project/1", "/get-tasks/1", "/get-weekly-goal/1", "/get-weekly-tasks/1/1"]
+
+    assert [client.get(path).status_code for path in paths] == [200] * 4
+    assert client.get("/get-project/1").json()['user_id'] == SEED_USER_ID
+    assert [client.get(path, headers=other).status_code for path in paths] == [404] * 4
+    assert client.get("/get-tasks/1", params={'compact': 'true'}, headers=other).status_code == 404
+
+
+def test_generated_projects_belong_to_the_signed_in_user(offline):
+    client, tables = offline
+    other_user = str(uuid.uuid4())
+
+    # A user_id in the body is ignored
+    project_id = client.post("/gen-tasks", json={'text': 'idea', 'user_id': SEED_USER_ID},
+                             headers=auth_headers(other_user)).json()['project_id']
+
+    owner = next(row['user_id'] for row in tables['app_users'] if row['auth_user_id'] == other_user)
+    project = next(row for row in tables['projects'] if row['project_id'] == project_id)
+    assert project['user_id'] == owner != SEED_USER_ID
+    assert client.get(f"/get-project/{project_id}").status_code == 404
+    assert client.get(f"/get-project/{project_id}", headers=auth_headers(other_user)).status_code == 200
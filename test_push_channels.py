@@ -0,0 +1,140 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from calendars.availability_cache import AvailabilityCache, CalendarVersions, availability_cache
+from calendars.push_channels import (
+    ChannelRegistry,
+    FakeChannelSender,
+    channel_registry,
+    renew_expiring_channels,
+    router,
+    watch_calendar,
+)
+
+
+def make_service(expiration):
+    service = MagicMock()
+    service.events().watch().execute.return_value = {
+        'resourceId': 'resource-1',
+        'expiration': str(int(expiration.timestamp() * 1000)),
+    }
+    return service
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(channel_registry, 'path', ':memory:')
+    monkeypatch.setattr(channel_registry, '_conn', None)
+    monkeypatch.setattr(availability_cache, 'versions', CalendarVersions(':memory:'))
+    app = FastAPI()
+    app.include_router(router)
+    yield TestClient(app)
+    channel_registry.close()
+    availability_cache.invalidate('user-1')
+
+
+@pytest.mark.asyncio
+async def test_notification_invalidates_cached_availability(client):
+    channel = await watch_calendar(make_service(datetime.now(timezone.utc) + timedelta(days=7)),
+                                   'user-1', 'https://example.com/calendar/notifications')
+    availability_cache.set('user-1', 'range', 'blocks')
+    sender = FakeChannelSender(client)
+
+    assert sender.send(channel, state='sync').status_code == 200
+    assert availability_cache.get('user-1', 'range') == 'blocks'
+
+    assert sender.send(channel, state='exists').status_code == 200
+    assert availability_cache.get('user-1', 'range') is None
+
+
+@pytest.mark.asyncio
+async def test_notification_rejects_bad_token_and_unknown_channel(client):
+    channel = await watch_calendar(make_service(datetime.now(timezone.utc) + timedelta(days=7)),
+                                   'user-1', 'https://example.com/calendar/notifications')
+    sender = FakeChannelSender(client)
+
+    assert sender.send(channel, token='forged').status_code == 403
+    assert sender.send({**channel, 'id': 'unknown'}).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_renew_expiring_channels_replaces_channel():
+    registry = ChannelRegistry(':memory:')
+    now = datetime.now(timezone.utc)
+    service = make_service(now + timedelta(hours=1))
+    old = await watch_calendar(service, 'user-1', 'https://example.com/hook', registry=registry)
+    service.events().watch().execute.return_value['expiration'] = str(int((now + timedelta(days=7)).timestamp() * 1000))
+
+    async def service_factory(user_id):
+        return service
+
+    renewed = await renew_expiring_channels(service_factory, 'https://example.com/hook', registry, now=now)
+
+    assert len(renewed) == 1
+    assert registry.get(old['id']) is None
+    assert registry.for_user('user-1') == renewed
+    service.channels().stop.assert_called_with(body={'id': old['id'], 'resourceId': 'resource-1'})
+
+
+def test_availability_cache_expires_entries():
+    now = [0]
+    cache = AvailabilityCache(ttl_seconds=10, clock=lambda: now[0])
+    cache.set('user-1', 'range', 'blocks')
+
+    now[0] = 9
+    assert cache.get('user-1', 'range') == 'blocks'
+    now[0] = 10
+    assert cache.get('user-1', 'range') is None
+
+
+def test_unwatched_calendars_are_cached_briefly():
+    now = [0]
+    cache = AvailabilityCache(ttl_seconds=100, unwatched_ttl_seconds=10, clock=lambda: now[0])
+    cache.set('user-1', 'watched', 'blocks')
+    cache.set('user-1', 'unwatched', 'blocks', watched=False)
+
+    now[0] = 10
+    assert cache.get('user-1', 'watched') == 'blocks' and cache.get('user-1', 'unwatched') is None
+
+
+def test_only_live_channels_count_as_watched():
+    registry = ChannelRegistry(':memory:')
+    now = datetime.now(timezone.utc)
+    registry.add({'id': 'c1', 'token': 't', 'user_id': 'user-1', 'calendar_id': 'primary',
+                  'resource_id': 'r1', 'expiration': now + timedelta(hours=1)})
+    registry.add({'id': 'c2', 'token': 't', 'user_id': 'user-1', 'calendar_id': 'work',
+                  'resource_id': 'r2', 'expiration': now - timedelta(minutes=1)})
+
+    assert registry.watched('user-1', ['primary'])
+    assert not registry.watched('user-1', ['primary', 'work'])
+    assert not registry.watched('user-2', ['primary'])
+    assert not registry.watched('user-1', ['primary'], now=now + timedelta(hours=2))
+
+
+def test_invalidation_reaches_caches_in_other_workers(tmp_path):
+    path = str(tmp_path / 'calendar_state.db')
+    worker_a = AvailabilityCache(versions=CalendarVersions(path))
+    worker_b = AvailabilityCache(versions=CalendarVersions(path))
+    worker_b.set('user-1', 'range', 'blocks')
+
+    assert worker_a.invalidate('user-1') == 0
+    assert worker_b.get('user-1', 'range') is None
+
+
+def test_channels_are_shared_and_renewed_by_one_worker(tmp_path):
+    path = str(tmp_path / 'calendar_state.db')
+    worker_a, worker_b = ChannelRegistry(path), ChannelRegistry(path)
+    now = datetime.now(timezone.utc)
+    worker_a.add({'id': 'c1', 'token': 't', 'user_id': 'user-1', 'calendar_id': 'primary',
+                  'resource_id': 'r1', 'expiration': now + timedelta(hours=1)})
+
+    assert worker_b.get('c1')['token'] == 't'
+    assert [c['id'] for c in worker_a.claim_expiring(now + timedelta(hours=6), now)] == ['c1']
+    assert worker_b.claim_expiring(now + timedelta(hours=6), now) == []
+    # A worker that died mid-renewal releases the channel when its lease runs out
+    later = now + timedelta(minutes=11)
+    assert [c['id'] for c in worker_b.claim_expiring(later + timedelta(hours=6), later)] == ['c1']
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import resilience
+from core import create_app
+from metrics import CIRCUIT_BREAKER_STATE
+from routes.auth import current_user, current_user_id
+from resilience import (CircuitBreaker, Dependency, DependencyFailed, DependencyTimeout, DependencyUnavailable,
+                        RetryBudget, StaleCache, is_transient)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+def make_dependency(name='test', **kwargs):
+    clock = FakeClock()
+    breaker = CircuitBreaker(name, failure_threshold=2, reset_timeout=30, clock=clock)
+    options = dict(timeout=1, base_delay=0, breaker=breaker)
+    options.update(kwargs)
+    return Dependency(name, **options), clock
+
+
+def failing(*errors, result='ok'):
+    errors = list(errors)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call, calls
+
+
+def test_is_transient():
+    assert is_transient(ConnectionError()) and is_transient(TimeoutError()) and is_transient(HTTPError(503))
+    assert not is_transient(HTTPError(404)) and not is_transient(ValueError("bad input"))
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_failures_only():
+    dependency, _ = make_dependency()
+    call, calls = failing(HTTPError(503))
+    assert await dependency.call('op', call) == 'ok' and len(calls) == 2
+
+    call, calls = failing(HTTPError(404))
+    with pytest.raises(HTTPError):
+        await dependency.call('op', call)
+    assert len(calls) == 1
+
+    call, calls = failing(HTTPError(503))
+    with pytest.raises(DependencyFailed):
+        await dependency.call('op', call, idempotent=False)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_limits_retries():
+    dependency, _ = make_dependency(budget=RetryBudget(ratio=0.0, max_tokens=1),
+                                    breaker=CircuitBreaker('budget', failure_threshold=100))
+    call, calls = failing(OSError(), OSError(), OSError(), OSError())
+
+    with pytest.raises(DependencyFailed):
+        await dependency.call('op', call)
+    with pytest.raises(DependencyFailed):
+        await dependency.call('op', call)
+    # One retry for the first call, none left for the second
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_timeout():
+    dependency, _ = make_dependency(timeout=0.05, max_retries=0)
+
+    with pytest.raises(DependencyTimeout):
+        await dependency.call('op', time.sleep, 0.2)
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_recovers_after_probe():
+    dependency, clock = make_dependency('breaker_test', max_retries=0)
+    call, calls = failing(OSError(), OSError())
+
+    for _ in range(2):
+        with pytest.raises(DependencyFailed):
+            await dependency.call('op', call)
+    with pytest.raises(DependencyUnavailable) as unavailable:
+        await dependency.call('op', call)
+    assert len(calls) == 2 and unavailable.value.retry_after == 30
+    assert CIRCUIT_BREAKER_STATE.labels('breaker_test')._value.get() == CircuitBreaker.OPEN
+
+    clock.now = 31
+    assert dependency.breaker.state == CircuitBreaker.HALF_OPEN
+    assert await dependency.call('op', call) == 'ok'
+    assert dependency.breaker.state == CircuitBreaker.CLOSED
+    assert CIRCUIT_BREAKER_STATE.labels('breaker_test')._value.get() == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_ignored_statuses_do_not_open_breaker():
+    dependency, _ = make_dependency('throttled', max_retries=0, breaker_ignores={429})
+    call, calls = failing(HTTPError(429), HTTPError(429), HTTPError(429))
+
+    for _ in range(3):
+        with pytest.raises(DependencyFailed):
+            await dependency.call('op', call)
+    assert len(calls) == 3 and dependency.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker('probe_test', failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+
+    assert breaker.allow() == 0
+    assert breaker.allow() > 0
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stale_cache_expires_and_is_bounded():
+    clock = FakeClock()
+    cache = StaleCache(max_entries=2, max_age=60, clock=clock)
+    for key in ['a', 'b', 'c']:
+        cache.set(key, key.upper())
+
+    assert cache.get('a') is None and cache.get('c') == 'C'
+    clock.now = 61
+    assert cache.get('c') is None
+
+
+def test_get_tasks_serves_cached_tasks_while_supabase_is_down(monkeypatch):
+    from routes import projects
+
+    dependency, _ = make_dependency('supabase', max_retries=0)
+    monkeypatch.setitem(resilience.DEPENDENCIES, 'supabase', dependency)
+    monkeypatch.setattr(projects, 'tasks_fallback', StaleCache())
+    supabase = MagicMock()
+    supabase.table().select().eq().eq().execute.return_value = MagicMock(data=[{
+        'project_id': 1, 'project_name': 'P', 'description': 'D', 'category': 'C',
+        'tasks': [{'task_id': 1, 'week_no': 1, 'task_no': 1, 'task': 'T'}],
+    }])
+    app = create_app(projects.router)
+    app.dependency_overrides[current_user] = lambda: {'user_id': '1'}
+    app.dependency_overrides[current_user_id] = lambda: 1
+    client = TestClient(app)
+
+    with patch('routes.projects.get_supabase', return_value=supabase):
+        fresh = client.get("/get-tasks/1")
+        supabase.table().select().eq().eq().execute.side_effect = ConnectionError("connection refused")
+        stale = client.get("/get-tasks/1")
+        uncached = client.get("/get-tasks/2")
+        # Two failures open the breaker, so this one never reaches Supabase
+        calls = supabase.table().select().eq().eq().execute.call_count
+        failing_fast = client.get("/get-tasks/2")
+
+    assert fresh.status_code == 200 and 'x-cache' not in fresh.headers
+    assert stale.status_code == 200 and stale.headers['x-cache'] == 'stale' and stale.json() == fresh.json()
+    assert uncached.status_code == 502
+    assert failing_fast.status_code == 503 and failing_fast.headers['retry-after'] == '30'
+    assert supabase.table().select().eq().eq().execute.call_count == calls
+
+
+@pytest.mark.asyncio
+async def test_call_async_awaits_coroutines():
+    dependency, _ = make_dependency()
+
+    async def fetch(value):
+        await asyncio.sleep(0)
+        return value
+
+    assert await dependency.call_async('op', fetch, 3) == 3
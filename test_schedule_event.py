@@ -0,0 +1,90 @@
+import pytest
+from unittest.mock import MagicMock
+
+from calendars.schedule_event import insert_events_batch, MAX_BATCH_EVENTS, MAX_BATCH_SIZE
+from resilience import DependencyFailed
+
+
+class FakeBatch:
+    def __init__(self, callback, executed):
+        self.callback = callback
+        self.executed = executed
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.executed.append(len(self.requests))
+        if any(request['body']['summary'] == 'outage' for _, request in self.requests):
+            raise ConnectionError("connection reset")
+        for request_id, request in self.requests:
+            body = request['body']
+            if body['summary'] == 'fail':
+                self.callback(request_id, None, Exception("Bad Request"))
+            else:
+                self.callback(request_id, {**body, 'id': f"evt-{request_id}"}, None)
+
+
+@pytest.fixture
+def fake_service():
+    service = MagicMock()
+    service.executed = []
+    service.new_batch_http_request.side_effect = lambda callback: FakeBatch(callback, service.executed)
+    service.events().insert.side_effect = lambda calendarId, body: {'calendarId': calendarId, 'body': body}
+    return service
+
+
+@pytest.mark.asyncio
+async def test_insert_events_batch_chunks_requests(fake_service):
+    events = [{'summary': f"Task {i}"} for i in range(MAX_BATCH_SIZE + 5)]
+
+    results = await insert_events_batch(fake_service, events)
+
+    assert fake_service.executed == [MAX_BATCH_SIZE, 5]
+    assert [created['id'] for created, _ in results] == [f"evt-{i}" for i in range(len(events))]
+    assert all(error is None for _, error in results)
+
+
+@pytest.mark.asyncio
+async def test_insert_events_batch_reports_errors_per_event(fake_service):
+    events = [{'summary': 'ok'}, {'summary': 'fail'}, {'summary': 'ok'}]
+
+    results = await insert_events_batch(fake_service, events)
+
+    assert results[0][0]['id'] == 'evt-0'
+    assert results[1] == (None, "Bad Request")
+    assert results[2][1] is None
+
+
+@pytest.mark.asyncio
+async def test_insert_events_batch_keeps_earlier_batches_when_a_later_one_fails(fake_service):
+    events = [{'summary': 'ok'}] * MAX_BATCH_SIZE + [{'summary': 'outage'}]
+
+    results = await insert_events_batch(fake_service, events)
+
+    assert all(created is not None for created, _ in results[:MAX_BATCH_SIZE])
+    assert results[-1][0] is None and results[-1][1].startswith("Batch failed")
+
+
+@pytest.mark.asyncio
+async def test_insert_events_batch_raises_when_nothing_was_created(fake_service):
+    with pytest.raises(DependencyFailed):
+        await insert_events_batch(fake_service, [{'summary': 'outage'}])
+
+
+def test_batch_route_caps_the_number_of_events():
+    from fastapi.testclient import TestClient
+
+    from app import app
+    from loadtest.run import auth_headers, offline_services
+
+    event = {'summary': 'Task', 'start_time': '2024-07-20T19:00:00', 'end_time': '2024-07-20T19:30:00',
+             'timezone': 'America/Los_Angeles'}
+    with offline_services(events=0, gemini_latency=0, calendar_latency=0, postgrest_latency=0, notion_latency=0):
+        client = TestClient(app, headers=auth_headers())
+        at_cap = client.post("/schedule-tasks/batch", json=[event] * MAX_BATCH_EVENTS)
+        over_cap = client.post("/schedule-tasks/batch", json=[event] * (MAX_BATCH_EVENTS + 1))
+
+    assert at_cap.status_code == 200 and len(at_cap.json()['results']) == MAX_BATCH_EVENTS
+    assert over_cap.status_code == 422
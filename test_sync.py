@@ -0,0 +1,115 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from loadtest.fakes import timestamp
+from loadtest.run import LOADTEST_USER, SEED_USER_ID, auth_headers, offline_services
+from routes import sync as sync_route
+from routes.sync import build_sync_response
+
+
+def minutes_ago(minutes):
+    return timestamp(datetime.now(timezone.utc) - timedelta(minutes=minutes))
+
+
+@pytest.fixture
+def offline():
+    from app import app
+
+    with offline_services(projects=2, weeks=2, gemini_latency=0, gemini_tokens_per_second=0, calendar_latency=0,
+                          postgrest_latency=0, notion_latency=0) as services:
+        with TestClient(app, headers=auth_headers()) as client:
+            yield client, services.postgrest.tables
+
+
+def test_first_sync_returns_everything(offline):
+    client, _ = offline
+    body = client.get("/sync").json()
+
+    assert body['reset'] is True and body['cursor'] and body['has_more'] is False
+    assert len(body['projects']) == 2 and len(body['weekly_goals']) == 4 and len(body['tasks']) == 12
+    assert body['deleted'] == []
+    # Only the signed-in user's rows, whatever user_id is asked for
+    assert client.get("/sync", params={'user_id': 1}, headers=auth_headers(str(uuid.uuid4()))).json()['projects'] == []
+
+
+def test_auth_users_are_mapped_to_app_user_ids(offline):
+    client, tables = offline
+    other = str(uuid.uuid4())
+
+    assert client.get("/sync", headers=auth_headers(other)).json()['projects'] == []
+    assert client.get("/sync", headers=auth_headers(other)).json()['projects'] == []
+    # Each auth user gets one app user_id, however often they sync
+    assert [(row['auth_user_id'], row['user_id']) for row in tables['app_users']] == [
+        (LOADTEST_USER, SEED_USER_ID), (other, SEED_USER_ID + 1)]
+
+
+def test_sync_returns_only_changes_since_cursor(offline):
+    client, tables = offline
+    cursor = client.get("/sync").json()['cursor']
+
+    unchanged = client.get("/sync", params={'since': cursor}).json()
+    assert unchanged['reset'] is False
+    assert unchanged['projects'] == unchanged['tasks'] == unchanged['deleted'] == []
+
+    tables['tasks'][0].update(task="Renamed", updated_at=timestamp())
+    tables['tombstones'].append({'user_id': 1, 'entity': 'task', 'entity_key': {'task_id': 2},
+                                 'updated_at': timestamp()})
+    changed = client.get("/sync", params={'since': minutes_ago(2)}).json()
+
+    # Changes from the last few seconds wait for the next sync
+    assert changed['tasks'] == [] and changed['deleted'] == []
+    tables['tasks'][0]['updated_at'] = tables['tombstones'][0]['updated_at'] = minutes_ago(1)
+    changed = client.get("/sync", params={'since': minutes_ago(2)}).json()
+    assert [task['task'] for task in changed['tasks']] == ["Renamed"]
+    assert changed['deleted'] == [{'type': 'task', 'task_id': 2}] and changed['projects'] == []
+
+
+def test_expired_or_invalid_cursor(offline):
+    client, _ = offline
+
+    expired = client.get("/sync", params={'since': '2020-01-01T00:00:00+00:00'}).json()
+    assert expired['reset'] is True and len(expired['tasks']) == 12
+    assert client.get("/sync", params={'since': 'yesterday'}).status_code == 400
+
+
+def test_latest_change_per_row_wins():
+    created = {'entity': 'weekly_goal', 'entity_key': {'project_id': 1, 'week_no': 2}, 'deleted': False,
+               'data': {'project_id': 1, 'week_no': 2, 'weekly_goal': 'Goal'}}
+    deleted = {'entity': 'weekly_goal', 'entity_key': {'week_no': 2, 'project_id': 1}, 'deleted': True, 'data': None}
+
+    body = build_sync_response([created, deleted], 'cursor', False)
+    assert body['weekly_goals'] == [] and body['deleted'] == [{'type': 'weekly_goal', 'project_id': 1, 'week_no': 2}]
+    assert build_sync_response([deleted, created], 'cursor', False)['weekly_goals'] == [created['data']]
+
+
+def test_sync_pages_through_changes(offline, monkeypatch):
+    client, tables = offline
+    monkeypatch.setattr(sync_route, 'SYNC_PAGE_SIZE', 5)
+    rows = tables['projects'] + tables['weekly_goal'] + tables['tasks']
+    # Older than tombstones are kept, which must not restart a resync part way through
+    for i, row in enumerate(rows):
+        row['updated_at'] = timestamp(datetime.now(timezone.utc) - timedelta(days=40, minutes=-i))
+
+    pages = [client.get("/sync").json()]
+    while pages[-1]['has_more']:
+        pages.append(client.get("/sync", params={'since': pages[-1]['cursor']}).json())
+
+    assert [page['reset'] for page in pages] == [True, False, False, False]
+    assert [len(page['projects'] + page['weekly_goals'] + page['tasks']) for page in pages] == [5, 5, 5, 3]
+    assert sum(len(page['tasks']) for page in pages) == 12
+    assert client.get("/sync", params={'since': pages[-1]['cursor']}).json()['tasks'] == []
+
+
+def test_rows_sharing_a_timestamp_stay_on_one_page(offline, monkeypatch):
+    client, _ = offline
+    monkeypatch.setattr(sync_route, 'SYNC_PAGE_SIZE', 5)
+
+    # Every seeded row has the same updated_at
+    first = client.get("/sync").json()
+    second = client.get("/sync", params={'since': first['cursor']}).json()
+
+    assert first['has_more'] is True and len(first['tasks']) == 12
+    assert second['has_more'] is False and second['tasks'] == []
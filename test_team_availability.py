@@ -0,0 +1,95 @@
+import pytest
+from zoneinfo import ZoneInfo
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from calendars.team_availability import busy_bitmap, common_free_windows, get_team_availability
+
+TZ = ZoneInfo('America/Los_Angeles')
+
+
+def at(hour, minute=0, day=16):
+    return datetime(2024, 7, day, hour, minute, tzinfo=TZ)
+
+
+def test_busy_bitmap_rounds_partial_slots_to_busy():
+    bitmap = busy_bitmap([(at(0, 7), at(0, 12))], at(0), at(1), resolution=5)
+
+    assert bitmap.tolist() == [False] + [True] * 2 + [False] * 9
+
+
+def test_common_free_windows_intersects_users():
+    range_start, range_end = at(9), at(12)
+    bitmaps = [
+        busy_bitmap([(at(9), at(10))], range_start, range_end),
+        busy_bitmap([(at(10, 30), at(11))], range_start, range_end),
+    ]
+
+    windows = common_free_windows(bitmaps, range_start, min_duration_minutes=30)
+
+    assert [(s.astimezone(TZ).strftime('%H:%M'), e.astimezone(TZ).strftime('%H:%M')) for s, e in windows] == [
+        ('10:00', '10:30'),
+        ('11:00', '12:00'),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_get_team_availability_fetches_each_user():
+    busy = {
+        'alice': [{'start': '2024-07-16T09:00:00-07:00', 'end': '2024-07-16T12:00:00-07:00'}],
+        'bob': [{'start': '2024-07-16T13:00:00-07:00', 'end': '2024-07-16T15:00:00-07:00'}],
+    }
+    requested = []
+
+    async def service_factory(user_id):
+        requested.append(user_id)
+        service = MagicMock()
+        service.freebusy().query().execute.return_value = {'calendars': {'primary': {'busy': busy[user_id]}}}
+        return service
+
+    result = await get_team_availability(service_factory, ['alice', 'bob'], datetime(2024, 7, 16),
+                                         datetime(2024, 7, 17), 'America/Los_Angeles', working_hours=(9, 17))
+
+    assert sorted(requested) == ['alice', 'bob']
+    assert result['free_windows'] == [
+        {'start': '2024-07-16T12:00:00-07:00', 'end': '2024-07-16T13:00:00-07:00', 'duration_minutes': 60},
+        {'start': '2024-07-16T15:00:00-07:00', 'end': '2024-07-16T17:00:00-07:00', 'duration_minutes': 120},
+    ]
+
+
+def test_busy_bitmap_counts_slots_across_dst_change():
+    # 2024-03-10 in Los Angeles is 23 hours long
+    range_start = datetime(2024, 3, 9, tzinfo=TZ)
+    range_end = datetime(2024, 3, 11, tzinfo=TZ)
+
+    bitmap = busy_bitmap([(range_start, range_end)], range_start, range_end, resolution=5)
+
+    assert len(bitmap) == 47 * 12 and bitmap.all()
+    assert common_free_windows([bitmap], range_start, min_duration_minutes=5) == []
+
+
+def test_team_availability_route_requires_a_user():
+    from fastapi.testclient import TestClient
+
+    from app import app
+    from loadtest.run import auth_headers, offline_services
+
+    with offline_services(events=0, gemini_latency=0, calendar_latency=0, postgrest_latency=0,
+                          notion_latency=0):
+        client = TestClient(app)
+        body = {'members': ['alice@example.com', 'bob@example.com'], 'start_date': '2024-07-16T09:00:00',
+                'end_date': '2024-07-16T17:00:00', 'timezone': 'America/Los_Angeles'}
+
+        response = client.post("/team-availability", json=body, headers=auth_headers())
+        anonymous = client.post("/team-availability", json=body)
+        invalid = client.post("/team-availability", json={**body, 'members': []}, headers=auth_headers())
+        bad_hours = [client.post("/team-availability", json={**body, 'working_hours': hours}, headers=auth_headers())
+                     for hours in ([17, 9], [9, 9], [-1, 17], [9, 25])]
+        full_day = client.post("/team-availability", json={**body, 'working_hours': [0, 24]}, headers=auth_headers())
+
+    assert response.status_code == 200
+    assert response.json()['free_windows'] == [
+        {'start': '2024-07-16T09:00:00-07:00', 'end': '2024-07-16T17:00:00-07:00', 'duration_minutes': 480},
+    ]
+    assert anonymous.status_code == 401 and invalid.status_code == 422
+    assert [response.status_code for response in bad_hours] == [422] * 4 and full_day.status_code == 200
@@ -0,0 +1,54 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from pydantic import ValidationError
+
+from calendars.timezones import UserTimezoneCache, get_zone, is_valid_timezone, timezone_names
+from models import EventRequest
+
+EVENT = {
+    'summary': 'Team Meeting',
+    'start_time': datetime(2024, 7, 20, 19, 0),
+    'end_time': datetime(2024, 7, 20, 19, 30),
+    'timezone': 'America/Los_Angeles',
+}
+
+
+def test_registry_validates_names_and_caches_zones():
+    assert isinstance(timezone_names(), frozenset)
+    assert is_valid_timezone('Europe/Berlin')
+    assert not is_valid_timezone('Mars/Olympus_Mons')
+    assert get_zone('Europe/Berlin') is get_zone('Europe/Berlin')
+    with pytest.raises(ValueError):
+        get_zone('Mars/Olympus_Mons')
+    with pytest.raises(ValidationError):
+        EventRequest(**{**EVENT, 'timezone': 'Mars/Olympus_Mons'})
+
+
+@pytest.mark.asyncio
+async def test_user_timezone_is_fetched_once_per_ttl():
+    now = [0.0]
+    cache = UserTimezoneCache(ttl_seconds=60, clock=lambda: now[0])
+    service = MagicMock()
+    service.calendarList().get().execute.return_value = {'timeZone': 'Asia/Tokyo'}
+    service.calendarList.reset_mock()
+
+    assert await cache.resolve(service, 'user-1') == 'Asia/Tokyo'
+    assert await cache.resolve(service, 'user-1') == 'Asia/Tokyo'
+    assert service.calendarList.call_count == 1
+
+    now[0] = 61.0
+    assert await cache.resolve(service, 'user-1') == 'Asia/Tokyo'
+    assert service.calendarList.call_count == 2
+
+
+def test_schedule_task_validation_does_not_walk_tzdata(monkeypatch):
+    timezone_names()
+    walk = MagicMock(return_value=set())
+    monkeypatch.setattr('calendars.timezones.available_timezones', walk)
+
+    EventRequest(**EVENT)
+    EventRequest(**{**EVENT, 'timezone': 'Europe/Berlin'})
+
+    walk.assert_not_called()